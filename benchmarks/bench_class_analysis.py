@@ -0,0 +1,101 @@
+"""
+Benchmark for the analysis of statements in the bodies of classes.
+
+Run with `python benchmarks/bench_class_analysis.py` from the root of the
+repository.  Times sorting the sample modules under `test_data/samples` that
+contain classes, and then modules made up of a single class with classes
+nested inside it to increasing depths.  The statements in the body of a class
+take their analysis from the class itself, so the time taken should grow with
+the size of the module rather than with how deeply its classes are nested.
+
+Also times analysing the top level statements of each module on their own,
+with the visitor that sorting uses and with the symtable based analysis that
+the tests use as a cross-check on it.
+"""
+
+from __future__ import annotations
+
+import pathlib
+import time
+from typing import Callable
+
+from ssort import _analysis, _symtable_analysis, ssort
+from ssort._parsing import parse
+from ssort._source import Source
+
+_SAMPLES_DIR = pathlib.Path("test_data/samples")
+
+_REPEATS = 5
+
+
+def _nested_module(depth: int) -> str:
+    lines = []
+    for level in range(depth):
+        indent = "    " * level
+        lines.append(f"{indent}class C{level}:")
+        for method_index in range(20):
+            lines.append(f"{indent}    def m{method_index}(self, a, b):")
+            lines.append(
+                f"{indent}        return [self._h(x) for x in (a, b)]"
+            )
+        lines.append(f"{indent}    def _h(self, x):")
+        lines.append(f"{indent}        return x")
+    return "\n".join(lines) + "\n"
+
+
+def _best(fn: Callable[[], object]) -> float:
+    best = float("inf")
+    for _ in range(_REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _bench(text: str | bytes) -> str:
+    sort = _best(
+        lambda: ssort(
+            text, on_unresolved="ignore", on_wildcard_import="ignore"
+        )
+    )
+
+    if isinstance(text, bytes):
+        text = Source.from_bytes(text).text
+    statements = list(parse(text))
+    visitor = _best(
+        lambda: [_analysis.analyze(statement.node) for statement in statements]
+    )
+    symtable = _best(
+        lambda: [
+            _symtable_analysis.analyze(
+                statement.node,
+                statement.text,
+                start_row=statement.start_row,
+                start_col=statement.start_col,
+            )
+            for statement in statements
+        ]
+    )
+    return (
+        f"{sort * 1e3:>10.2f} {visitor * 1e3:>10.2f} {symtable * 1e3:>12.2f}"
+    )
+
+
+def main() -> None:
+    print(
+        f"{'module':<32} {'sort ms':>10} {'visitor ms':>10} {'symtable ms':>12}"
+    )
+    for input_path in sorted(_SAMPLES_DIR.glob("*_input.py")):
+        text = input_path.read_bytes()
+        if b"class " not in text:
+            continue
+        sample = input_path.name[: -len("_input.py")]
+        print(f"{sample:<32} {_bench(text)}")
+
+    for depth in (1, 5, 10, 20, 40):
+        source = _nested_module(depth)
+        print(f"{f'nested classes, depth {depth}':<32} {_bench(source)}")
+
+
+if __name__ == "__main__":
+    main()
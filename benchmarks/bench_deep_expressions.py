@@ -0,0 +1,74 @@
+"""
+Benchmark for `ssort._analysis.analyze` on deliberately deep syntax trees:
+a chain of up to 10,000 `+` operators, and long `elif` chains.
+
+Run with `python benchmarks/bench_deep_expressions.py`.  Every input is
+analysed with the default recursion limit, and time per term should stay
+roughly constant as the depth doubles.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import Callable
+
+from ssort._analysis import analyze
+from ssort._parsing import parse
+from ssort._statements import Statement
+
+
+def _binop_chain(term_count: int) -> str:
+    return "x = " + " + ".join(f"a{index}" for index in range(term_count))
+
+
+def _elif_chain(term_count: int) -> str:
+    lines = ["if a0:\n    pass\n"]
+    for index in range(1, term_count):
+        lines.append(f"elif a{index}:\n    pass\n")
+    return "".join(lines)
+
+
+def _parse_deep(source: str) -> Statement:
+    # CPython limits the depth of the syntax trees that it will build using
+    # the recursion limit, so it has to be raised to parse the inputs.  It is
+    # restored before anything is timed.
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 100000))
+    try:
+        (statement,) = parse(source)
+    finally:
+        sys.setrecursionlimit(limit)
+    return statement
+
+
+def _bench(build: Callable[[int], str], term_count: int) -> float:
+    statement = _parse_deep(build(term_count))
+
+    start = time.perf_counter()
+    analysis = analyze(statement.node)
+    elapsed = time.perf_counter() - start
+
+    assert len(analysis.requirements) == term_count
+    return elapsed
+
+
+def main() -> None:
+    # CPython's parser runs out of memory on `elif` chains much longer than
+    # five thousand branches, whatever the recursion limit.
+    cases = [
+        ("binop", _binop_chain, (1250, 2500, 5000, 10000)),
+        ("elif", _elif_chain, (625, 1250, 2500, 5000)),
+    ]
+    for name, build, term_counts in cases:
+        print(f"{name:>6} {'terms':>10} {'seconds':>10} {'us/term':>10}")
+        for term_count in term_counts:
+            elapsed = _bench(build, term_count)
+            per_term = elapsed / term_count * 1e6
+            print(
+                f"{'':>6} {term_count:>10} {elapsed:>10.4f} {per_term:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark for `ssort._graphs.replace_cycles` on synthetic modules made up of
+thousands of interlocking cycles of mutually recursive functions.
+
+Run with `python benchmarks/bench_replace_cycles.py`.  Time per statement
+should stay roughly constant as the module size doubles.
+"""
+
+from __future__ import annotations
+
+import time
+
+from ssort._dependencies import module_statements_graph
+from ssort._graphs import replace_cycles
+from ssort._parsing import parse
+from ssort._utils import sort_key_from_iter
+
+
+def _synthetic_module(statement_count: int, *, cycle_length: int = 4) -> str:
+    # Every function calls the next function in its own ring, and the first
+    # function in each ring also calls into the previous ring so that rings
+    # interlock into larger strongly connected components.
+    lines = []
+    for index in range(statement_count):
+        ring, position = divmod(index, cycle_length)
+        next_index = ring * cycle_length + (position + 1) % cycle_length
+        calls = [f"f{next_index}()"]
+        if position == 0 and ring > 0 and ring % 8:
+            calls.append(f"f{index - 1}()")
+        lines.append(f"def f{index}():\n    return {' + '.join(calls)}\n")
+    return "\n".join(lines)
+
+
+def _unreachable(*args, **kwargs):
+    raise AssertionError("unreachable")
+
+
+def _bench(statement_count: int) -> float:
+    statements = list(parse(_synthetic_module(statement_count)))
+    graph = module_statements_graph(
+        statements,
+        on_unresolved=_unreachable,
+        on_wildcard_import=_unreachable,
+    )
+    assert graph is not None
+
+    start = time.perf_counter()
+    replace_cycles(graph, key=sort_key_from_iter(statements))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    print(f"{'statements':>10} {'seconds':>10} {'us/statement':>14}")
+    for statement_count in (1000, 2000, 4000, 8000, 16000):
+        elapsed = _bench(statement_count)
+        per_statement = elapsed / statement_count * 1e6
+        print(f"{statement_count:>10} {elapsed:>10.4f} {per_statement:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark for the memory used by the requirements that ssort collects for
+each statement in the sample modules under `test_data/samples`.
+
+Run with `python benchmarks/bench_requirements_memory.py` from the root of the
+repository.  Reports how many requirements are retained, the number of memory
+blocks and bytes allocated while analysing that are still alive once every
+statement has been analysed, and the peak memory traced during the run.
+"""
+
+from __future__ import annotations
+
+import ast
+import pathlib
+import time
+import tracemalloc
+from typing import Iterable, Iterator
+
+from ssort._parsing import parse, split_class
+from ssort._statements import Statement
+from ssort._utils import detect_encoding, normalize_newlines
+
+_SAMPLES_DIR = pathlib.Path("test_data/samples")
+
+
+def _iter_statements(statements: Iterable[Statement]) -> Iterator[Statement]:
+    for statement in statements:
+        yield statement
+        if isinstance(statement.node, ast.ClassDef):
+            _, body = split_class(statement)
+            yield from _iter_statements(body)
+
+
+def _load_statements() -> list[Statement]:
+    statements: list[Statement] = []
+    for input_path in sorted(_SAMPLES_DIR.glob("*_input.py")):
+        input_bytes = input_path.read_bytes()
+        input_text = normalize_newlines(
+            input_bytes.decode(detect_encoding(input_bytes))
+        )
+        statements.extend(_iter_statements(parse(input_text)))
+    return statements
+
+
+def main() -> None:
+    statements = _load_statements()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    requirement_count = sum(
+        len(list(statement.requirements())) for statement in statements
+    )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Statements are parsed before tracing starts, so everything that is
+    # still alive at the end belongs to the cached analysis of a statement.
+    retained = snapshot.statistics("filename")
+    retained_blocks = sum(stat.count for stat in retained)
+    retained_bytes = sum(stat.size for stat in retained)
+
+    print(f"statements:           {len(statements):>10}")
+    print(f"requirements:         {requirement_count:>10}")
+    print(f"retained blocks:      {retained_blocks:>10}")
+    print(f"retained KiB:         {retained_bytes / 1024:>10.1f}")
+    print(f"peak traced KiB:      {peak / 1024:>10.1f}")
+    print(f"seconds (traced):     {elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
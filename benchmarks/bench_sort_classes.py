@@ -0,0 +1,64 @@
+"""
+Benchmark for ordering the bodies of the classes in the sample modules under
+`test_data/samples`.
+
+Run with `python benchmarks/bench_sort_classes.py` from the root of the
+repository.  Class bodies are split out and analysed before timing starts, so
+only the grouping of statements and the resolution of dependencies between
+them is measured.
+"""
+
+from __future__ import annotations
+
+import ast
+import pathlib
+import time
+
+from ssort._parsing import parse, split_class
+from ssort._source import Source
+from ssort._ssort import _sort_class_statements
+from ssort._statements import Statement
+
+_SAMPLES_DIR = pathlib.Path("test_data/samples")
+
+_REPEATS = 20
+
+
+def _load_class_bodies(path: pathlib.Path) -> list[list[Statement]]:
+    bodies = []
+    for statement in parse(Source.from_path(path).text):
+        if isinstance(statement.node, ast.ClassDef):
+            _, body = split_class(statement)
+            for child in body:
+                child.analysis()
+            bodies.append(body)
+    return bodies
+
+
+def _bench(bodies: list[list[Statement]]) -> float:
+    best = float("inf")
+    for _ in range(_REPEATS):
+        start = time.perf_counter()
+        for body in bodies:
+            _sort_class_statements(body)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    print(f"{'sample':<32} {'classes':>8} {'statements':>10} {'ms':>8}")
+    for input_path in sorted(_SAMPLES_DIR.glob("*_input.py")):
+        bodies = _load_class_bodies(input_path)
+        if not bodies:
+            continue
+        sample = input_path.name[: -len("_input.py")]
+        statement_count = sum(len(body) for body in bodies)
+        elapsed = _bench(bodies)
+        print(
+            f"{sample:<32} {len(bodies):>8} {statement_count:>10}"
+            f" {elapsed * 1e3:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
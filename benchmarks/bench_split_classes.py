@@ -0,0 +1,50 @@
+"""
+Benchmark for splitting the bodies of classes out of a module with
+`ssort._parsing.split_class`.
+
+Run with `python benchmarks/bench_split_classes.py` from the root of the
+repository.  The module grows by adding classes of a fixed size, so the time
+spent splitting each class should stay roughly constant.
+"""
+
+from __future__ import annotations
+
+import ast
+import time
+
+from ssort._parsing import parse, split_class
+
+
+def _module(class_count: int) -> str:
+    lines = []
+    for class_index in range(class_count):
+        lines.append(f"class C{class_index}(Base):  # Class {class_index}.")
+        for method_index in range(10):
+            lines.append(f"    def m{method_index}(self):")
+            lines.append(f"        return self.m{method_index + 1}()")
+            lines.append("")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _bench(class_count: int) -> float:
+    statements = list(parse(_module(class_count)))
+
+    start = time.perf_counter()
+    for statement in statements:
+        if isinstance(statement.node, ast.ClassDef):
+            _, body = split_class(statement)
+            assert len(body) == 10
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    print(f"{'classes':>10} {'seconds':>10} {'us/class':>10}")
+    for class_count in (250, 500, 1000, 2000, 4000):
+        elapsed = _bench(class_count)
+        per_class = elapsed / class_count * 1e6
+        print(f"{class_count:>10} {elapsed:>10.4f} {per_class:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 """
 The python source code statement sorter.
 """
+
+from typing import TYPE_CHECKING
+
 from ssort._exceptions import (
     DecodingError,
     ParseError,
@@ -8,7 +11,9 @@ from ssort._exceptions import (
     UnknownEncodingError,
     WildcardImportError,
 )
-from ssort._ssort import ssort
+
+if TYPE_CHECKING:
+    from ssort._ssort import SortResult, ssort, ssort_result
 
 # Let linting tools know that we do mean to re-export exception classes.
 assert DecodingError is not None
@@ -18,4 +23,20 @@ assert UnknownEncodingError is not None
 assert WildcardImportError is not None
 
 __version__ = "0.11.6"
-__all__ = ["ssort"]
+__all__ = ["SortResult", "ssort", "ssort_result"]
+
+
+def __getattr__(name):
+    # The sorter is only imported when it is first used, so that the command
+    # line tool can hand runs to a daemon without loading it.
+    if name in __all__:
+        from ssort import _ssort
+
+        value = getattr(_ssort, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
@@ -0,0 +1,556 @@
+from __future__ import annotations
+
+import ast
+import dataclasses
+import enum
+import sys
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+from ssort._ast import iter_child_nodes
+from ssort._builtins import CLASS_BUILTINS
+
+
+class Scope(enum.Enum):
+    LOCAL = "LOCAL"
+    NONLOCAL = "NONLOCAL"
+    GLOBAL = "GLOBAL"
+
+
+class Requirement(NamedTuple):
+    """
+    A name that a statement references but does not bind itself.
+
+    Requirements are plain tuples so that creating and hashing them is cheap.
+    Each statement reports a requirement at most once for each combination of
+    name, deferral and scope, positioned at the first place it occurs.
+    """
+
+    name: str
+    lineno: int
+    col_offset: int
+    deferred: bool = False
+    scope: Scope = Scope.LOCAL
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class LexicalScope:
+    """
+    A node in the tree of scopes within a statement.
+
+    :param node:
+        The node that introduces the scope.  Either the statement itself, for
+        the root of the tree, or a function, lambda, class or comprehension.
+    :param bindings:
+        The names bound directly within the scope.  For functions and lambdas
+        this includes the names of arguments.
+    :param requirements:
+        Requirements made from within the scope, or from scopes nested inside
+        it, that the scope does not resolve itself.
+    :param children:
+        The scopes nested directly inside this one.
+    """
+
+    node: ast.AST
+    bindings: tuple[str, ...]
+    requirements: tuple[Requirement, ...]
+    children: tuple[LexicalScope, ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class Analysis:
+    """
+    The results of analysing a single statement.
+
+    :param bindings:
+        The names bound by the statement.
+    :param requirements:
+        The names referenced by the statement that it does not bind itself.
+    :param method_requirements:
+        If the statement is a function definition, the attributes of its first
+        argument that it depends on.
+    :param scope:
+        The root of the tree of scopes within the statement.  Its bindings and
+        requirements are the same as those of the statement.
+    :param body:
+        If the statement is a class definition, the analyses of the statements
+        in its body, in order.  These are the same as the results of analysing
+        each of those statements on its own.
+    """
+
+    bindings: tuple[str, ...]
+    requirements: tuple[Requirement, ...]
+    method_requirements: tuple[str, ...]
+    scope: LexicalScope
+    body: tuple[Analysis, ...] = ()
+
+
+def _merge_requirements(
+    requirements: Iterable[Requirement],
+) -> tuple[Requirement, ...]:
+    merged: dict[tuple[str, bool, Scope], Requirement] = {}
+    for requirement in requirements:
+        merged.setdefault(
+            (requirement.name, requirement.deferred, requirement.scope),
+            requirement,
+        )
+    return tuple(merged.values())
+
+
+def _get_argument_names(args: ast.arguments) -> list[str]:
+    names: list[str] = []
+    names.extend(arg.arg for arg in args.posonlyargs)
+    names.extend(arg.arg for arg in args.args)  # Arghhh.
+    if args.vararg:
+        names.append(args.vararg.arg)
+    names.extend(arg.arg for arg in args.kwonlyargs)
+    if args.kwarg:
+        names.append(args.kwarg.arg)
+    return names
+
+
+class _Analyzer:
+    """
+    Builds the tree of scopes within a statement, and from it the statement's
+    bindings, requirements and method requirements, in a single traversal of
+    its syntax tree.
+
+    Rather than having each visitor yield its results up a chain of nested
+    generators, handlers append to three shared accumulators.  When a handler
+    reaches a scope boundary it notes the length of the accumulators before
+    visiting the body of the scope, moves everything added after that point
+    into a new `LexicalScope`, and then passes only the requirements that the
+    scope leaves unresolved back to the enclosing scope.  Each node is visited
+    exactly once, however deeply scopes are nested.
+
+    The statements in the body of a class definition are sorted separately,
+    so if the statement is a class definition then the results for each
+    statement in its body, and for the bodies of any classes nested directly
+    inside it, are also captured on the way out of that statement.
+    """
+
+    def __init__(self, root: ast.AST) -> None:
+        self.bindings: list[str] = []
+        self.requirements: list[Requirement] = []
+        self.method_requirements: list[str] = []
+        self.scopes: list[LexicalScope] = []
+
+        self._root = root
+        self._self_name: str | None = None
+
+        # The member of a class body that is about to be visited, and the
+        # analyses of the members of class bodies that have been visited.
+        self._member: ast.AST | None = None
+        self._bodies: dict[ast.AST, tuple[Analysis, ...]] = {}
+
+    def _analysis(
+        self,
+        node: ast.AST,
+        bindings: list[str],
+        requirements: list[Requirement],
+        method_requirements: list[str],
+        scopes: list[LexicalScope],
+    ) -> Analysis:
+        scope = LexicalScope(
+            node=node,
+            bindings=tuple(bindings),
+            requirements=_merge_requirements(requirements),
+            children=tuple(scopes),
+        )
+        return Analysis(
+            bindings=scope.bindings,
+            requirements=scope.requirements,
+            method_requirements=tuple(method_requirements),
+            scope=scope,
+            body=self._bodies.pop(node, ()),
+        )
+
+    def result(self) -> Analysis:
+        return self._analysis(
+            self._root,
+            self.bindings,
+            self.requirements,
+            self.method_requirements,
+            self.scopes,
+        )
+
+    def _is_statement(self, node: ast.AST) -> bool:
+        # Returns true if `node` is the statement being analysed, or a
+        # statement that will be sorted as part of the body of a class.
+        return node is self._root or node is self._member
+
+    def _dispatch(self, node: ast.AST) -> Optional[Iterator[ast.AST]]:
+        return _HANDLERS.get(type(node), _Analyzer._visit_generic)(self, node)
+
+    def visit(self, root: ast.AST) -> None:
+        """
+        Visits a node and everything beneath it.
+
+        Handlers that need to visit the children of a node are generators
+        that yield each child in turn, and are resumed once that child has
+        been fully visited.  Suspended handlers are kept on an explicit stack
+        so that very deeply nested expressions, such as long chains of binary
+        operators, do not use up the python stack.
+        """
+        stack: list[Iterator[ast.AST]] = []
+
+        children = self._dispatch(root)
+        if children is not None:
+            stack.append(children)
+
+        while stack:
+            try:
+                node = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+                continue
+
+            children = self._dispatch(node)
+            if children is not None:
+                stack.append(children)
+
+    def _filter_requirements(self, start: int, excluded: set[str]) -> None:
+        self.requirements[start:] = [
+            requirement
+            for requirement in self.requirements[start:]
+            if requirement.name not in excluded
+        ]
+
+    def _pop_bindings(self, start: int) -> list[str]:
+        bindings = self.bindings[start:]
+        del self.bindings[start:]
+        return bindings
+
+    def _pop_requirements(self, start: int) -> list[Requirement]:
+        requirements = self.requirements[start:]
+        del self.requirements[start:]
+        return requirements
+
+    def _push_scope(self) -> list[LexicalScope]:
+        parent_scopes, self.scopes = self.scopes, []
+        return parent_scopes
+
+    def _pop_scope(
+        self,
+        parent_scopes: list[LexicalScope],
+        node: ast.AST,
+        bindings: list[str],
+        requirements: list[Requirement],
+    ) -> LexicalScope:
+        scope = LexicalScope(
+            node=node,
+            bindings=tuple(bindings),
+            requirements=_merge_requirements(requirements),
+            children=tuple(self.scopes),
+        )
+        self.scopes = parent_scopes
+        self.scopes.append(scope)
+        return scope
+
+    def _visit_generic(self, node: ast.AST) -> Iterator[ast.AST]:
+        return iter(iter_child_nodes(node))
+
+    def _visit_function_def(
+        self, node: ast.FunctionDef | ast.AsyncFunctionDef
+    ) -> Iterator[ast.AST]:
+        yield from node.decorator_list
+        self.bindings.append(node.name)
+        yield node.args
+        if node.returns is not None:
+            yield node.returns
+
+        # Attribute accesses on `self` are only interesting in the body of the
+        # statement being analysed.  Nested functions are just part of it.
+        is_method = self._is_statement(node) and bool(node.args.args)
+        if is_method:
+            self._self_name = node.args.args[0].arg
+
+        parent_scopes = self._push_scope()
+        bindings_start = len(self.bindings)
+        requirements_start = len(self.requirements)
+
+        yield from node.body
+
+        if is_method:
+            self._self_name = None
+
+        bindings = _get_argument_names(node.args)
+        bindings += self._pop_bindings(bindings_start)
+        bound = set(bindings)
+
+        unresolved = []
+        for requirement in self._pop_requirements(requirements_start):
+            if requirement.scope == Scope.LOCAL and requirement.name in bound:
+                continue
+
+            if requirement.scope == Scope.NONLOCAL:
+                requirement = requirement._replace(
+                    deferred=True, scope=Scope.LOCAL
+                )
+            elif not requirement.deferred:
+                requirement = requirement._replace(deferred=True)
+
+            unresolved.append(requirement)
+
+        scope = self._pop_scope(parent_scopes, node, bindings, unresolved)
+        self.requirements.extend(scope.requirements)
+
+    def _visit_class_def(self, node: ast.ClassDef) -> Iterator[ast.AST]:
+        is_statement = self._is_statement(node)
+
+        # Attribute accesses within nested classes refer to a different `self`.
+        self_name, self._self_name = self._self_name, None
+
+        yield from node.decorator_list
+        yield from node.bases
+
+        # Keyword arguments (for example `metaclass=...`) can bind names but
+        # are not considered to be requirements.
+        requirements_start = len(self.requirements)
+        for keyword in node.keywords:
+            yield keyword.value
+        del self.requirements[requirements_start:]
+
+        self.bindings.append(node.name)
+
+        parent_scopes = self._push_scope()
+
+        # Class level statements can only see bindings made by statements
+        # that come before them.
+        bindings: list[str] = []
+        bound = set(CLASS_BUILTINS)
+        unresolved: list[Requirement] = []
+        body: list[Analysis] = []
+        for statement in node.body:
+            bindings_start = len(self.bindings)
+            requirements_start = len(self.requirements)
+            method_requirements_start = len(self.method_requirements)
+            scopes_start = len(self.scopes)
+            if is_statement:
+                self._member = statement
+
+            yield statement
+
+            statement_requirements = self._pop_requirements(requirements_start)
+            unresolved.extend(
+                requirement
+                for requirement in statement_requirements
+                if requirement.deferred or requirement.name not in bound
+            )
+
+            statement_bindings = self._pop_bindings(bindings_start)
+            bindings += statement_bindings
+            bound.update(statement_bindings)
+
+            if is_statement:
+                body.append(
+                    self._analysis(
+                        statement,
+                        statement_bindings,
+                        statement_requirements,
+                        self.method_requirements[method_requirements_start:],
+                        self.scopes[scopes_start:],
+                    )
+                )
+                del self.method_requirements[method_requirements_start:]
+
+        if is_statement:
+            self._bodies[node] = tuple(body)
+
+        scope = self._pop_scope(parent_scopes, node, bindings, unresolved)
+        self.requirements.extend(scope.requirements)
+
+        self._self_name = self_name
+
+    def _visit_for(self, node: ast.For | ast.AsyncFor) -> Iterator[ast.AST]:
+        bindings_start = len(self.bindings)
+
+        yield node.target
+        yield node.iter
+
+        requirements_start = len(self.requirements)
+        yield from node.body
+        yield from node.orelse
+
+        self._filter_requirements(
+            requirements_start, set(self.bindings[bindings_start:])
+        )
+
+    def _visit_with(self, node: ast.With | ast.AsyncWith) -> Iterator[ast.AST]:
+        bindings_start = len(self.bindings)
+
+        yield from node.items
+
+        requirements_start = len(self.requirements)
+        yield from node.body
+
+        self._filter_requirements(
+            requirements_start, set(self.bindings[bindings_start:])
+        )
+
+    def _visit_scope_declaration(
+        self, node: ast.Global | ast.Nonlocal, scope: Scope
+    ) -> None:
+        for name in node.names:
+            self.bindings.append(name)
+            self.requirements.append(
+                Requirement(
+                    name=name,
+                    lineno=node.lineno,
+                    col_offset=node.col_offset,
+                    scope=scope,
+                )
+            )
+
+    def _visit_global(self, node: ast.Global) -> None:
+        self._visit_scope_declaration(node, Scope.GLOBAL)
+
+    def _visit_nonlocal(self, node: ast.Nonlocal) -> None:
+        self._visit_scope_declaration(node, Scope.NONLOCAL)
+
+    def _visit_lambda(self, node: ast.Lambda) -> Iterator[ast.AST]:
+        yield node.args
+
+        parent_scopes = self._push_scope()
+        bindings_start = len(self.bindings)
+        requirements_start = len(self.requirements)
+
+        yield node.body
+
+        bindings = _get_argument_names(node.args)
+        bindings += self._pop_bindings(bindings_start)
+        bound = set(bindings)
+
+        unresolved = [
+            requirement
+            for requirement in self._pop_requirements(requirements_start)
+            if requirement.name not in bound
+        ]
+
+        scope = self._pop_scope(parent_scopes, node, bindings, unresolved)
+        self.requirements.extend(scope.requirements)
+
+    def _visit_comprehension(self, node: ast.AST) -> Iterator[ast.AST]:
+        parent_scopes = self._push_scope()
+        bindings_start = len(self.bindings)
+        requirements_start = len(self.requirements)
+
+        yield from iter_child_nodes(node)
+
+        # Unlike other scopes, names bound in comprehensions are also treated
+        # as bindings of the enclosing statement.
+        bindings = self.bindings[bindings_start:]
+        bound = set(bindings)
+
+        unresolved = [
+            requirement
+            for requirement in self._pop_requirements(requirements_start)
+            if requirement.name not in bound
+        ]
+
+        scope = self._pop_scope(parent_scopes, node, bindings, unresolved)
+        self.requirements.extend(scope.requirements)
+
+    def _visit_import(self, node: ast.Import) -> None:
+        for name in node.names:
+            if name.asname:
+                self.bindings.append(name.asname)
+            else:
+                root, *rest = name.name.split(".", 1)
+                self.bindings.append(root)
+
+    def _visit_import_from(self, node: ast.ImportFrom) -> None:
+        for name in node.names:
+            self.bindings.append(name.asname if name.asname else name.name)
+
+    def _visit_name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Store):
+            self.bindings.append(node.id)
+        elif isinstance(node.ctx, (ast.Load, ast.Del)):
+            self.requirements.append(
+                Requirement(
+                    name=node.id,
+                    lineno=node.lineno,
+                    col_offset=node.col_offset,
+                )
+            )
+
+    def _visit_attribute(self, node: ast.Attribute) -> Iterator[ast.AST]:
+        yield node.value
+        if (
+            self._self_name is not None
+            and isinstance(node.ctx, ast.Load)
+            and isinstance(node.value, ast.Name)
+            and node.value.id == self._self_name
+        ):
+            self.method_requirements.append(node.attr)
+
+    def _visit_except_handler(
+        self, node: ast.ExceptHandler
+    ) -> Iterator[ast.AST]:
+        if node.type is not None:
+            yield node.type
+        if node.name:
+            self.bindings.append(node.name)
+        yield from node.body
+
+    if sys.version_info >= (3, 10):
+
+        def _visit_match_star(self, node: ast.MatchStar) -> None:
+            if node.name is not None:
+                self.bindings.append(node.name)
+
+        def _visit_match_mapping(
+            self, node: ast.MatchMapping
+        ) -> Iterator[ast.AST]:
+            yield from node.keys
+            yield from node.patterns
+            if node.rest is not None:
+                self.bindings.append(node.rest)
+
+        def _visit_match_as(self, node: ast.MatchAs) -> Iterator[ast.AST]:
+            if node.pattern is not None:
+                yield node.pattern
+            if node.name is not None:
+                self.bindings.append(node.name)
+
+
+_HANDLERS: dict[type[ast.AST], Callable[..., Optional[Iterator[ast.AST]]]] = {
+    ast.FunctionDef: _Analyzer._visit_function_def,
+    ast.AsyncFunctionDef: _Analyzer._visit_function_def,
+    ast.ClassDef: _Analyzer._visit_class_def,
+    ast.For: _Analyzer._visit_for,
+    ast.AsyncFor: _Analyzer._visit_for,
+    ast.With: _Analyzer._visit_with,
+    ast.AsyncWith: _Analyzer._visit_with,
+    ast.Global: _Analyzer._visit_global,
+    ast.Nonlocal: _Analyzer._visit_nonlocal,
+    ast.Lambda: _Analyzer._visit_lambda,
+    ast.ListComp: _Analyzer._visit_comprehension,
+    ast.SetComp: _Analyzer._visit_comprehension,
+    ast.DictComp: _Analyzer._visit_comprehension,
+    ast.GeneratorExp: _Analyzer._visit_comprehension,
+    ast.Import: _Analyzer._visit_import,
+    ast.ImportFrom: _Analyzer._visit_import_from,
+    ast.Name: _Analyzer._visit_name,
+    ast.Attribute: _Analyzer._visit_attribute,
+    ast.ExceptHandler: _Analyzer._visit_except_handler,
+}
+
+if sys.version_info >= (3, 10):
+    _HANDLERS.update(
+        {
+            ast.MatchStar: _Analyzer._visit_match_star,
+            ast.MatchMapping: _Analyzer._visit_match_mapping,
+            ast.MatchAs: _Analyzer._visit_match_as,
+        }
+    )
+
+
+def analyze(node: ast.AST) -> Analysis:
+    """
+    Returns the bindings, requirements, method requirements and tree of scopes
+    of a statement, computed in a single pass over its syntax tree.
+    """
+    analyzer = _Analyzer(node)
+    analyzer.visit(node)
+    return analyzer.result()
@@ -0,0 +1,442 @@
+"""
+A cache of the results of sorting files, kept between runs of the command
+line tool so that files that have not changed do not need to be parsed again.
+
+Entries are keyed by a hash of the contents of a file and the version of
+ssort, and record whether the file was already sorted or could not be
+sorted, along with any diagnostics reported while sorting it.  Nothing in
+an entry depends on the path that the file was read from.
+
+Entries are kept in a store: a directory, which may be shared between
+machines, an HTTP server, or a combination of the two.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import http.client
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from ssort import __version__
+
+DEFAULT_MAX_SIZE = 256 << 20
+
+# Bumped whenever the format of entries, or the meaning of the options that
+# results depend on, changes.
+_FORMAT_VERSION = 1
+
+# Entries are only marked as recently used if they have not been for this
+# many seconds, so that most cache hits do not need to write anything.
+_TOUCH_INTERVAL = 60 * 60
+
+# Directories are only scanned for entries to evict if they have not been for
+# this many seconds, so that most runs do not need to look at every entry.
+_TRIM_INTERVAL = 60 * 60
+
+# The file in a cache directory whose modification time records when it was
+# last scanned for entries to evict.
+_TRIM_STAMP = "trimmed"
+
+Diagnostic = Tuple[Any, ...]
+Entry = Tuple[str, List[Diagnostic]]
+
+
+def default_cache_dir() -> pathlib.Path:
+    """
+    Returns the directory that results are cached in if none is given, under
+    the standard location for per-user caches on the current platform.
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA")
+        if base:
+            return pathlib.Path(base) / "ssort" / "Cache"
+        return pathlib.Path.home() / "AppData" / "Local" / "ssort" / "Cache"
+
+    if sys.platform == "darwin":
+        return pathlib.Path.home() / "Library" / "Caches" / "ssort"
+
+    base = os.environ.get("XDG_CACHE_HOME")
+    if base:
+        return pathlib.Path(base) / "ssort"
+    return pathlib.Path.home() / ".cache" / "ssort"
+
+
+def content_key(data: bytes) -> str:
+    """
+    Returns the key under which the result of sorting a file with the given
+    contents is cached.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(f"ssort {__version__} {_FORMAT_VERSION}\0".encode())
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+class Store(Protocol):
+    """
+    Somewhere to keep encoded cache entries.
+
+    Stores map keys, as returned by `content_key`, to the bytes of an entry.
+    They should treat any error as a missing entry rather than raising, and
+    must be safe to use from several threads and, after being pickled, from
+    several processes at once.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the entry stored for `key`, or `None` if there is none.
+        """
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Stores `data` as the entry for `key`, replacing any existing entry.
+        """
+
+    def trim(self) -> None:
+        """
+        Evicts old entries, if the store has grown too large.
+        """
+
+
+def _disk_usage(stat: os.stat_result) -> int:
+    blocks = getattr(stat, "st_blocks", None)
+    if blocks is None:
+        return stat.st_size
+    return blocks * 512
+
+
+class DirectoryStore:
+    """
+    Stores entries as one small file each in a directory.
+
+    The directory can be shared, for example on a network file system or a
+    cache volume that is mounted into CI jobs.  Entries are written to a
+    temporary file and then renamed into place, so concurrent runs, and the
+    worker processes of a single run, never see an entry that has only been
+    partly written.  Errors reading or writing the directory are ignored,
+    and treated as a cache miss.
+
+    The directory is kept to roughly `max_size` bytes of disk space by
+    `trim`, which evicts the entries that were least recently used.  It can
+    grow past `max_size` by however much is written between trims.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, os.PathLike[str]],
+        *,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        self.directory = pathlib.Path(directory)
+        self.max_size = max_size
+
+    def _entry_path(self, key: str) -> pathlib.Path:
+        return self.directory / key[:2] / key[2:]
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+                mtime = os.fstat(file.fileno()).st_mtime
+        except OSError:
+            return None
+
+        if time.time() - mtime > _TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        except OSError:
+            return
+
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+    def trim(self) -> None:
+        """
+        Evicts the least recently used entries until the directory takes up
+        no more than three quarters of `max_size`, if it has grown larger
+        than `max_size`.
+
+        Working out the size of the directory means looking at every entry,
+        so this does nothing if the directory was already checked, by any
+        process, in the last hour.  Entries are only ever removed whole, so
+        it is safe for other processes to use the directory while it is
+        being trimmed.
+        """
+        stamp = self.directory / _TRIM_STAMP
+        try:
+            if time.time() - stamp.stat().st_mtime < _TRIM_INTERVAL:
+                return
+        except OSError:
+            pass
+
+        # The stamp is updated before scanning so that runs that finish at
+        # the same time do not all scan the directory.
+        try:
+            stamp.touch()
+        except OSError:
+            return
+
+        entries = []
+        total = 0
+        try:
+            shards = list(os.scandir(self.directory))
+        except OSError:
+            return
+
+        for shard in shards:
+            if len(shard.name) != 2 or not shard.is_dir():
+                continue
+            try:
+                shard_entries = list(os.scandir(shard.path))
+            except OSError:
+                continue
+            for entry in shard_entries:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                size = _disk_usage(stat)
+                total += size
+                entries.append((stat.st_mtime, size, entry.path))
+
+        if total <= self.max_size:
+            return
+
+        entries.sort()
+        target = self.max_size * 3 // 4
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+
+
+class HTTPStore:
+    """
+    Stores entries on an HTTP server, at `url` followed by the key.
+
+    Entries are read with `GET`, which should return 404 for keys that the
+    server does not have, and written with `PUT`.  A user name and password
+    in the url are sent using basic authentication.  Keys depend only on the
+    contents of files, so any server that can store and return blobs, such
+    as a bucket or a build cache, can be shared by every machine that runs
+    ssort.  The server is responsible for evicting old entries.
+
+    Connections are kept open between requests, one per thread.  If the
+    server can not be reached, or returns an error, the store stops making
+    requests for the rest of the run, so that an outage does not slow every
+    file down by `timeout` seconds.
+    """
+
+    def __init__(self, url: str, *, timeout: float = 5.0) -> None:
+        parts = urllib.parse.urlsplit(url)
+        host = parts.hostname
+        if parts.scheme not in ("http", "https") or not host:
+            raise ValueError(f"invalid cache url {url!r}")
+        if parts.query or parts.fragment:
+            raise ValueError(f"cache url {url!r} can not have a query")
+
+        self.url = url
+        self.timeout = timeout
+        self._scheme = parts.scheme
+        self._host = host
+        self._port = parts.port
+        self._path = parts.path.rstrip("/") + "/"
+        self._headers = {}
+        if parts.username is not None:
+            credentials = f"{urllib.parse.unquote(parts.username)}:"
+            if parts.password is not None:
+                credentials += urllib.parse.unquote(parts.password)
+            self._headers["Authorization"] = "Basic " + base64.b64encode(
+                credentials.encode("utf-8")
+            ).decode("ascii")
+        self._local = threading.local()
+        self._failed = False
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self._scheme == "https":
+                connection = http.client.HTTPSConnection(
+                    self._host, self._port, timeout=self.timeout
+                )
+            else:
+                connection = http.client.HTTPConnection(
+                    self._host, self._port, timeout=self.timeout
+                )
+            self._local.connection = connection
+        return connection
+
+    def _request(
+        self, method: str, key: str, body: Optional[bytes] = None
+    ) -> Optional[Tuple[int, bytes]]:
+        if self._failed:
+            return None
+
+        headers = dict(self._headers)
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+
+        # A connection that was kept open may have been closed by the server
+        # since it was last used, so requests are retried once on a new one.
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(
+                    method, self._path + key, body=body, headers=headers
+                )
+                response = connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                self._local.connection = None
+                continue
+            if response.status >= 500:
+                break
+            return response.status, data
+
+        self._failed = True
+        return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        response = self._request("GET", key)
+        if response is None:
+            return None
+        status, data = response
+        if status != 200:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self._request("PUT", key, data)
+
+    def trim(self) -> None:
+        pass
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Connections can not be sent to other processes.  Each worker opens
+        # its own.
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+
+class LayeredStore:
+    """
+    Combines several stores, typically a fast local one in front of a shared
+    one.
+
+    Entries are read from the first store that has them, and copied into the
+    stores in front of it.  They are written to every store.
+    """
+
+    def __init__(self, stores: Sequence[Store]) -> None:
+        self.stores = list(stores)
+
+    def get(self, key: str) -> Optional[bytes]:
+        for index, store in enumerate(self.stores):
+            data = store.get(key)
+            if data is not None:
+                for missed in self.stores[:index]:
+                    missed.put(key, data)
+                return data
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        for store in self.stores:
+            store.put(key, data)
+
+    def trim(self) -> None:
+        for store in self.stores:
+            store.trim()
+
+
+class ResultCache:
+    """
+    Results of sorting files, encoded as entries in a store.
+
+    Entries that can not be decoded, for example because they were
+    corrupted, are treated as a cache miss.
+    """
+
+    def __init__(self, store: Store) -> None:
+        self.store = store
+
+    def get(self, key: str) -> Optional[Entry]:
+        """
+        Returns the status and diagnostics cached for `key`, or `None` if
+        there is no entry for it.
+        """
+        data = self.store.get(key)
+        if data is None:
+            return None
+
+        try:
+            entry = json.loads(data)
+            status = entry["status"]
+            diagnostics = [tuple(diagnostic) for diagnostic in entry["diag"]]
+        except (ValueError, KeyError, TypeError):
+            return None
+
+        return status, diagnostics
+
+    def put(
+        self, key: str, status: str, diagnostics: List[Diagnostic]
+    ) -> None:
+        """
+        Caches the status and diagnostics of sorting the file with the given
+        key.
+        """
+        data = json.dumps(
+            {"status": status, "diag": diagnostics}, separators=(",", ":")
+        ).encode("utf-8")
+        self.store.put(key, data)
+
+    def trim(self) -> None:
+        """
+        Evicts old entries from the store, if it has grown too large.
+        """
+        self.store.trim()
@@ -0,0 +1,147 @@
+"""
+The client side of `ssortd`, used by the command line tool to hand runs to a
+daemon that already has everything loaded.
+
+Requests and responses are single lines of JSON, sent over a Unix socket.
+This module is imported on every run of the command line tool, so it must
+stay cheap to import.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import stat
+import sys
+from typing import Any, Dict, List, Optional
+
+from ssort import __version__
+
+# How long, in seconds, to wait for the daemon to accept a connection, and
+# then for it to answer or to start a run.  Runs themselves can take as long
+# as they need to.
+_TIMEOUT = 5.0
+
+
+def default_socket_path() -> Optional[str]:
+    """
+    Returns the path of the socket that `ssortd` listens on if none is
+    given, or `None` on platforms without Unix sockets.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "ssort", "ssortd.sock")
+
+    temp_dir = os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(temp_dir, f"ssort-{os.getuid()}", "ssortd.sock")
+
+
+def private_directory(directory: str) -> bool:
+    """
+    Returns `True` if `directory` is a directory, and not a link to one, that
+    belongs to the current user and that no other user can access.
+
+    The daemon runs files as the user that started it, and is trusted to
+    report on them, so its socket must be somewhere that no other user could
+    have put one.
+    """
+    try:
+        directory_stat = os.lstat(directory)
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(directory_stat.st_mode)
+        and directory_stat.st_uid == os.getuid()
+        and not directory_stat.st_mode & 0o077
+    )
+
+
+def _private_socket(socket_path: str) -> bool:
+    if not private_directory(os.path.dirname(socket_path) or "."):
+        return False
+    try:
+        socket_stat = os.lstat(socket_path)
+    except OSError:
+        return False
+    return (
+        stat.S_ISSOCK(socket_stat.st_mode)
+        and socket_stat.st_uid == os.getuid()
+    )
+
+
+def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        response = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(response, dict) or "error" in response:
+        return None
+    return response
+
+
+def request(
+    socket_path: str,
+    message: Dict[str, Any],
+    *,
+    timeout: float = _TIMEOUT,
+) -> Optional[Dict[str, Any]]:
+    """
+    Sends a request to the daemon listening on `socket_path` and returns its
+    response.
+
+    Returns `None` if there is no daemon listening, if its socket, or the
+    directory that it is in, could belong to another user, if it could not
+    handle the request, for example because it is running a different version of
+    ssort or is busy with another run, or if it does not answer within
+    `timeout` seconds.  Once the daemon has started a run, this waits for it
+    to finish however long it takes, as it may already have written files.
+    """
+    if not _private_socket(socket_path):
+        return None
+
+    message = {"version": __version__, **message}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as file:
+                response = _decode(file.readline())
+                if response == {"started": True}:
+                    sock.settimeout(None)
+                    response = _decode(file.readline())
+    except OSError:
+        return None
+
+    return response
+
+
+def run_in_daemon(
+    argv: List[str], *, prog: str, socket_path: Optional[str] = None
+) -> Optional[int]:
+    """
+    Runs the command line tool with the given arguments in a daemon, writing
+    its output to stdout and stderr.
+
+    Returns the exit status of the run, or `None` if there is no daemon to run
+    it in, in which case the caller should run it itself.
+    """
+    if socket_path is None:
+        socket_path = default_socket_path()
+        if socket_path is None:
+            return None
+
+    response = request(
+        socket_path,
+        {"op": "run", "prog": prog, "argv": argv, "cwd": os.getcwd()},
+    )
+    if response is None:
+        return None
+
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["returncode"]
@@ -0,0 +1,367 @@
+"""
+`ssortd`, a daemon that keeps ssort loaded so that sorting a file does not
+have to wait for an interpreter to start and import it first.
+
+The daemon listens on a Unix socket, which the command line tool hands whole
+runs to, and can also listen for HTTP requests on the loopback interface,
+for editors and other tools that only need to sort text.  Both use the same
+requests, which are JSON objects with an `op` field:
+
+`{"op": "sort", "source": ..., "filename": ..., "mode": ...}`
+    Sorts the source text, as the command line tool does for each request in
+    batch mode, returning its `status`, the `messages` that the command line
+    tool would have reported for it, and the sorted `output` or a `diff`
+    depending on the mode.
+
+`{"op": "run", "argv": [...], "cwd": ..., "prog": ...}`
+    Runs the command line tool, returning its `stdout`, `stderr` and
+    `returncode`.  As this reads and writes files as the user that the
+    daemon belongs to, it is only accepted over the Unix socket, which no
+    other user can connect to.  Runs happen one at a time, and are refused
+    if the run before them does not finish within a second.  The daemon
+    sends `{"started": true}` when a run starts, before its response, so
+    that the client knows not to give up on it and run it itself.
+
+Requests can include the `version` of ssort that they expect, and are
+refused if the daemon is running a different one.  Errors are returned as an
+object with an `error` field.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import http.server
+import io
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional, TextIO
+
+from ssort import __version__, _main
+from ssort._client import default_socket_path, private_directory
+
+# How long, in seconds, a run waits for the run before it to finish before it
+# is refused.  This must be shorter than the time that the client waits for
+# a run to start.
+_RUN_WAIT = 1.0
+
+
+@contextlib.contextmanager
+def _redirect_stdin(stream: TextIO) -> Iterator[None]:
+    previous = sys.stdin
+    sys.stdin = stream
+    try:
+        yield
+    finally:
+        sys.stdin = previous
+
+
+class Daemon:
+    """
+    Handles requests, independently of how they were received.
+    """
+
+    def __init__(
+        self,
+        *,
+        mp_context: Optional[multiprocessing.context.BaseContext] = None,
+    ) -> None:
+        self._mp_context = mp_context
+        # Runs depend on the working directory, and write to stdout and
+        # stderr, all of which are shared by the whole process.
+        self._run_lock = threading.Lock()
+
+    def _sort(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return _main._sort_request(request)
+
+    def _run(
+        self, request: Dict[str, Any], started: Callable[[], None]
+    ) -> Dict[str, Any]:
+        argv = request.get("argv")
+        cwd = request.get("cwd")
+        prog = request.get("prog")
+        if (
+            not isinstance(argv, list)
+            or not all(isinstance(arg, str) for arg in argv)
+            or not isinstance(cwd, str)
+            or not isinstance(prog, (str, type(None)))
+        ):
+            return {"error": "expected arguments and a working directory"}
+
+        stdin = io.TextIOWrapper(io.BytesIO())
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        # Rather than keeping the client waiting, busy daemons leave it to
+        # run the files itself.
+        if not self._run_lock.acquire(timeout=_RUN_WAIT):
+            return {"error": "busy"}
+        try:
+            started()
+            previous_cwd = os.getcwd()
+            try:
+                os.chdir(cwd)
+            except OSError as exc:
+                return {"error": f"can not change directory: {exc}"}
+            try:
+                with contextlib.ExitStack() as stack:
+                    # Runs can not read the stdin of the client.
+                    stack.enter_context(_redirect_stdin(stdin))
+                    stack.enter_context(contextlib.redirect_stdout(stdout))
+                    stack.enter_context(contextlib.redirect_stderr(stderr))
+
+                    parser = _main._make_argument_parser(prog)
+                    args = parser.parse_args(argv)
+                    _main._sort_files(
+                        parser, args, mp_context=self._mp_context
+                    )
+            except SystemExit as exc:
+                returncode = 0 if exc.code is None else exc.code
+            except Exception as exc:
+                # The client will run the files itself, and report the error
+                # properly.
+                return {"error": f"run failed: {exc}"}
+            else:
+                returncode = 0
+            finally:
+                os.chdir(previous_cwd)
+        finally:
+            self._run_lock.release()
+
+        return {
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+            "returncode": returncode,
+        }
+
+    def handle(
+        self,
+        request: Any,
+        *,
+        allow_run: bool = False,
+        started: Callable[[], None] = lambda: None,
+    ) -> Dict[str, Any]:
+        """
+        Returns the response to a request.  Runs of the command line tool are
+        only handled if `allow_run` is set, in which case `started` is called
+        when one starts.
+        """
+        if not isinstance(request, dict):
+            return {"error": "expected an object"}
+
+        version = request.get("version", __version__)
+        if version != __version__:
+            return {"error": f"ssortd is running version {__version__}"}
+
+        op = request.get("op")
+        if op == "sort":
+            return self._sort(request)
+        if op == "run" and allow_run:
+            return self._run(request, started)
+        return {"error": f"unsupported op {op!r}"}
+
+
+class _SocketRequestHandler(socketserver.StreamRequestHandler):
+    server: SocketServer
+
+    def _started(self) -> None:
+        self.wfile.write(b'{"started": true}\n')
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response = {"error": "invalid json"}
+        else:
+            response = self.server.daemon.handle(
+                request, allow_run=True, started=self._started
+            )
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class SocketServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    Serves a daemon on a Unix socket, one request per connection.
+
+    The socket is made accessible only to the user that owns it, and must be
+    in a directory that is private to them, which is created if needed.
+    """
+
+    address_family = getattr(socket, "AF_UNIX", -1)
+    allow_reuse_address = False
+    daemon_threads = True
+
+    def __init__(self, path: str, daemon: Daemon) -> None:
+        self.daemon = daemon
+        self.path = path
+        self._bound = False
+
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # The command line tool will not use a socket in a directory that
+        # another user could have put it in, so neither should the daemon.
+        if not private_directory(directory):
+            raise OSError(
+                f"{directory} must be a directory that only you can access"
+            )
+
+        super().__init__(path, _SocketRequestHandler)  # type: ignore
+
+    def server_bind(self) -> None:
+        # Sockets left behind by a daemon that has exited have to be removed
+        # before binding, but a socket that is still being listened on
+        # belongs to a daemon that is running.
+        with contextlib.suppress(FileNotFoundError):
+            with socket.socket(self.address_family) as probe:
+                try:
+                    probe.connect(self.path)
+                except ConnectionRefusedError:
+                    os.unlink(self.path)
+                else:
+                    raise OSError(
+                        f"ssortd is already listening on {self.path}"
+                    )
+
+        old_umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+        self._bound = True
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self._bound:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)
+
+
+class _HTTPRequestHandler(http.server.BaseHTTPRequestHandler):
+    server: HTTPServer
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _send_json(self, status: int, response: Dict[str, Any]) -> None:
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        # The body has to be read, even if it is not used, so that the next
+        # request on the connection can be.
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+
+        if self.path != "/sort":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._send_json(400, {"error": "invalid json"})
+            return
+
+        if isinstance(request, dict):
+            request = {**request, "op": "sort"}
+        response = self.server.daemon.handle(request)
+        self._send_json(400 if "error" in response else 200, response)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class HTTPServer(http.server.ThreadingHTTPServer):
+    """
+    Serves the `sort` requests of a daemon, as JSON posted to `/sort`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Any, daemon: Daemon) -> None:
+        self.daemon = daemon
+        super().__init__(address, _HTTPRequestHandler)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Keep ssort loaded in the background so that the command "
+        "line tool, and editors, can sort files without waiting for it to "
+        "start.",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        default=default_socket_path(),
+        help="Listen for the command line tool on the Unix socket at PATH.  "
+        "Defaults to the socket that the command line tool looks for.",
+    )
+    parser.add_argument(
+        "--no-socket",
+        dest="socket",
+        action="store_const",
+        const=None,
+        help="Do not listen on a Unix socket.",
+    )
+    parser.add_argument(
+        "--http",
+        metavar="PORT",
+        type=int,
+        help="Also accept requests to sort source text over HTTP, on PORT of "
+        "the loopback interface.  Port 0 picks a free port.",
+    )
+    args = parser.parse_args()
+    if args.socket is None and args.http is None:
+        parser.error("nothing to listen on")
+
+    # Worker processes are forked from a server process that has already
+    # imported ssort, rather than from the daemon, which has threads.
+    mp_context = None
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("forkserver")
+        mp_context.set_forkserver_preload(["ssort._main"])
+
+    # Stop cleanly, removing the socket, when asked to.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    daemon = Daemon(mp_context=mp_context)
+    servers: list = []
+    try:
+        if args.socket is not None:
+            servers.append(SocketServer(args.socket, daemon))
+            print(f"ssortd: listening on {args.socket}", file=sys.stderr)
+        if args.http is not None:
+            http_server = HTTPServer(("127.0.0.1", args.http), daemon)
+            servers.append(http_server)
+            print(
+                "ssortd: listening on "
+                + f"http://127.0.0.1:{http_server.server_port}/",
+                file=sys.stderr,
+            )
+    except OSError as exc:
+        for server in servers:
+            server.server_close()
+        parser.exit(1, f"ssortd: {exc}\n")
+
+    for server in servers[1:]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        servers[0].serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
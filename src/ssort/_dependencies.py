@@ -1,5 +1,5 @@
 from ssort._builtins import MODULE_BUILTINS
-from ssort._graphs import Graph
+from ssort._graphs import Graph, graph_from_edges
 
 
 def module_statements_graph(statements, *, on_unresolved, on_wildcard_import):
@@ -22,8 +22,8 @@ def module_statements_graph(statements, *, on_unresolved, on_wildcard_import):
         last `*` import.
 
     :returns:
-        A `Graph` mapping from statements to the set of statements that they
-        depend on.
+        A `Graph`, or for very large modules a `CSRGraph`, mapping from
+        statements to the set of statements that they depend on.
     """
     # A dictionary mapping from names to the statements which bind them.
     scope = {}
@@ -91,14 +91,11 @@ def module_statements_graph(statements, *, on_unresolved, on_wildcard_import):
             # something that it should depend on.
             return None
 
-    graph = Graph()
-    for statement in statements:
-        graph.add_node(statement)
-
+    edges = []
     for statement in statements:
         for requirement in statement.requirements():
             if resolved[requirement] is not None:
-                graph.add_dependency(statement, resolved[requirement])
+                edges.append((statement, resolved[requirement]))
 
     # Add links between statements that overwrite the same binding to make sure
     # that bindings are always applied in the same order.
@@ -106,20 +103,21 @@ def module_statements_graph(statements, *, on_unresolved, on_wildcard_import):
     for statement in statements:
         for name in statement.bindings():
             if name in scope:
-                graph.add_dependency(statement, scope[name])
+                edges.append((statement, scope[name]))
             scope[name] = statement
 
-    return graph
+    return graph_from_edges(statements, edges)
 
 
-def class_statements_initialisation_graph(statements):
+def class_statements_graph(statements, *, ignore_public):
     """
     Constructs a graph of the hard dependencies within a list of class level
-    statements.  These are dependencies that absolutely cannot be reordered
-    without changing the semantics of the script.
+    statements, and collects the soft, runtime dependencies between them, in a
+    single pass over their requirements.
 
-    At inititialisation, class level statements can see earlier bindings in the
-    class body.
+    Hard dependencies are those that absolutely cannot be reordered without
+    changing the semantics of the script.  At inititialisation, class level
+    statements can see earlier bindings in the class body.
 
     Note that this isn't a proper scope: variables from the containing scope are
     not shadowed until after a binding is actually made and, obviously from the
@@ -144,15 +142,31 @@ def class_statements_initialisation_graph(statements):
     If a name cannot be resolved at the class level we assume that it is
     resolved at the module level and don't emit any warning.
 
+    Soft dependencies are inferred by looking for attribute access on the
+    `self` argument of methods.  Which statement an attribute resolves to
+    depends on the order that the statements end up in if it is bound more
+    than once, so they are returned unresolved.
+
     :param statements:
         An ordered list of opaque `Statement` objects from which to construct
         the graph.
+    :param ignore_public:
+        If true, only references to private attributes, i.e attributes
+        prefixed by `_`, are collected as soft dependencies.  This leaves the
+        sorting of public methods, which make up the interface of the class,
+        to the programmer.
 
     :returns:
-        A `Graph` mapping from statements to the set of statements that they
-        depend on.
+        A `(graph, runtime_dependencies)` pair.  `graph` is a `Graph` mapping
+        from statements to the set of statements that they depend on at
+        initialisation.  `runtime_dependencies` is a list of `(statement,
+        bindings)` pairs, one for each attribute that a statement references,
+        where `bindings` lists every statement that binds that attribute in
+        their original order.
     """
     scope = {}
+    attributes = {}
+    runtime_dependencies = []
 
     graph = Graph()
 
@@ -168,48 +182,21 @@ def class_statements_initialisation_graph(statements):
 
             graph.add_dependency(statement, scope[requirement.name])
 
-        for name in statement.bindings():
-            scope[name] = statement
-
-    return graph
-
-
-def class_statements_runtime_graph(statements, *, ignore_public):
-    """
-    Attempts to construct a graph of the soft, runtime dependencies between the
-    methods of a class.
-
-    The graph is inferred by looking for attribute access on the `self` argument
-    of methods.
-
-    :param statements:
-        An ordered list of opaque `Statement` objects from which to construct
-        the graph.
-    :param ignore_public:
-        If true, the graph will only include references to private attributes,
-        i.e attributes prefixed by `_`.  This leaves the sorting of public
-        methods, which make up the interface of the class, to the programmer.
-
-    :returns:
-        A `Graph` mapping from statements to the set of statements that they
-        depend on.
-    """
-    scope = {}
-
-    graph = Graph()
-
-    for statement in statements:
-        graph.add_node(statement)
-
-        for name in statement.bindings():
-            scope[name] = statement
-
-    for statement in statements:
         for name in statement.method_requirements():
             if ignore_public and not name.startswith("_"):
                 continue
-            if name not in scope:
-                continue
-            graph.add_dependency(statement, scope[name])
+            if name not in attributes:
+                attributes[name] = []
+            runtime_dependencies.append((statement, attributes[name]))
 
-    return graph
+        for name in statement.bindings():
+            scope[name] = statement
+            if name not in attributes:
+                attributes[name] = []
+            attributes[name].append(statement)
+
+    return graph, [
+        (statement, bindings)
+        for statement, bindings in runtime_dependencies
+        if bindings
+    ]
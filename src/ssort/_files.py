@@ -2,16 +2,16 @@ from __future__ import annotations
 
 import os
 import pathlib
-from typing import Iterable
+from typing import BinaryIO, Iterable, Iterator
 
 import pathspec
 
-from ssort._utils import memoize
-
 _EMPTY_PATH_SPEC = pathspec.PathSpec([])
 
+# How much of a list of paths is read at a time.
+_READ_SIZE = 64 * 1024
+
 
-@memoize
 def _is_project_root(path: pathlib.Path) -> bool:
     if path == path.root or path == path.parent:
         return True
@@ -22,7 +22,6 @@ def _is_project_root(path: pathlib.Path) -> bool:
     return False
 
 
-@memoize
 def _get_ignore_patterns(path: pathlib.Path) -> pathspec.PathSpec:
     git_ignore = path / ".gitignore"
     if git_ignore.is_file():
@@ -32,29 +31,114 @@ def _get_ignore_patterns(path: pathlib.Path) -> pathspec.PathSpec:
     return _EMPTY_PATH_SPEC
 
 
-def is_ignored(path: str | os.PathLike) -> bool:
-    # Can't use pathlib.Path.resolve() here because we want to maintain
-    # symbolic links.
-    path = pathlib.Path(os.path.abspath(path))
+class _IgnoreChecker:
+    """
+    Checks whether paths are ignored, remembering the project roots and
+    ignore files that it finds along the way.
 
-    for part in (path, *path.parents):
-        patterns = _get_ignore_patterns(part)
-        if patterns.match_file(path.relative_to(part)):
-            return True
+    The memory is scoped to a single search for files, rather than shared by
+    the whole process, so that it can't grow without bound or go stale in
+    long running processes, and so that searches in different threads don't
+    share any state.
+    """
 
-        if _is_project_root(part):
-            return False
+    def __init__(self) -> None:
+        self._project_roots: dict[pathlib.Path, bool] = {}
+        self._ignore_patterns: dict[pathlib.Path, pathspec.PathSpec] = {}
 
-    return False
+    def _is_project_root(self, path: pathlib.Path) -> bool:
+        is_project_root = self._project_roots.get(path)
+        if is_project_root is None:
+            is_project_root = self._project_roots[path] = _is_project_root(
+                path
+            )
+        return is_project_root
+
+    def _get_ignore_patterns(self, path: pathlib.Path) -> pathspec.PathSpec:
+        patterns = self._ignore_patterns.get(path)
+        if patterns is None:
+            patterns = self._ignore_patterns[path] = _get_ignore_patterns(path)
+        return patterns
+
+    def is_ignored(self, path: str | os.PathLike) -> bool:
+        # Can't use pathlib.Path.resolve() here because we want to maintain
+        # symbolic links.
+        path = pathlib.Path(os.path.abspath(path))
+
+        for part in (path, *path.parents):
+            patterns = self._get_ignore_patterns(part)
+            if patterns.match_file(path.relative_to(part)):
+                return True
+
+            if self._is_project_root(part):
+                return False
+
+        return False
+
+
+def is_ignored(path: str | os.PathLike) -> bool:
+    return _IgnoreChecker().is_ignored(path)
+
+
+def _split_paths(data: bytes, separator: bytes) -> Iterator[str]:
+    for entry in data.split(separator):
+        if separator == b"\n" and entry.endswith(b"\r"):
+            entry = entry[:-1]
+        if entry:
+            yield os.fsdecode(entry)
+
+
+def read_paths(file: BinaryIO) -> Iterator[str]:
+    """
+    Yields the paths listed in a binary file, as soon as each one has been
+    read, so that a list can be processed while it is still being written.
+
+    Paths are separated by NUL characters if the first one is followed by
+    one, as in the output of `find -print0` or `git ls-files -z`, and by
+    newlines otherwise.  Empty entries are skipped.
+    """
+    # Reading from a pipe waits for a full buffer, but `read1` returns
+    # whatever has been written so far.
+    read = getattr(file, "read1", file.read)
+    separator = None
+    pending = b""
+    while True:
+        data = read(_READ_SIZE)
+        if not data:
+            break
+        pending += data
+
+        if separator is None:
+            nul = pending.find(b"\0")
+            newline = pending.find(b"\n")
+            if nul == -1 and newline == -1:
+                continue
+            if newline == -1 or 0 <= nul < newline:
+                separator = b"\0"
+            else:
+                separator = b"\n"
+
+        complete, _, pending = pending.rpartition(separator)
+        yield from _split_paths(complete, separator)
+
+    yield from _split_paths(pending, separator or b"\n")
 
 
 def find_python_files(
     patterns: Iterable[str | os.PathLike[str]],
-) -> Iterable[pathlib.Path]:
+) -> Iterator[pathlib.Path]:
+    """
+    Yields the python files in, or named by, each pattern, as the patterns
+    are iterated, skipping files that have already been found.
+    """
     if not patterns:
         patterns = ["."]
 
-    paths_set = set()
+    ignore_checker = _IgnoreChecker()
+
+    # Only the text of each path is kept, as lists of paths passed by build
+    # systems can be very long.
+    seen: set[str] = set()
     for pattern in patterns:
         path = pathlib.Path(pattern)
         if not path.is_dir():
@@ -63,10 +147,12 @@ def find_python_files(
             subpaths = [
                 subpath
                 for subpath in path.glob("**/*.py")
-                if not is_ignored(subpath) and subpath.is_file()
+                if not ignore_checker.is_ignored(subpath) and subpath.is_file()
             ]
 
         for subpath in sorted(subpaths):
-            if subpath not in paths_set:
-                paths_set.add(subpath)
+            # Paths are compared in the same way that `pathlib` compares them.
+            key = os.path.normcase(subpath)
+            if key not in seen:
+                seen.add(key)
                 yield subpath
@@ -1,136 +1,293 @@
 from __future__ import annotations
 
-from typing import Callable, Generic, Hashable, TypeVar
-
-from ssort._utils import sort_key_from_iter
+import heapq
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Collection,
+    Generic,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+    TypeVar,
+)
+
+if TYPE_CHECKING:
+    from ssort._numpy_graphs import CSRGraph
 
 _T = TypeVar("_T", bound=Hashable)
 
+# Modules with at least this many statements will have their dependency graph
+# stored using the NumPy backed `CSRGraph`, if NumPy is available.
+CSR_GRAPH_THRESHOLD = 10000
+
+
+class _AdjacencyView(Mapping[_T, "list[_T]"]):
+    """
+    Read-only view presenting one direction of a graph's integer adjacency
+    sets in terms of the original node objects.
+    """
+
+    def __init__(self, graph: Graph[_T], adjacency: list[dict[int, None]]):
+        self._graph = graph
+        self._adjacency = adjacency
+
+    def __getitem__(self, node: _T) -> list[_T]:
+        nodes = self._graph._nodes
+        return [
+            nodes[other] for other in self._adjacency[self._graph._ids[node]]
+        ]
+
+    def __iter__(self) -> Iterator[_T]:
+        return iter(self._graph._ids)
+
+    def __len__(self) -> int:
+        return len(self._graph._ids)
+
 
 class Graph(Generic[_T]):
+    """
+    A directed graph mapping nodes to the nodes that they depend on.
+
+    Each node is assigned a dense integer id, in the order in which nodes are
+    added, and edges are stored between ids as insertion ordered sets (dicts
+    with `None` values).  This makes adding, removing and testing for nodes and
+    edges constant time operations while still allowing dependencies to be
+    iterated over in the order in which they were discovered.  Ids are not
+    reused after a node is removed.
+    """
+
     def __init__(self) -> None:
-        self.nodes: list[_T] = []
-        self.dependencies: dict[_T, list[_T]] = {}
-        self.dependants: dict[_T, list[_T]] = {}
+        self._ids: dict[_T, int] = {}
+        self._nodes: list[_T] = []
+        self._dependencies: list[dict[int, None]] = []
+        self._dependants: list[dict[int, None]] = []
+
+    @property
+    def nodes(self) -> list[_T]:
+        return list(self._ids)
+
+    @property
+    def dependencies(self) -> Mapping[_T, list[_T]]:
+        return _AdjacencyView(self, self._dependencies)
+
+    @property
+    def dependants(self) -> Mapping[_T, list[_T]]:
+        return _AdjacencyView(self, self._dependants)
+
+    def node_id(self, node: _T) -> int:
+        return self._ids[node]
+
+    def node_from_id(self, node_id: int) -> _T:
+        return self._nodes[node_id]
+
+    def node_ids(self) -> Collection[int]:
+        """
+        Returns the ids of all nodes currently in the graph, in the order in
+        which they were added.
+        """
+        return self._ids.values()
+
+    def id_capacity(self) -> int:
+        """
+        Returns one more than the largest id that has ever been assigned.
+        Suitable for sizing arrays indexed by node id.
+        """
+        return len(self._nodes)
+
+    def dependency_ids(self, node_id: int) -> Collection[int]:
+        return self._dependencies[node_id].keys()
+
+    def dependant_ids(self, node_id: int) -> Collection[int]:
+        return self._dependants[node_id].keys()
+
+    def edge_count(self) -> int:
+        return sum(map(len, self._dependencies))
 
     def add_node(self, identifier: _T) -> None:
-        if identifier not in self.nodes:
-            self.nodes.append(identifier)
-            self.dependencies[identifier] = []
-            self.dependants[identifier] = []
+        if identifier not in self._ids:
+            self._ids[identifier] = len(self._nodes)
+            self._nodes.append(identifier)
+            self._dependencies.append({})
+            self._dependants.append({})
 
     def add_dependency(self, node: _T, dependency: _T) -> None:
-        assert dependency in self.nodes
+        assert dependency in self._ids
 
-        if dependency not in self.dependencies[node]:
-            self.dependencies[node].append(dependency)
-            self.dependants[dependency].append(node)
+        node_id = self._ids[node]
+        dependency_id = self._ids[dependency]
+        self._dependencies[node_id][dependency_id] = None
+        self._dependants[dependency_id][node_id] = None
 
     def remove_node(self, node: _T) -> None:
-        self.nodes.remove(node)
-        del self.dependencies[node]
-        del self.dependants[node]
+        node_id = self._ids.pop(node)
 
-        for other in self.nodes:
-            try:
-                self.dependencies[other].remove(node)
-            except ValueError:
-                pass
+        for dependency_id in self._dependencies[node_id]:
+            del self._dependants[dependency_id][node_id]
+        for dependant_id in self._dependants[node_id]:
+            del self._dependencies[dependant_id][node_id]
 
-            try:
-                self.dependants[other].remove(node)
-            except ValueError:
-                pass
+        self._dependencies[node_id] = {}
+        self._dependants[node_id] = {}
 
     def remove_dependency(self, node: _T, dependency: _T) -> None:
-        assert dependency in self.nodes
-
-        try:
-            self.dependencies[node].remove(dependency)
-        except ValueError:
-            pass
+        assert dependency in self._ids
 
-        try:
-            self.dependants[dependency].remove(node)
-        except ValueError:
-            pass
+        node_id = self._ids[node]
+        dependency_id = self._ids[dependency]
+        self._dependencies[node_id].pop(dependency_id, None)
+        self._dependants[dependency_id].pop(node_id, None)
 
     def update(self, other: Graph[_T]) -> None:
         for node in other.nodes:
             self.add_node(node)
 
-        for node in other.nodes:
-            for dependency in other.dependencies[node]:
-                self.add_dependency(node, dependency)
+        for node_id in other.node_ids():
+            node = other.node_from_id(node_id)
+            for dependency_id in other.dependency_ids(node_id):
+                self.add_dependency(node, other.node_from_id(dependency_id))
 
     def copy(self) -> Graph[_T]:
         dup: Graph[_T] = Graph()
         dup.update(self)
         return dup
 
+    def __contains__(self, node: object) -> bool:
+        return node in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
 
 def _remove_self_references(graph: Graph[_T]) -> None:
     for node in graph.nodes:
         graph.remove_dependency(node, node)
 
 
-def _find_cycle(graph: Graph[_T]) -> list[_T] | None:
-    processed = set()
-    for node in graph.nodes:
-        if node in processed:
+def strongly_connected_components(
+    node_ids: Iterable[int],
+    dependency_ids: Callable[[int], Iterable[int]],
+    *,
+    capacity: int,
+) -> list[list[int]]:
+    """
+    Returns the ids of the nodes in each strongly connected component of the
+    graph described by `node_ids` and `dependency_ids`, using a single pass of
+    an iterative version of Tarjan's algorithm.  Ids must be less than
+    `capacity`.
+    """
+    index = [-1] * capacity
+    lowlink = [0] * capacity
+    on_stack = [False] * capacity
+    stack: list[int] = []
+    components = []
+    counter = 0
+
+    for root_id in node_ids:
+        if index[root_id] != -1:
             continue
 
-        in_stack = {node}
-        stack = [(node, set(graph.dependencies[node]))]
-
-        while stack:
-            top_node, top_dependencies = stack[-1]
-
-            if not top_dependencies:
-                processed.add(top_node)
-                in_stack.remove(top_node)
-                stack.pop()
-                continue
-
-            dependency = top_dependencies.pop()
-            if dependency in in_stack:
-                cycle = [dependency]
-                while stack[-1][0] != dependency:
-                    cycle.append(stack[-1][0])
-                    stack.pop()
-                return cycle
-            if dependency not in processed:
-                stack.append((dependency, set(graph.dependencies[dependency])))
-                in_stack.add(dependency)
-
-    return None
-
-
-def replace_cycles(graph: Graph[_T], *, key: Callable[[_T], int]) -> None:
+        index[root_id] = lowlink[root_id] = counter
+        counter += 1
+        stack.append(root_id)
+        on_stack[root_id] = True
+        work = [(root_id, iter(dependency_ids(root_id)))]
+
+        while work:
+            node_id, unvisited = work[-1]
+
+            for dependency_id in unvisited:
+                if index[dependency_id] == -1:
+                    index[dependency_id] = lowlink[dependency_id] = counter
+                    counter += 1
+                    stack.append(dependency_id)
+                    on_stack[dependency_id] = True
+                    work.append(
+                        (dependency_id, iter(dependency_ids(dependency_id)))
+                    )
+                    break
+
+                if on_stack[dependency_id]:
+                    lowlink[node_id] = min(
+                        lowlink[node_id], index[dependency_id]
+                    )
+
+            else:
+                work.pop()
+                if work:
+                    parent_id = work[-1][0]
+                    lowlink[parent_id] = min(
+                        lowlink[parent_id], lowlink[node_id]
+                    )
+
+                if lowlink[node_id] == index[node_id]:
+                    component = []
+                    while True:
+                        member_id = stack.pop()
+                        on_stack[member_id] = False
+                        component.append(member_id)
+                        if member_id == node_id:
+                            break
+                    components.append(component)
+
+    return components
+
+
+def replace_cycles(
+    graph: Graph[_T] | CSRGraph[_T], *, key: Callable[[_T], int]
+) -> int:
     """
     Finds all cycles and replaces them with forward links that keep them from
     being re-ordered.
+
+    Each strongly connected component is found in a single pass, stripped of
+    its internal edges, and replaced by a chain linking its members in `key`
+    order.  Edges into and out of the component are left alone.
+
+    Returns the number of strongly connected components that were replaced.
     """
+    if not isinstance(graph, Graph):
+        return graph.replace_cycles(key=key)
+
     _remove_self_references(graph)
-    while True:
-        cycle = _find_cycle(graph)
-        if not cycle:
-            break
 
-        for node in cycle:
-            for dependency in cycle:
-                graph.remove_dependency(node, dependency)
+    components = strongly_connected_components(
+        graph.node_ids(), graph.dependency_ids, capacity=graph.id_capacity()
+    )
+    cycles = 0
+    for component in components:
+        if len(component) < 2:
+            continue
+        cycles += 1
+
+        member_ids = set(component)
+        for member_id in component:
+            node = graph.node_from_id(member_id)
+            for dependency_id in list(graph.dependency_ids(member_id)):
+                if dependency_id in member_ids:
+                    graph.remove_dependency(
+                        node, graph.node_from_id(dependency_id)
+                    )
 
         # TODO this is a bit of an abstraction leak.  Need a better way to tell
         # this function what the safe order is.
-        nodes = iter(sorted(cycle, key=key))
+        nodes = iter(sorted(map(graph.node_from_id, component), key=key))
         prev = next(nodes)
         for node in nodes:
             graph.add_dependency(node, prev)
             prev = node
 
+    return cycles
+
+
+def is_topologically_sorted(
+    nodes: list[_T], graph: Graph[_T] | CSRGraph[_T]
+) -> bool:
+    if not isinstance(graph, Graph):
+        return graph.is_topologically_sorted(nodes)
 
-def is_topologically_sorted(nodes: list[_T], graph: Graph[_T]) -> bool:
     visited = set()
     for node in nodes:
         visited.add(node)
@@ -140,11 +297,61 @@ def is_topologically_sorted(nodes: list[_T], graph: Graph[_T]) -> bool:
     return True
 
 
+def topological_order(
+    graph: Graph[_T] | CSRGraph[_T], *, key: Callable[[_T], int]
+) -> list[_T]:
+    """
+    Returns every node in `graph` ordered so that nodes always come after
+    their dependencies.
+
+    The order is built up from the back using Kahn's algorithm:  of the nodes
+    with no unplaced dependants, the one with the largest `key` is placed next.
+    This keeps nodes as close to their original position as the dependencies
+    allow when `key` gives the original position.  Runs in O((V + E) log V)
+    and does not modify `graph`.
+
+    Raises `ValueError` if `graph` contains a cycle.
+    """
+    if not isinstance(graph, Graph):
+        return graph.topological_order(key=key)
+
+    capacity = graph.id_capacity()
+    keys = [0] * capacity
+    remaining_dependants = [0] * capacity
+
+    pending = []
+    for node_id in graph.node_ids():
+        keys[node_id] = key(graph.node_from_id(node_id))
+        remaining_dependants[node_id] = len(graph.dependant_ids(node_id))
+        if not remaining_dependants[node_id]:
+            pending.append((-keys[node_id], node_id))
+    heapq.heapify(pending)
+
+    result = []
+    while pending:
+        _, node_id = heapq.heappop(pending)
+        result.append(graph.node_from_id(node_id))
+
+        for dependency_id in graph.dependency_ids(node_id):
+            remaining_dependants[dependency_id] -= 1
+            if not remaining_dependants[dependency_id]:
+                heapq.heappush(pending, (-keys[dependency_id], dependency_id))
+
+    if len(result) != len(graph):
+        raise ValueError("graph contains a cycle")
+
+    result.reverse()
+    return result
+
+
 def topological_sort(
-    target: Graph[_T] | list[_T], /, *, graph: Graph[_T] | None = None
+    target: Graph[_T] | CSRGraph[_T] | list[_T],
+    /,
+    *,
+    graph: Graph[_T] | CSRGraph[_T] | None = None,
 ) -> list[_T]:
     if graph is None:
-        if not isinstance(target, Graph):
+        if isinstance(target, list):
             raise TypeError("target must be a Graph")
         graph = target
         nodes = target.nodes
@@ -153,31 +360,35 @@ def topological_sort(
             raise TypeError("target must be a list")
         nodes = target
 
-    # Create a mutable copy of the graph so that we can pop edges from it as we
-    # traverse.
-    remaining = graph.copy()
+    index = {node: position for position, node in enumerate(nodes)}
 
-    key = sort_key_from_iter(nodes)
+    result = topological_order(graph, key=index.__getitem__)
 
-    pending = [node for node in graph.nodes if not graph.dependants[node]]
+    assert is_topologically_sorted(result, graph)
 
-    result = []
-    while pending:
-        pending = list(sorted(pending, key=key))
-        node = pending.pop()
-        dependencies = remaining.dependencies[node]
-        remaining.remove_node(node)
+    return [node for node in result if node in index]
 
-        for dependency in dependencies:
-            if not remaining.dependants[dependency]:
-                if dependency not in pending:
-                    pending.append(dependency)
 
-        result.append(node)
+def graph_from_edges(
+    nodes: Sequence[_T], edges: Iterable[tuple[_T, _T]]
+) -> Graph[_T] | CSRGraph[_T]:
+    """
+    Builds a graph from a list of nodes and an iterable of `(node,
+    dependency)` pairs.
 
-    result.reverse()
+    Graphs with at least `CSR_GRAPH_THRESHOLD` nodes are backed by NumPy
+    arrays if NumPy is installed.  Smaller graphs, or all graphs if NumPy is
+    not available, use the pure-python `Graph`.
+    """
+    if len(nodes) >= CSR_GRAPH_THRESHOLD:
+        from ssort import _numpy_graphs
 
-    assert not remaining.nodes
-    assert is_topologically_sorted(result, graph)
+        if _numpy_graphs.numpy is not None:
+            return _numpy_graphs.CSRGraph.from_edges(nodes, edges)
 
-    return [node for node in result if node in nodes]
+    graph: Graph[_T] = Graph()
+    for node in nodes:
+        graph.add_node(node)
+    for node, dependency in edges:
+        graph.add_dependency(node, dependency)
+    return graph
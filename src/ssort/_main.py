@@ -1,21 +1,493 @@
 import argparse
-import difflib
-import re
+import collections
+import functools
+import itertools
+import os
 import sys
 
-from ssort._exceptions import UnknownEncodingError
-from ssort._files import find_python_files
-from ssort._ssort import ssort
-from ssort._utils import (
-    detect_encoding,
-    detect_newline,
-    escape_path,
-    normalize_newlines,
-)
+from ssort._client import run_in_daemon
+
+# Modules that are slow to import, including the sorter itself, are imported
+# by the functions that use them so that runs that are handed to a daemon do
+# not need to load them.
+
+_UNSORTED = "unsorted"
+_UNCHANGED = "unchanged"
+_UNSORTABLE = "unsortable"
+
+_UNKNOWN_ENCODING = "unknown-encoding"
+_DECODING_ERROR = "decoding-error"
+_SYNTAX_ERROR = "syntax-error"
+_UNRESOLVED = "unresolved"
+_WILDCARD_IMPORT = "wildcard-import"
+
+# The most files that are sent to a worker process in one go.
+_MAX_CHUNK_SIZE = 32
+
+
+def _format_diagnostic(path, kind, *args):
+    from ssort._utils import escape_path
+
+    # Diagnostics are recorded without the path of the file that they refer
+    # to, so that they can be cached by content, and formatted as messages
+    # when they are reported.
+    if kind == _UNKNOWN_ENCODING:
+        (encoding,) = args
+        return (
+            f"ERROR: unknown encoding, {encoding!r}, in {escape_path(path)}\n"
+        )
+    if kind == _DECODING_ERROR:
+        (message,) = args
+        return f"ERROR: encoding error in {escape_path(path)}: {message}\n"
+    if kind == _SYNTAX_ERROR:
+        lineno, col_offset = args
+        return (
+            f"ERROR: syntax error in {escape_path(path)}: "
+            + f"line {lineno}, column {col_offset}\n"
+        )
+    if kind == _UNRESOLVED:
+        name, lineno, col_offset = args
+        return (
+            f"ERROR: unresolved dependency {name!r} "
+            + f"in {escape_path(path)}: "
+            + f"line {lineno}, column {col_offset}\n"
+        )
+    if kind == _WILDCARD_IMPORT:
+        return "WARNING: can't determine dependencies on * import\n"
+    raise ValueError(f"unknown diagnostic {kind!r}")
+
+
+def _sort_result(path, source):
+    """
+    Parses and sorts the source of a single file.
+
+    Returns a `SortResult`, or `None` if the file could not be sorted, and a
+    list of diagnostics.
+    """
+    from ssort._ssort import ssort_result
+    from ssort._utils import escape_path
+
+    diagnostics = []
+    errors = False
+
+    def _on_parse_error(message, *, lineno, col_offset, **kwargs):
+        nonlocal errors
+        errors = True
+
+        diagnostics.append((_SYNTAX_ERROR, lineno, col_offset))
+
+    def _on_unresolved(message, *, name, lineno, col_offset, **kwargs):
+        nonlocal errors
+        errors = True
+
+        diagnostics.append((_UNRESOLVED, name, lineno, col_offset))
+
+    def _on_wildcard_import(**kwargs):
+        diagnostics.append((_WILDCARD_IMPORT,))
+
+    result = ssort_result(
+        source,
+        filename=escape_path(path),
+        on_parse_error=_on_parse_error,
+        on_unresolved=_on_unresolved,
+        on_wildcard_import=_on_wildcard_import,
+    )
+    if errors:
+        return None, diagnostics
+    return result, diagnostics
+
+
+def _sort_source(path, source, *, check, show_diff, output=None):
+    """
+    Sorts the source of a single file, or checks that it is sorted.
+
+    The sorted source is written back to `path`, or to the binary file
+    `output` if one is given.  Nothing is written if the source was already
+    sorted.
+
+    Returns the status of the file, a list of diagnostics, and a list of any
+    further messages to write to stderr after them.
+    """
+    import difflib
+
+    from ssort import _stats
+    from ssort._utils import escape_path
+
+    try:
+        result, diagnostics = _sort_result(path, source)
+
+        if result is None:
+            return _UNSORTABLE, diagnostics, []
+
+        # Checking whether anything would change does not need the sorted
+        # text to be rendered, or every class body to be sorted.
+        if not result.changed:
+            return _UNCHANGED, diagnostics, []
+
+        if not check:
+            updated_bytes = result.output()
+        if show_diff:
+            updated = result.text()
+
+    except Exception as e:
+        raise Exception(f"ERROR while sorting {path}\n") from e
+
+    messages = []
+    if check:
+        messages.append(f"ERROR: {escape_path(path)} is incorrectly sorted\n")
+    else:
+        messages.append(f"Sorting {escape_path(path)}\n")
+        with _stats.phase("write"):
+            if output is None:
+                path.write_bytes(updated_bytes)
+            else:
+                output.write(updated_bytes)
+
+    if show_diff:
+        with _stats.phase("diff"):
+            messages.extend(
+                difflib.unified_diff(
+                    source.text.splitlines(keepends=True),
+                    updated.splitlines(keepends=True),
+                    fromfile=f"{path}:before",
+                    tofile=f"{path}:after",
+                )
+            )
+
+    return _UNSORTED, diagnostics, messages
+
+
+def _record(recorder, path, sort, **kwargs):
+    """
+    Calls `sort` on a path, returning its results followed by the
+    `FileStats` recorded while it ran, or by `None` if there is no recorder.
+    """
+    from ssort._utils import escape_path
+
+    if recorder is None:
+        return (*sort(path, **kwargs), None)
+    with recorder.record(escape_path(path)) as stats:
+        results = sort(path, **kwargs)
+    if stats.profile_error is not None:
+        results[1].append(
+            f"WARNING: can not save profile of {escape_path(path)}: "
+            f"{stats.profile_error}\n"
+        )
+    return (*results, stats)
+
+
+def _sort_file(path, *, check, show_diff, cache=None):
+    """
+    Sorts a single file, or checks that it is sorted.
+
+    Returns one of `"unsorted"`, `"unchanged"` or `"unsortable"`, a list of
+    messages to write to stderr, and whether a new entry was written to
+    `cache`.  Nothing is written to stderr directly so that files can be
+    processed in parallel while still reporting on them in order.
+
+    If a cache is given, files that were already sorted, or that could not
+    be sorted, the last time that their contents were seen are not parsed
+    again.
+    """
+    from ssort import _stats
+    from ssort._cache import content_key
+    from ssort._exceptions import UnknownEncodingError
+    from ssort._source import Source
+    from ssort._utils import escape_path
+
+    key = None
+    messages = []
+
+    try:
+        if cache is None:
+            # Large files are decoded straight out of a memory map, so
+            # reading them can not be timed separately.
+            with _stats.phase("decode"):
+                source = Source.from_path(path)
+        else:
+            with _stats.phase("read"):
+                data = path.read_bytes()
+            with _stats.phase("cache"):
+                key = content_key(data)
+                entry = cache.get(key)
+            if entry is not None:
+                stats = _stats.current()
+                if stats is not None:
+                    stats.cached = True
+                status, diagnostics = entry
+                messages = [
+                    _format_diagnostic(path, *diagnostic)
+                    for diagnostic in diagnostics
+                ]
+                return status, messages, False
+            with _stats.phase("decode"):
+                source = Source.from_bytes(data, path=path)
+    except FileNotFoundError:
+        messages.append(f"ERROR: {escape_path(path)} does not exist\n")
+        return _UNSORTABLE, messages, False
+    except IsADirectoryError:
+        messages.append(f"ERROR: {escape_path(path)} is a directory\n")
+        return _UNSORTABLE, messages, False
+    except PermissionError:
+        messages.append(f"ERROR: {escape_path(path)} is not readable\n")
+        return _UNSORTABLE, messages, False
+    except UnknownEncodingError as exc:
+        status = _UNSORTABLE
+        diagnostics = [(_UNKNOWN_ENCODING, exc.encoding)]
+    except UnicodeDecodeError as exc:
+        status = _UNSORTABLE
+        diagnostics = [(_DECODING_ERROR, str(exc))]
+    else:
+        status, diagnostics, messages = _sort_source(
+            path, source, check=check, show_diff=show_diff
+        )
+
+    # Files that need sorting are not cached.  Unless checking, they will
+    # not have the same contents the next time that they are seen.
+    stored = False
+    if key is not None and status != _UNSORTED:
+        with _stats.phase("cache"):
+            cache.put(key, status, diagnostics)
+        stored = True
+
+    messages[:0] = [
+        _format_diagnostic(path, *diagnostic) for diagnostic in diagnostics
+    ]
+    return status, messages, stored
+
+
+def _sort_stdin(path, *, check, show_diff):
+    """
+    Sorts source read from stdin, or checks that it is sorted, reporting it
+    as `path`.
+
+    Unless checking, the sorted source is written to stdout.  Source that
+    was already sorted, or that could not be sorted, is written back out
+    unchanged, so that the output can always replace the input.
+
+    Returns the same as `_sort_file`.
+    """
+    from ssort import _stats
+    from ssort._exceptions import UnknownEncodingError
+    from ssort._source import Source
+
+    with _stats.phase("read"):
+        data = sys.stdin.buffer.read()
+    messages = []
+    try:
+        with _stats.phase("decode"):
+            source = Source.from_bytes(data)
+    except UnknownEncodingError as exc:
+        status = _UNSORTABLE
+        diagnostics = [(_UNKNOWN_ENCODING, exc.encoding)]
+    except UnicodeDecodeError as exc:
+        status = _UNSORTABLE
+        diagnostics = [(_DECODING_ERROR, str(exc))]
+    else:
+        status, diagnostics, messages = _sort_source(
+            path,
+            source,
+            check=check,
+            show_diff=show_diff,
+            output=sys.stdout.buffer,
+        )
+
+    with _stats.phase("write"):
+        if not check and status != _UNSORTED:
+            sys.stdout.buffer.write(data)
+        sys.stdout.flush()
+
+    messages[:0] = [
+        _format_diagnostic(path, *diagnostic) for diagnostic in diagnostics
+    ]
+    return status, messages, False
+
+
+def _process_file(path, *, check, show_diff, cache=None, recorder=None):
+    """
+    Sorts a single file, or checks that it is sorted, as `_sort_file` does.
+
+    Returns the results of `_sort_file` followed by the `FileStats` that
+    `recorder` recorded for the file, or `None` if no recorder is given.
+    """
+    return _record(
+        recorder,
+        path,
+        _sort_file,
+        check=check,
+        show_diff=show_diff,
+        cache=cache,
+    )
+
+
+def _process_stdin(path, *, check, show_diff, recorder=None):
+    """
+    Sorts source read from stdin, as `_sort_stdin` does, returning the same
+    as `_process_file`.
+    """
+    return _record(
+        recorder, path, _sort_stdin, check=check, show_diff=show_diff
+    )
+
 
+def _sort_request(request):
+    """
+    Sorts source text sent by an editor or other tool, either in batch mode
+    or to ssortd.
+
+    Requests are dictionaries with the `source` text to sort, and optionally
+    the `filename` to report it as, a `mode`, and an `id` that is copied to
+    the response.  In `"sort"` mode, the default, the response includes the
+    sorted `output` if anything changed.  In `"diff"` mode it includes a
+    unified `diff` instead, and in `"check"` mode neither.  Either way, it
+    includes the `status` of the source and a list of error `messages`.
+
+    Requests that can not be handled get a response with an `error`.
+    """
+    import difflib
+
+    from ssort._source import Source
+
+    identity = {}
+    if "id" in request:
+        identity["id"] = request["id"]
+    response = dict(identity)
+
+    source = request.get("source")
+    filename = request.get("filename", "-")
+    mode = request.get("mode", "sort")
+    if not isinstance(source, str) or not isinstance(filename, str):
+        response["error"] = "expected source text and a filename"
+        return response
+    if mode not in ("sort", "check", "diff"):
+        response["error"] = f"unknown mode {mode!r}"
+        return response
+
+    try:
+        parsed = Source.from_text(source)
+        result, diagnostics = _sort_result(filename, parsed)
+        if result is None:
+            status = _UNSORTABLE
+        elif result.changed:
+            status = _UNSORTED
+        else:
+            status = _UNCHANGED
+
+        response["status"] = status
+        response["messages"] = [
+            _format_diagnostic(filename, *diagnostic)
+            for diagnostic in diagnostics
+        ]
+        if mode == "sort":
+            response["output"] = (
+                result.output() if status == _UNSORTED else None
+            )
+        elif mode == "diff":
+            response["diff"] = (
+                "".join(
+                    difflib.unified_diff(
+                        parsed.text.splitlines(keepends=True),
+                        result.text().splitlines(keepends=True),
+                        fromfile=f"{filename}:before",
+                        tofile=f"{filename}:after",
+                    )
+                )
+                if status == _UNSORTED
+                else None
+            )
+    except Exception as exc:
+        # One buffer that can not be sorted should not stop the others.
+        return {**identity, "error": f"error while sorting {filename}: {exc}"}
 
-def main():
+    return response
+
+
+def _process_batch(requests, responses):
+    """
+    Handles requests to sort source text, read as newline-delimited JSON
+    from the binary file `requests`.  Writes the response to each one to
+    `responses` as a line of JSON as soon as it is ready.
+    """
+    import json
+
+    for line in requests:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as exc:
+            response = {"error": f"invalid json: {exc}"}
+        else:
+            if isinstance(request, dict):
+                response = _sort_request(request)
+            else:
+                response = {"error": "expected an object"}
+        responses.write(json.dumps(response) + "\n")
+        responses.flush()
+
+
+def _process_files(paths, *, check, show_diff, cache=None, recorder=None):
+    """
+    Sorts, or checks, a batch of files in a worker process.
+
+    Returns a list with the result of `_process_file` for each path, in the
+    same order.
+    """
+    return [
+        _process_file(
+            path,
+            check=check,
+            show_diff=show_diff,
+            cache=cache,
+            recorder=recorder,
+        )
+        for path in paths
+    ]
+
+
+def _chunk(items, *, max_size, step):
+    """
+    Yields lists of consecutive items from an iterable, as soon as each list
+    is full.
+
+    Lists start with one item each, so that short runs are spread evenly
+    over workers, and double in size after every `step` lists, up to
+    `max_size`, so that long runs are sent in fewer round trips.
+    """
+    items = iter(items)
+    size = 1
+    while True:
+        for _ in range(step):
+            chunk = list(itertools.islice(items, size))
+            if not chunk:
+                return
+            yield chunk
+        size = min(size * 2, max_size)
+
+
+def _submit_in_order(executor, fn, items, futures, *, window):
+    """
+    Yields the result of calling `fn` on each item in a pool, in order.
+
+    Items are only taken from the iterable while fewer than `window` calls
+    have results that have not been collected, so that items can be
+    submitted as they are produced without queueing all of them.  The
+    futures of those calls are kept in `futures` so that the caller can
+    cancel them.
+    """
+    for item in items:
+        futures.append(executor.submit(fn, item))
+        while futures and (len(futures) >= window or futures[0].done()):
+            yield futures[0].result()
+            futures.popleft()
+    while futures:
+        yield futures[0].result()
+        futures.popleft()
+
+
+def _make_argument_parser(prog=None):
     parser = argparse.ArgumentParser(
+        prog=prog,
         description="Sort python statements into dependency order",
     )
 
@@ -32,130 +504,274 @@ def main():
         help="Check the file for unsorted statements.  Returns 0 if nothing "
         "needs to be changed.  Otherwise returns 1.",
     )
+    parallelism = parser.add_mutually_exclusive_group()
+    parallelism.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        metavar="N",
+        help="Sort files in parallel using a pool of N processes.  Defaults "
+        "to the number of CPUs.",
+    )
+    parallelism.add_argument(
+        "--threads",
+        type=int,
+        metavar="N",
+        help="Sort files in parallel using a pool of N threads instead of "
+        "processes.",
+    )
     parser.add_argument(
-        "files", nargs="*", help="One or more python files to sort"
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help="Do not read or write cached results.",
     )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="Cache results in DIR, which can be shared with other machines.  "
+        "Defaults to a directory in the user's cache directory.",
+    )
+    parser.add_argument(
+        "--cache-url",
+        metavar="URL",
+        help="Also share cached results through an HTTP server.  Entries are "
+        "read with GET and written with PUT to URL followed by a hash of the "
+        "contents of each file.",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        dest="daemon",
+        action="store_false",
+        help="Do not hand the run to ssortd, even if it is running.",
+    )
+    parser.add_argument(
+        "--daemon-socket",
+        metavar="PATH",
+        help="Connect to ssortd on the Unix socket at PATH.  Defaults to the "
+        "socket that ssortd listens on by default.",
+    )
+    parser.add_argument(
+        "--stdin-filename",
+        metavar="PATH",
+        help="The path to report source read from stdin as.",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Read requests to sort source text from stdin, one JSON object "
+        "per line, and write a JSON object in response to each one to "
+        "stdout.",
+    )
+    parser.add_argument(
+        "--files-from",
+        metavar="PATH",
+        help="Also sort the files listed in PATH, or in stdin if PATH is -, "
+        "separated by newlines or NUL characters.  Files are sorted as they "
+        "are listed.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Write statistics about where the time went to stderr when "
+        "finished.",
+    )
+    parser.add_argument(
+        "--stats-format",
+        choices=["text", "json"],
+        default="text",
+        help="Write statistics as text, or as a single line of JSON.",
+    )
+    parser.add_argument(
+        "--stats-slowest",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Include the N slowest files in statistics.  Defaults to 10.",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Profile sorting each file with cProfile, and save the profiles "
+        "of slow files to DIR.",
+    )
+    parser.add_argument(
+        "--profile-threshold",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="Only save the profiles of files that take at least SECONDS to "
+        "sort.  Defaults to 1.",
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="One or more python files to sort, or - to sort stdin to stdout",
+    )
+    return parser
 
-    args = parser.parse_args()
-
-    unsorted = 0
-    unsortable = 0
-    unchanged = 0
-
-    for path in find_python_files(args.files):
-        errors = False
-
-        try:
-            original_bytes = path.read_bytes()
-        except FileNotFoundError:
-            sys.stderr.write(f"ERROR: {escape_path(path)} does not exist\n")
-            unsortable += 1
-            continue
-        except IsADirectoryError:
-            sys.stderr.write(f"ERROR: {escape_path(path)} is a directory\n")
-            unsortable += 1
-            continue
-        except PermissionError:
-            sys.stderr.write(f"ERROR: {escape_path(path)} is not readable\n")
-            unsortable += 1
-            continue
-
-        # The logic for converting from bytes to text is duplicated in `ssort`
-        # and here because we need access to the text to be able to compute a
-        # diff at the end.
-        try:
-            encoding = detect_encoding(original_bytes)
-        except UnknownEncodingError as exc:
-            sys.stderr.write(
-                f"ERROR: unknown encoding, {exc.encoding!r}, in {escape_path(path)}\n"
-            )
-            unsortable += 1
-            continue
-
-        try:
-            original = original_bytes.decode(encoding)
-        except UnicodeDecodeError as exc:
-            sys.stderr.write(
-                f"ERROR: encoding error in {escape_path(path)}: {exc}\n"
-            )
-            unsortable += 1
-            continue
-
-        newline = detect_newline(original)
-        original = normalize_newlines(original)
-
-        def _on_parse_error(message, *, lineno, col_offset, **kwargs):
-            nonlocal errors
-            errors = True
-
-            sys.stderr.write(
-                f"ERROR: syntax error in {escape_path(path)}: "
-                + f"line {lineno}, column {col_offset}\n"
-            )
 
-        def _on_unresolved(message, *, name, lineno, col_offset, **kwargs):
-            nonlocal errors
-            errors = True
+def _sort_files(parser, args, *, mp_context=None):
+    """
+    Sorts, or checks, the files named on the command line in this process
+    and its workers, writing messages to stderr.
 
-            sys.stderr.write(
-                f"ERROR: unresolved dependency {name!r} "
-                + f"in {escape_path(path)}: "
-                + f"line {lineno}, column {col_offset}\n"
-            )
+    Exits with a non-zero status if any files failed.  `mp_context` is the
+    multiprocessing context that worker processes are started from.
+    """
+    import concurrent.futures
 
-        def _on_wildcard_import(**kwargs):
-            sys.stderr.write(
-                "WARNING: can't determine dependencies on * import\n"
-            )
+    from ssort._cache import (
+        DirectoryStore,
+        HTTPStore,
+        LayeredStore,
+        ResultCache,
+        default_cache_dir,
+    )
+    from ssort._files import find_python_files, read_paths
+    from ssort._stats import Recorder, RunStats, format_json, format_text
+
+    if args.batch:
+        _process_batch(sys.stdin.buffer, sys.stdout)
+        return
+
+    run_stats = None
+    if args.stats:
+        run_stats = RunStats(slowest=args.stats_slowest)
+    recorder = None
+    if args.stats or args.profile is not None:
+        if args.profile is not None:
+            try:
+                os.makedirs(args.profile, exist_ok=True)
+            except OSError as exc:
+                parser.error(f"can not create {args.profile}: {exc.strerror}")
+        recorder = Recorder(
+            profile_dir=args.profile,
+            profile_threshold=args.profile_threshold,
+        )
+
+    cache = None
+    if args.cache:
+        cache_dir = args.cache_dir
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        store = DirectoryStore(cache_dir)
+        if args.cache_url is not None:
+            try:
+                remote_store = HTTPStore(args.cache_url)
+            except ValueError as exc:
+                parser.error(str(exc))
+            store = LayeredStore([store, remote_store])
+        cache = ResultCache(store)
 
+    unsorted = 0
+    unsortable = 0
+    unchanged = 0
+    stored = False
+
+    use_stdin = args.files == ["-"]
+    patterns = args.files
+    files_from = None
+    if args.files_from == "-":
+        patterns = itertools.chain(patterns, read_paths(sys.stdin.buffer))
+    elif args.files_from is not None:
         try:
-            updated = ssort(
-                original,
-                filename=escape_path(path),
-                on_parse_error=_on_parse_error,
-                on_unresolved=_on_unresolved,
-                on_wildcard_import=_on_wildcard_import,
-            )
-
-            if errors:
-                unsortable += 1
-                continue
-
-        except Exception as e:
-            raise Exception(f"ERROR while sorting {path}\n") from e
-
-        if original != updated:
-            unsorted += 1
-            if args.check:
-                sys.stderr.write(
-                    f"ERROR: {escape_path(path)} is incorrectly sorted\n"
-                )
-            else:
-                sys.stderr.write(f"Sorting {escape_path(path)}\n")
-
-                # The logic for converting from bytes to text is duplicated in
-                # `ssort` and here because we need access to the text to be able
-                # to compute a diff at the end.
-                # We rename a little prematurely to avoid shadowing `updated`,
-                # which we use later for printing the diff.
-                updated_bytes = updated
-                if newline != "\n":
-                    updated_bytes = re.sub("\n", newline, updated_bytes)
-                updated_bytes = updated_bytes.encode(encoding)
-
-                path.write_bytes(updated_bytes)
-        else:
-            unchanged += 1
-
-        if args.show_diff:
-            sys.stderr.writelines(
-                difflib.unified_diff(
-                    original.splitlines(keepends=True),
-                    updated.splitlines(keepends=True),
-                    fromfile=f"{path}:before",
-                    tofile=f"{path}:after",
+            files_from = open(args.files_from, "rb")
+        except OSError as exc:
+            parser.error(f"can not read {args.files_from}: {exc.strerror}")
+        patterns = itertools.chain(patterns, read_paths(files_from))
+    paths = iter(() if use_stdin else find_python_files(patterns))
+
+    if args.threads is not None:
+        executor_class = concurrent.futures.ThreadPoolExecutor
+        workers = args.threads
+        max_chunk_size = 1
+    else:
+        # Worker processes are sent paths rather than file contents, a chunk
+        # at a time to cut down on round trips.  There should still be
+        # several chunks for each worker so that the load stays balanced.
+        executor_class = functools.partial(
+            concurrent.futures.ProcessPoolExecutor, mp_context=mp_context
+        )
+        workers = args.jobs
+        max_chunk_size = _MAX_CHUNK_SIZE
+
+    # Paths are sent to workers as they are found, or listed.  Only enough
+    # paths named on the command line are found up front to tell whether
+    # there are enough to keep every worker busy, and lists of paths are not
+    # waited on at all.
+    if workers > 1 and args.files_from is None:
+        found = list(itertools.islice(paths, workers))
+        workers = max(1, len(found))
+        paths = itertools.chain(found, paths)
+    chunks = _chunk(paths, max_size=max_chunk_size, step=workers * 4)
+
+    process_file = functools.partial(
+        _process_file,
+        check=args.check,
+        show_diff=args.show_diff,
+        cache=cache,
+        recorder=recorder,
+    )
+    process_files = functools.partial(
+        _process_files,
+        check=args.check,
+        show_diff=args.show_diff,
+        cache=cache,
+        recorder=recorder,
+    )
+    futures = collections.deque()
+    if use_stdin:
+        executor = None
+        results = iter(
+            [
+                _process_stdin(
+                    args.stdin_filename or "-",
+                    check=args.check,
+                    show_diff=args.show_diff,
+                    recorder=recorder,
                 )
+            ]
+        )
+    elif workers > 1:
+        # Results are collected in the order that the files were found in,
+        # however long each one takes, so that output is deterministic.
+        executor = executor_class(workers)
+        if run_stats is not None and args.threads is None:
+            run_stats.worker_processes = workers
+        results = itertools.chain.from_iterable(
+            _submit_in_order(
+                executor, process_files, chunks, futures, window=workers * 4
             )
+        )
+    else:
+        executor = None
+        results = map(process_file, paths)
+
+    try:
+        for status, messages, file_stored, file_stats in results:
+            sys.stderr.writelines(messages)
+            stored = stored or file_stored
+            if run_stats is not None:
+                run_stats.add(file_stats)
+            if status == _UNSORTED:
+                unsorted += 1
+            elif status == _UNCHANGED:
+                unchanged += 1
+            else:
+                unsortable += 1
+    finally:
+        # Stop as soon as any file fails, as the sequential mode does.
+        for future in futures:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown()
+        if files_from is not None:
+            files_from.close()
+
+    # Only runs that added to the cache can have pushed it over its size.
+    if stored:
+        cache.trim()
 
     if args.check:
 
@@ -172,10 +788,7 @@ def main():
         if not unsorted and not unchanged and not unsortable:
             summary.append("No files are present to be sorted. Nothing to do.")
 
-        sys.stderr.write(", ".join(summary) + "\n")
-
-        if unsorted or unsortable:
-            sys.exit(1)
+        failed = unsorted or unsortable
 
     else:
 
@@ -195,7 +808,59 @@ def main():
         if not unsorted and not unchanged and not unsortable:
             summary.append("No files are present to be sorted. Nothing to do.")
 
-        sys.stderr.write(", ".join(summary) + "\n")
-
-        if unsortable:
-            sys.exit(1)
+        failed = unsortable
+
+    sys.stderr.write(", ".join(summary) + "\n")
+
+    if run_stats is not None:
+        format_stats = (
+            format_json if args.stats_format == "json" else format_text
+        )
+        sys.stderr.write(format_stats(run_stats.to_dict()))
+
+    if failed:
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = _make_argument_parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.threads is not None and args.threads < 1:
+        parser.error("--threads must be at least 1")
+    if "-" in args.files and args.files != ["-"]:
+        parser.error("- can not be combined with other files")
+    if args.stdin_filename is not None and args.files != ["-"]:
+        parser.error("--stdin-filename can only be used with -")
+    if args.batch and (args.files or args.files_from is not None):
+        parser.error("--batch does not take any files")
+    if args.files_from is not None and "-" in args.files:
+        parser.error("- can not be combined with --files-from")
+    if args.batch and (args.stats or args.profile is not None):
+        parser.error("--batch can not be combined with --stats or --profile")
+    if args.stats_slowest < 0:
+        parser.error("--stats-slowest must not be negative")
+    # Only one profiler can be active at a time in newer versions of python.
+    if args.profile is not None and args.threads is not None:
+        parser.error("--profile can not be combined with --threads")
+
+    # Input from stdin is not forwarded to the daemon, and nor are runs that
+    # measure the process that they run in.
+    if (
+        args.daemon
+        and not args.batch
+        and args.files != ["-"]
+        and args.files_from != "-"
+        and not args.stats
+        and args.profile is None
+    ):
+        returncode = run_in_daemon(
+            sys.argv[1:] if argv is None else argv,
+            prog=parser.prog,
+            socket_path=args.daemon_socket,
+        )
+        if returncode is not None:
+            sys.exit(returncode)
+
+    _sort_files(parser, args)
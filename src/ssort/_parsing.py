@@ -1,11 +1,16 @@
 import ast
-import warnings
+import bisect
+import re
 from io import StringIO
 from token import NAME
 from tokenize import generate_tokens
 
+from ssort import _stats
 from ssort._exceptions import ParseError
 from ssort._statements import Statement
+from ssort._utils import ignore_warnings
+
+_NEWLINE_RE = re.compile("\n")
 
 
 def _find_start(node):
@@ -23,6 +28,24 @@ def _find_end(node):
     return node.end_lineno - 1, node.end_col_offset
 
 
+def _find_line_offsets(text):
+    """
+    Returns a list containing the offset in `text` of the first character of
+    each row, counting from zero.
+
+    Computed once per file and shared by every statement split from it.
+    """
+    offsets = [0]
+    offsets.extend(match.end() for match in _NEWLINE_RE.finditer(text))
+    return offsets
+
+
+def _row_end(offsets, row, text_length):
+    if row + 1 < len(offsets):
+        return offsets[row + 1] - 1
+    return text_length
+
+
 def split(
     root_text,
     *,
@@ -30,20 +53,22 @@ def split(
     next_row=0,
     next_col=0,
     indent=0,
+    line_offsets=None,
+    stop=None,
+    parent=None,
 ):
-    # Build an index of row lengths and start offsets to enable fast string
-    # indexing using ast row/column coordinates.
-    row_lengths = []
-    row_offsets = [0]
-    for offset, char in enumerate(root_text):
-        if char == "\n":
-            row_lengths.append(offset - row_offsets[-1])
-            row_offsets.append(offset + 1)
-    row_lengths.append(len(root_text) - row_offsets[-1])
+    if line_offsets is None:
+        line_offsets = _find_line_offsets(root_text)
+
+    if stop is None:
+        # Trailing newlines are not claimed by the last statement.
+        stop = len(root_text)
+        while stop and root_text[stop - 1] == "\n":
+            stop -= 1
 
-    nodes = iter(nodes)
+    nodes = iter(enumerate(nodes))
 
-    next_node = next(nodes, None)
+    next_index, next_node = next(nodes, (None, None))
 
     if next_node is not None:
         next_start_row, next_start_col = _find_start(next_node)
@@ -53,7 +78,8 @@ def split(
         next_indent_text = ""
 
     while next_node:
-        this_node, next_node = next_node, next(nodes, None)
+        this_index, this_node = next_index, next_node
+        next_index, next_node = next(nodes, (None, None))
         this_end_row, this_end_col = next_end_row, next_end_col
         this_indent_text = next_indent_text
 
@@ -69,8 +95,7 @@ def split(
             # possible to claim as far as the start of the next node for this
             # node, but this space can only contain semicolons and whitespace
             # so we are better off filtering it out.
-            end_row = this_end_row
-            end_col = this_end_col
+            end_offset = line_offsets[this_end_row] + this_end_col
 
             next_row = next_start_row
             next_col = next_start_col
@@ -79,48 +104,137 @@ def split(
         else:
             # No other statements on the same line.  Assume that everything up
             # until the end of the line is comments attached to this statement.
-            end_row = this_end_row
-            end_col = row_lengths[end_row]
+            end_offset = _row_end(line_offsets, this_end_row, len(root_text))
 
             next_row = this_end_row + 1
             next_col = 0
 
             next_indent_text = ""
 
-        start_offset = row_offsets[start_row] + start_col
-        if next_node is not None:
-            end_offset = row_offsets[end_row] + end_col
-        else:
-            end_offset = len(root_text.rstrip("\n"))
+        if next_node is None:
+            end_offset = stop
 
         yield Statement(
-            text=this_indent_text + root_text[start_offset:end_offset],
+            source=root_text,
+            start=line_offsets[start_row] + start_col,
+            end=end_offset,
+            indent=this_indent_text,
             node=this_node,
             start_row=start_row,
             start_col=start_col,
+            line_offsets=line_offsets,
+            parent=parent,
+            index=this_index,
         )
 
 
-def split_class(statement):
+def _skip_trivia(source, offset):
+    # Skips whitespace, line continuations and comments.  Newlines are
+    # skipped as well, which is only safe because the class has already been
+    # parsed and so can only have them where they are allowed.
+    while offset < len(source):
+        char = source[offset]
+        if char in " \t\f\n":
+            offset += 1
+        elif char == "\\" and source.startswith("\n", offset + 1):
+            offset += 2
+        elif char == "#":
+            offset = source.find("\n", offset)
+            if offset == -1:
+                return len(source)
+        else:
+            break
+    return offset
+
+
+def _find_class_head_end(statement):
+    """
+    Returns the offset in the source of the statement just past the colon
+    that ends the head of a class definition, found by scanning forward from
+    the positions recorded in the syntax tree.
+
+    Returns `None` if the layout of the head is not one that this function
+    understands, in which case the caller should fall back to running the
+    tokenizer.
+    """
     node = statement.node
-    text = statement.text
-    text_padded = statement.text_padded()
+    source = statement.source
+    offsets = statement.line_offsets
+
+    if getattr(node, "type_params", None):
+        return None
+
+    # Keywords only have positions of their own from python 3.9, but they
+    # end where their values do.
+    arguments = [*node.bases, *(keyword.value for keyword in node.keywords)]
+    if arguments:
+        anchor_row, anchor_col = max(
+            _find_end(argument) for argument in arguments
+        )
+    else:
+        anchor_row, anchor_col = node.lineno - 1, node.col_offset
+
+    # Columns in the syntax tree count utf-8 bytes rather than characters, so
+    # they can only be used directly on lines that are plain ascii.
+    line_start = offsets[anchor_row]
+    offset = line_start + anchor_col
+    if not source[line_start:offset].isascii():
+        return None
+
+    if arguments:
+        # Only closing brackets, commas and trivia can appear between the end
+        # of the last argument and the colon.  Strings can not, so they do not
+        # need to be handled.
+        while True:
+            offset = _skip_trivia(source, offset)
+            if offset >= len(source) or source[offset] not in ",)":
+                break
+            offset += 1
+    else:
+        if not source.startswith("class", offset):
+            return None
+        offset = _skip_trivia(source, offset + len("class"))
+
+        # Non-ascii identifiers are normalized by the parser, so the name in
+        # the syntax tree may not match the text.
+        if not source.startswith(node.name, offset):
+            return None
+        offset = _skip_trivia(source, offset + len(node.name))
+
+        if source.startswith("(", offset):
+            offset = _skip_trivia(source, offset + 1)
+            if not source.startswith(")", offset):
+                return None
+            offset = _skip_trivia(source, offset + 1)
 
-    # Build an index of row lengths and start offsets to enable fast string
-    # indexing using ast row/column coordinates.
-    row_lengths = []
-    row_offsets = [0]
-    for offset, char in enumerate(text_padded):
-        if char == "\n":
-            row_lengths.append(offset - row_offsets[-1])
-            row_offsets.append(offset + 1)
-    row_lengths.append(len(text_padded) - row_offsets[-1])
+    if not source.startswith(":", offset):
+        return None
+    return offset + 1
 
-    tokens = iter(generate_tokens(StringIO(text_padded).readline))
+
+def _find_class_head_end_tokenize(statement):
+    node = statement.node
+    offsets = statement.line_offsets
+
+    # Only the text of the class itself is tokenized.  Token rows count from
+    # one at the first row of the statement, and columns on that row are
+    # relative to the column at which the statement starts.
+    tokens = iter(
+        generate_tokens(
+            StringIO(
+                statement.source[statement.start : statement.end]
+            ).readline
+        )
+    )
 
     for token in tokens:
         lineno, col_offset = token.start
-        if lineno == node.lineno and col_offset == node.col_offset:
+        if lineno == 1:
+            col_offset += statement.start_col
+        if (
+            lineno + statement.start_row == node.lineno
+            and col_offset == node.col_offset
+        ):
             assert token.string == "class"
             break
 
@@ -140,56 +254,70 @@ def split_class(statement):
 
     assert token.string == ":"
 
-    if node.body[0].lineno == token.end[0]:
+    colon_end_lineno, colon_end_col = token.end
+    if colon_end_lineno == 1:
+        colon_end_col += statement.start_col
+    return offsets[statement.start_row + colon_end_lineno - 1] + colon_end_col
+
+
+def split_class(statement):
+    node = statement.node
+    source = statement.source
+    offsets = statement.line_offsets
+
+    head_end = _find_class_head_end(statement)
+    if head_end is None:
+        head_end = _find_class_head_end_tokenize(statement)
+    colon_end_row = bisect.bisect_right(offsets, head_end - 1) - 1
+    colon_end_col = head_end - offsets[colon_end_row]
+
+    if node.body[0].lineno == colon_end_row + 1:
         # All tokens are on the same line.  `split` won't know how to indent
         # them so we do it ourselves.
-        head_end_lineno, head_end_col = token.end
-        head_end_row = head_end_lineno - 1
-
-        head_end_offset = row_offsets[head_end_row] + head_end_col
-        head_text_padded = text_padded[:head_end_offset].rstrip()
-        head_text = head_text_padded[len(text_padded) - len(text) :]
+        head_end_offset = offsets[colon_end_row] + colon_end_col
+        head_text = (
+            statement.indent + source[statement.start : head_end_offset]
+        ).rstrip()
 
         body_statements = []
-        for child_node in node.body:
+        for index, child_node in enumerate(node.body):
             child_start_row, child_start_col = _find_start(child_node)
             child_end_row, child_end_col = _find_end(child_node)
 
-            assert child_start_row == head_end_row
-            assert child_end_row == head_end_row
-
-            start_offset = row_offsets[child_start_row] + child_start_col
-            end_offset = row_offsets[child_end_row] + child_end_col
+            assert child_start_row == colon_end_row
+            assert child_end_row == colon_end_row
 
             body_statements.append(
                 Statement(
-                    text="    " + text_padded[start_offset:end_offset],
+                    source=source,
+                    start=offsets[child_start_row] + child_start_col,
+                    end=offsets[child_end_row] + child_end_col,
+                    indent="    ",
                     node=child_node,
                     start_row=child_start_row,
                     start_col=child_start_col,
+                    line_offsets=offsets,
+                    parent=statement,
+                    index=index,
                 )
             )
 
     else:
-        head_end_lineno, head_end_col = token.end[0] + 1, 0
-        head_end_row = head_end_lineno - 1
-
-        head_end_offset = row_offsets[head_end_row] + head_end_col
-        head_text_padded = text_padded[:head_end_offset].rstrip()
-        head_text = head_text_padded[len(text_padded) - len(text) :]
-
-        body_text_padded = (
-            (head_end_row) * "\n"
-            + head_end_col * " "
-            + text_padded[head_end_offset:]
-        )
+        head_end_row = colon_end_row + 1
+        head_end_offset = offsets[head_end_row]
+        head_text = (
+            statement.indent + source[statement.start : head_end_offset]
+        ).rstrip()
 
         body_statements = list(
             split(
-                body_text_padded,
+                source,
                 nodes=node.body,
                 next_row=head_end_row,
-                next_col=head_end_col,
+                next_col=0,
+                line_offsets=offsets,
+                stop=statement.end,
+                parent=statement,
             )
         )
 
@@ -197,10 +325,13 @@ def split_class(statement):
 
 
 def parse(root_text, *, filename="<unknown>"):
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
+    with ignore_warnings(), _stats.phase("parse"):
         try:
             root_node = ast.parse(root_text, filename)
         except SyntaxError as exc:
             raise ParseError(exc.msg, lineno=exc.lineno, col_offset=exc.offset)
-    return split(root_text, nodes=list(root_node.body))
+    return split(
+        root_text,
+        nodes=list(root_node.body),
+        line_offsets=_find_line_offsets(root_text),
+    )
@@ -0,0 +1,97 @@
+"""
+Rendering of sorted output from spans of the source text that statements
+were parsed from.
+
+A span is a `(text, start, end)` tuple referring to `text[start:end]`.
+Output is described as a sequence of spans so that statements can be
+reordered without first copying their text, and is only materialised once,
+with newlines converted and text encoded as each span is written.
+"""
+
+from __future__ import annotations
+
+import codecs
+import io
+from typing import IO, Any, Iterable, Iterator, Optional, Tuple, Union
+
+from ssort._statements import Statement
+
+Span = Tuple[str, int, int]
+
+NEWLINE: Span = ("\n", 0, 1)
+
+
+def text_span(text: str) -> Span:
+    """
+    Returns a span covering all of `text`.
+    """
+    return text, 0, len(text)
+
+
+def statement_spans(statement: Statement) -> Iterator[Span]:
+    """
+    Returns an iterator yielding the spans that make up the text of a
+    statement.
+    """
+    if statement.indent:
+        yield text_span(statement.indent)
+    yield statement.source, statement.start, statement.end
+
+
+def iter_chunks(
+    spans: Iterable[Span],
+    *,
+    newline: str = "\n",
+    encoding: Optional[str] = None,
+) -> Iterator[Union[str, bytes]]:
+    """
+    Returns an iterator yielding the text of each span, with `"\\n"`
+    replaced by `newline` and, if `encoding` is given, encoded to bytes.
+    """
+    encoder = None
+    if encoding is not None:
+        encoder = codecs.getincrementalencoder(encoding)()
+
+    for text, start, end in spans:
+        chunk = text[start:end]
+        if newline != "\n":
+            chunk = chunk.replace("\n", newline)
+        if encoder is not None:
+            yield encoder.encode(chunk)
+        else:
+            yield chunk
+
+    if encoder is not None:
+        yield encoder.encode("", final=True)
+
+
+def render(
+    spans: Iterable[Span],
+    *,
+    newline: str = "\n",
+    encoding: Optional[str] = None,
+    out: Optional[IO[Any]] = None,
+) -> Union[str, bytes, None]:
+    """
+    Renders a sequence of spans.
+
+    :param newline:
+        The newline sequence to write in place of `"\\n"`.
+    :param encoding:
+        If given, the output is encoded to bytes using this encoding.
+    :param out:
+        A file object to write the output to.  It should be opened in binary
+        mode if `encoding` is given, and otherwise in text mode with
+        `newline=""` so that newlines are not translated twice.  If omitted,
+        the output is returned instead.
+    """
+    if out is not None:
+        out.writelines(iter_chunks(spans, newline=newline, encoding=encoding))
+        return None
+
+    if encoding is None:
+        return "".join(iter_chunks(spans, newline=newline))  # type: ignore
+
+    buffer = io.BytesIO()
+    render(spans, newline=newline, encoding=encoding, out=buffer)
+    return buffer.getvalue()
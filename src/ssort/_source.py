@@ -0,0 +1,148 @@
+"""
+Python source text, along with the encoding and newline style needed to
+write it back out, shared by the command line tool and the library.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import pathlib
+from typing import Optional, Union
+
+from ssort._utils import detect_encoding, detect_newline, normalize_newlines
+
+MMAP_THRESHOLD = 1 << 20
+
+
+class Source:
+    """
+    The text of a python module, with newlines normalized to `"\\n"`.
+
+    Encodings and newline styles are detected once, when the source is
+    created.  UTF-8 text with `"\\n"` newlines, the common case, is decoded
+    without any further copies being made.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        *,
+        encoding: Optional[str] = None,
+        newline: str = "\n",
+        original: Union[str, bytes, None] = None,
+        path: Optional[pathlib.Path] = None,
+    ) -> None:
+        """
+        :param text:
+            The text of the module with newlines normalized to `"\\n"`.
+        :param encoding:
+            The encoding that the module was decoded from, if it was read as
+            bytes.  Output is encoded back to bytes with the same encoding.
+        :param newline:
+            The newline sequence to write in place of `"\\n"`.
+        :param original:
+            The text or bytes that the module was read from.  If omitted, it
+            is read back from `path` when asked for.
+        :param path:
+            The path of the file that the module was read from, if any.
+        """
+        self.text = text
+        self.encoding = encoding
+        self.newline = newline
+        self.path = path
+
+        self._original = original
+
+    @classmethod
+    def from_text(cls, text: str) -> Source:
+        """
+        Creates a source from text that has already been decoded.
+        """
+        newline = detect_newline(text)
+        return cls(
+            normalize_newlines(text),
+            newline=newline,
+            original=text,
+        )
+
+    @classmethod
+    def from_bytes(
+        cls,
+        data: Union[bytes, mmap.mmap],
+        *,
+        original: Optional[bytes] = None,
+        path: Optional[pathlib.Path] = None,
+    ) -> Source:
+        """
+        Creates a source from the raw contents of a python file.
+
+        :raises UnknownEncodingError:
+            If the file declares an encoding that python does not know.
+        :raises UnicodeDecodeError:
+            If the file can not be decoded using its encoding.
+        """
+        if original is None and isinstance(data, bytes):
+            original = data
+
+        encoding = detect_encoding(data)
+        text = str(data, encoding)
+        newline = detect_newline(text)
+        return cls(
+            normalize_newlines(text),
+            encoding=encoding,
+            newline=newline,
+            original=original,
+            path=path,
+        )
+
+    @classmethod
+    def from_path(
+        cls,
+        path: Union[str, os.PathLike[str]],
+        *,
+        mmap_threshold: Optional[int] = MMAP_THRESHOLD,
+    ) -> Source:
+        """
+        Reads a source from a python file.
+
+        :param mmap_threshold:
+            Files at least this many bytes long are decoded straight out of
+            a memory map, rather than first being read into memory as bytes.
+            `None` disables memory mapping.
+        :raises OSError:
+            If the file can not be read.
+        :raises UnknownEncodingError:
+            If the file declares an encoding that python does not know.
+        :raises UnicodeDecodeError:
+            If the file can not be decoded using its encoding.
+        """
+        path = pathlib.Path(path)
+        with open(path, "rb") as file:
+            if mmap_threshold is not None and os.fstat(
+                file.fileno()
+            ).st_size >= max(mmap_threshold, 1):
+                try:
+                    mapped = mmap.mmap(
+                        file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+                except (OSError, ValueError):
+                    # Not every file can be mapped, for example pipes.
+                    pass
+                else:
+                    with mapped:
+                        return cls.from_bytes(mapped, path=path)
+
+            data = file.read()
+        return cls.from_bytes(data, path=path)
+
+    @property
+    def original(self) -> Union[str, bytes]:
+        """
+        The text or bytes that the module was read from.
+        """
+        if self._original is None:
+            if self.path is None:
+                return self.text
+            self._original = self.path.read_bytes()
+        return self._original
@@ -1,12 +1,8 @@
 import ast
-import re
-import sys
+import bisect
 
-from ssort._dependencies import (
-    class_statements_initialisation_graph,
-    class_statements_runtime_graph,
-    module_statements_graph,
-)
+from ssort import _stats
+from ssort._dependencies import class_statements_graph, module_statements_graph
 from ssort._exceptions import (
     DecodingError,
     ParseError,
@@ -17,15 +13,13 @@ from ssort._exceptions import (
 from ssort._graphs import (
     is_topologically_sorted,
     replace_cycles,
+    topological_order,
     topological_sort,
 )
 from ssort._parsing import parse, split_class
-from ssort._utils import (
-    detect_encoding,
-    detect_newline,
-    normalize_newlines,
-    sort_key_from_iter,
-)
+from ssort._rendering import NEWLINE, render, statement_spans, text_span
+from ssort._source import Source
+from ssort._utils import sort_key_from_iter
 
 SPECIAL_PROPERTIES = [
     "__doc__",
@@ -162,16 +156,28 @@ REGULAR_OPERATIONS = [
 ]
 
 
-def _partition(values, predicate):
-    passed = []
-    failed = []
-
-    for value in values:
-        if predicate(value):
-            passed.append(value)
-        else:
-            failed.append(value)
-    return passed, failed
+# Groups that the statements in a class body are sorted into, in the order
+# that they are output.
+_DOCSTRING = 0
+_SPECIAL_PROPERTY = 1
+_INNER_CLASS = 2
+_PROPERTY = 3
+_LIFECYCLE_OPERATION = 4
+_METHOD = 5
+_REGULAR_OPERATION = 6
+
+# Maps the names of special attributes to the group that statements binding
+# them are sorted into, and their position within that group.  A statement
+# binding names from several groups goes in the one with the lowest number.
+_SPECIAL_ATTRIBUTES = {
+    name: (group, rank)
+    for group, names in (
+        (_REGULAR_OPERATION, REGULAR_OPERATIONS),
+        (_LIFECYCLE_OPERATION, LIFECYCLE_OPERATIONS),
+        (_SPECIAL_PROPERTY, SPECIAL_PROPERTIES),
+    )
+    for rank, name in enumerate(names)
+}
 
 
 def _is_string(statement):
@@ -186,152 +192,249 @@ def _is_string(statement):
     return isinstance(node.value, str)
 
 
-def _is_special_property(statement):
-    return any(
-        binding in SPECIAL_PROPERTIES for binding in statement.bindings()
-    )
-
-
-def _is_lifecycle_operation(statement):
-    return any(
-        binding in LIFECYCLE_OPERATIONS for binding in statement.bindings()
-    )
-
-
-def _is_regular_operation(statement):
-    return any(
-        binding in REGULAR_OPERATIONS for binding in statement.bindings()
-    )
-
-
-def _is_property(statement):
-    return isinstance(
-        statement.node, (ast.Assign, ast.AnnAssign, ast.AugAssign)
-    )
-
-
-def _is_class(statement):
-    return isinstance(statement.node, ast.ClassDef)
-
+def _classify(statement):
+    """
+    Returns the group that a statement in a class body belongs in, and its
+    position within that group if the group has a hard-coded order.
+    """
+    special = [
+        _SPECIAL_ATTRIBUTES[binding]
+        for binding in statement.bindings()
+        if binding in _SPECIAL_ATTRIBUTES
+    ]
+    if special:
+        return min(special)
 
-def _statement_binding_sort_key(binding_key):
-    def _safe_binding_key(binding):
-        try:
-            return binding_key(binding)
-        except KeyError:
-            return sys.maxsize
+    node = statement.node
+    if isinstance(node, ast.ClassDef):
+        return _INNER_CLASS, 0
+    if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+        return _PROPERTY, 0
+    return _METHOD, 0
 
-    def _key(statement):
-        bindings = statement.bindings()
-        return min(_safe_binding_key(binding) for binding in bindings)
 
-    return _key
+def _resort(statements, graph):
+    # Returns `statements` reordered so that they come after their
+    # dependencies, moving as few statements as possible.  Class bodies are
+    # usually sorted already, in which case there is nothing to do.
+    if is_topologically_sorted(statements, graph):
+        return statements
 
+    position = sort_key_from_iter(statements)
+    with _stats.phase("cycles"):
+        cycles = replace_cycles(graph, key=position)
+    with _stats.phase("sort"):
+        sorted_statements = topological_order(graph, key=position)
 
-def _statement_text_sorted_class(statement):
-    head_text, statements = split_class(statement)
+    stats = _stats.current()
+    if stats is not None:
+        stats.cycles += cycles
+    return sorted_statements
 
-    # Take a snapshot of any hard dependencies between statements so that we can
-    # restore them later.
-    initialisation_graph = class_statements_initialisation_graph(statements)
 
+def _sort_class_statements(statements):
     # === Split up the statements into high level groups =======================
+    # Each statement is classified once.  Statements in groups without a
+    # hard-coded order keep their original order.
+    groups = [_classify(statement) for statement in statements]
     if _is_string(statements[0]):
-        docstrings, statements = statements[:1], statements[1:]
-    else:
-        docstrings = []
-
-    special_properties, statements = _partition(
-        statements, _is_special_property
-    )
-
-    lifecycle_operations, statements = _partition(
-        statements, _is_lifecycle_operation
-    )
-
-    regular_operations, statements = _partition(
-        statements, _is_regular_operation
-    )
-
-    inner_classes, statements = _partition(statements, _is_class)
-
-    properties, statements = _partition(statements, _is_property)
-
-    methods, statements = statements, []
-
-    sorted_statements = []
-
-    # === Join groups back together in the correct order =======================
-    sorted_statements += docstrings
-
-    # Special properties (in hard-coded order).
-    sorted_statements += sorted(
-        special_properties,
-        key=_statement_binding_sort_key(
-            sort_key_from_iter(SPECIAL_PROPERTIES)
-        ),
-    )
-
-    # Inner classes (in original order).
-    sorted_statements += inner_classes
-
-    # Regular properties (in original order).
-    sorted_statements += properties
-
-    # Special lifecycle methods (in hard-coded order).
-    sorted_statements += sorted(
-        lifecycle_operations,
-        key=_statement_binding_sort_key(
-            sort_key_from_iter(LIFECYCLE_OPERATIONS)
-        ),
-    )
-
-    # Regular methods.
-    sorted_statements += methods
+        groups[0] = _DOCSTRING, 0
 
-    # Special operations (in hard-coded order).
-    sorted_statements += sorted(
-        regular_operations,
-        key=_statement_binding_sort_key(
-            sort_key_from_iter(REGULAR_OPERATIONS)
-        ),
-    )
+    sorted_statements = [
+        statement
+        for _, statement in sorted(
+            zip(groups, statements), key=lambda item: item[0]
+        )
+    ]
 
     # === Re-sort based on dependencies between statements =====================
 
-    # Fix any hard dependencies.
-    sorted_statements = topological_sort(
-        sorted_statements, graph=initialisation_graph
+    # Fix any hard dependencies.  These always point backwards in the original
+    # order, so cannot form cycles.
+    graph, runtime_dependencies = class_statements_graph(
+        statements, ignore_public=True
     )
+    stats = _stats.current()
+    if stats is not None:
+        stats.statements += len(statements)
+        stats.edges += graph.edge_count()
+    sorted_statements = _resort(sorted_statements, graph)
 
     # Attempt to resolve soft dependencies on private attributes, but with hard
     # dependencies taking priority, and always preserving the original order
-    # where there are cycles.
-    runtime_graph = class_statements_runtime_graph(
-        sorted_statements, ignore_public=True
-    )
-    runtime_graph.update(initialisation_graph)
-    replace_cycles(runtime_graph, key=sort_key_from_iter(sorted_statements))
-
-    sorted_statements = topological_sort(
-        sorted_statements, graph=runtime_graph
-    )
-
-    return (
-        head_text
-        + "\n"
-        + "\n".join(
-            statement_text_sorted(body_statement)
-            for body_statement in sorted_statements
-        )
-    )
-
-
-def statement_text_sorted(statement):
-    node = statement.node
-    if isinstance(node, ast.ClassDef):
-        return _statement_text_sorted_class(statement)
-    return statement.text
+    # where there are cycles.  An attribute that is bound more than once
+    # refers to the binding that comes last.
+    if runtime_dependencies:
+        position = sort_key_from_iter(sorted_statements)
+        for dependant, bindings in runtime_dependencies:
+            graph.add_dependency(dependant, max(bindings, key=position))
+        sorted_statements = _resort(sorted_statements, graph)
+
+    return sorted_statements
+
+
+def _sort_class(statement):
+    with _stats.phase("classes"):
+        head_text, statements = split_class(statement)
+        return head_text, statements, _sort_class_statements(statements)
+
+
+def _count_moved(statements, sorted_statements):
+    # The statements that do not need to move are those in the longest
+    # subsequence of the sorted statements that is still in the original
+    # order.
+    key = sort_key_from_iter(statements)
+    tails = []
+    for statement in sorted_statements:
+        index = key(statement)
+        position = bisect.bisect_left(tails, index)
+        if position == len(tails):
+            tails.append(index)
+        else:
+            tails[position] = index
+    return len(sorted_statements) - len(tails)
+
+
+class SortResult:
+    """
+    The result of sorting a python module with `ssort_result`.
+
+    Class bodies are only sorted, and the sorted text is only rendered, when
+    it is asked for.
+    """
+
+    def __init__(
+        self,
+        *,
+        source=None,
+        original=None,
+        statements=(),
+        sorted_statements=(),
+    ):
+        self._original = original
+        self._source = source
+        self._statements = statements
+        self._sorted_statements = sorted_statements
+        self._classes = {}
+        self._changed = None
+
+    @property
+    def original(self):
+        """
+        The text or bytes that were sorted.
+        """
+        if self._source is not None:
+            return self._source.original
+        return self._original
+
+    def _sorted_class(self, statement):
+        result = self._classes.get(statement)
+        if result is None:
+            result = self._classes[statement] = _sort_class(statement)
+        return result
+
+    def _statement_spans(self, statement):
+        if not isinstance(statement.node, ast.ClassDef):
+            yield from statement_spans(statement)
+            return
+
+        head_text, _, sorted_statements = self._sorted_class(statement)
+        yield text_span(head_text)
+        for body_statement in sorted_statements:
+            yield NEWLINE
+            yield from self._statement_spans(body_statement)
+
+    def _spans(self):
+        for index, statement in enumerate(self._sorted_statements):
+            if index:
+                yield NEWLINE
+            yield from self._statement_spans(statement)
+        yield NEWLINE
+
+    def _matches_source(self):
+        # Walks the spans that the output would be rendered from, checking
+        # that each one picks up exactly where the previous one left off in
+        # the source.  Stops, without sorting any further class bodies, at the
+        # first span that does not.
+        source = self._source.text
+        cursor = 0
+        for text, start, end in self._spans():
+            if text is source:
+                if start != cursor:
+                    return False
+                cursor = end
+            elif source.startswith(text[start:end], cursor):
+                cursor += end - start
+            else:
+                return False
+        return cursor == len(source)
+
+    @property
+    def changed(self):
+        """
+        `True` if sorting changes the text of the module.  Modules that mix
+        newline styles are written out with just one, but are not counted as
+        changed for that alone.
+        """
+        if self._changed is None:
+            with _stats.phase("render"):
+                self._changed = (
+                    bool(self._statements) and not self._matches_source()
+                )
+        return self._changed
+
+    @property
+    def moved(self):
+        """
+        The number of statements, including statements in class bodies, that
+        have to be moved to put the module in sorted order.
+        """
+        moved = _count_moved(self._statements, self._sorted_statements)
+        stack = list(self._sorted_statements)
+        while stack:
+            statement = stack.pop()
+            if isinstance(statement.node, ast.ClassDef):
+                _, statements, sorted_statements = self._sorted_class(
+                    statement
+                )
+                moved += _count_moved(statements, sorted_statements)
+                stack += sorted_statements
+        return moved
+
+    def output(self, *, out=None):
+        """
+        Returns the sorted text, as bytes if the original text was bytes.
+        Text that could not be sorted, or that has no statements, is returned
+        exactly as it was given.
+
+        If `out` is given, the sorted text is written to it instead and
+        `None` is returned.  See `ssort`.
+        """
+        if not self._statements:
+            if out is None:
+                return self.original
+            out.write(self.original)
+            return None
+
+        with _stats.phase("render"):
+            return render(
+                self._spans(),
+                newline=self._source.newline,
+                encoding=self._source.encoding,
+                out=out,
+            )
+
+    def text(self):
+        """
+        Returns the sorted text as a string, with newlines normalized to
+        `"\\n"`.
+        """
+        if not self._statements:
+            if self._source is None:
+                return self.original
+            return self._source.text
+        with _stats.phase("render"):
+            return render(self._spans())
 
 
 def _on_unknown_encoding_ignore(message, **kwargs):
@@ -433,7 +536,7 @@ def _interpret_on_wildcard_import_action(on_wildcard_import):
     return on_wildcard_import
 
 
-def ssort(
+def ssort_result(
     text,
     *,
     filename="<unknown>",
@@ -443,6 +546,13 @@ def ssort(
     on_unresolved="raise",
     on_wildcard_import="raise",
 ):
+    """
+    Sorts the statements in a python module, returning a `SortResult`.
+
+    Takes the same arguments as `ssort`.  The module is parsed, and the order
+    of its top level statements worked out, before this function returns, so
+    that errors are reported straight away.
+    """
     on_unknown_encoding_error = _interpret_on_unknown_encoding_action(
         on_unknown_encoding_error
     )
@@ -453,53 +563,102 @@ def ssort(
         on_wildcard_import
     )
 
-    try:
-        encoding = None
-        if isinstance(text, bytes):
-            encoding = detect_encoding(text)
-            text = text.decode(encoding)
-    except UnknownEncodingError as exc:
-        on_unknown_encoding_error(str(exc), encoding=exc.encoding)
-        return text
+    if isinstance(text, Source):
+        source = text
+    else:
+        try:
+            with _stats.phase("decode"):
+                if isinstance(text, bytes):
+                    source = Source.from_bytes(text)
+                else:
+                    source = Source.from_text(text)
+        except UnknownEncodingError as exc:
+            on_unknown_encoding_error(str(exc), encoding=exc.encoding)
+            return SortResult(original=text)
 
-    except UnicodeDecodeError as exc:
-        on_decoding_error(str(exc))
-        return text
+        except UnicodeDecodeError as exc:
+            on_decoding_error(str(exc))
+            return SortResult(original=text)
 
-    newline = detect_newline(text)
-    text = normalize_newlines(text)
+    text = source.text
 
     try:
-        statements = list(parse(text, filename=filename))
+        with _stats.phase("split"):
+            statements = list(parse(text, filename=filename))
     except ParseError as exc:
         on_parse_error(str(exc), lineno=exc.lineno, col_offset=exc.col_offset)
-        return text
+        return SortResult(source=source)
 
     if not statements:
-        return text
-
-    graph = module_statements_graph(
-        statements,
-        on_unresolved=on_unresolved,
-        on_wildcard_import=on_wildcard_import,
-    )
+        return SortResult(source=source)
+
+    # Every statement is analysed while building the graph anyway.  Doing it
+    # first lets the two be timed separately.
+    with _stats.phase("requirements"):
+        for statement in statements:
+            statement.analysis()
+
+    with _stats.phase("graph"):
+        graph = module_statements_graph(
+            statements,
+            on_unresolved=on_unresolved,
+            on_wildcard_import=on_wildcard_import,
+        )
     if graph is None:
-        return text
+        return SortResult(source=source)
+
+    stats = _stats.current()
+    if stats is not None:
+        stats.statements += len(statements)
+        stats.edges += graph.edge_count()
+
+    with _stats.phase("cycles"):
+        cycles = replace_cycles(graph, key=sort_key_from_iter(statements))
 
-    replace_cycles(graph, key=sort_key_from_iter(statements))
+    with _stats.phase("sort"):
+        sorted_statements = topological_sort(statements, graph=graph)
 
-    sorted_statements = topological_sort(statements, graph=graph)
+        assert is_topologically_sorted(sorted_statements, graph=graph)
 
-    assert is_topologically_sorted(sorted_statements, graph=graph)
+    if stats is not None:
+        stats.cycles += cycles
 
-    output = "\n".join(
-        statement_text_sorted(statement) for statement in sorted_statements
+    return SortResult(
+        source=source,
+        statements=statements,
+        sorted_statements=sorted_statements,
+    )
+
+
+def ssort(
+    text,
+    *,
+    filename="<unknown>",
+    on_unknown_encoding_error="raise",
+    on_decoding_error="raise",
+    on_parse_error="raise",
+    on_unresolved="raise",
+    on_wildcard_import="raise",
+    out=None,
+):
+    """
+    Sorts the statements in a python module so that each statement comes
+    after the statements that it depends on.
+
+    `text` can be a string, bytes, or a `Source`.  Returns the sorted text,
+    as bytes if `text` was bytes or was read from a file.  If `out` is
+    given, the sorted text is written to it instead and `None` is returned.
+    `out` should be a binary file if `text` is bytes, and otherwise a text
+    file opened with `newline=""`.  If the text can not be sorted, it is
+    returned, or written to `out`, exactly as it was given.
+    """
+    result = ssort_result(
+        text,
+        filename=filename,
+        on_unknown_encoding_error=on_unknown_encoding_error,
+        on_decoding_error=on_decoding_error,
+        on_parse_error=on_parse_error,
+        on_unresolved=on_unresolved,
+        on_wildcard_import=on_wildcard_import,
     )
-    if output:
-        output += "\n"
-
-    if newline != "\n":
-        output = re.sub("\n", newline, output)
-    if encoding is not None:
-        output = output.encode(encoding)
-    return output
+    return result.output(out=out)
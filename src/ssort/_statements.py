@@ -1,24 +1,99 @@
 from __future__ import annotations
 
 import ast
-from typing import Iterable
+from typing import Iterable, Optional, Sequence
 
-from ssort._bindings import get_bindings
-from ssort._method_requirements import get_method_requirements
-from ssort._requirements import Requirement, get_requirements
-from ssort._utils import cached_method
+from ssort._analysis import Analysis, Requirement, analyze
 
 
 class Statement:
+    """
+    A statement, and any comments attached to it, backed by a span of the
+    source text that it was parsed from.
+
+    Statements split from the same text share a reference to it and only
+    record where their own text starts and ends.  The text of a statement is
+    only copied out when it is asked for.
+
+    Statements split from the body of a class keep a reference to the class
+    definition statement, and take their analysis from the analysis of the
+    class rather than visiting their syntax trees a second time.
+    """
+
+    __slots__ = (
+        "source",
+        "start",
+        "end",
+        "indent",
+        "line_offsets",
+        "node",
+        "start_row",
+        "start_col",
+        "parent",
+        "index",
+        "_analysis",
+    )
+
     def __init__(
-        self, *, text: str, node: ast.AST, start_row: int, start_col: int
+        self,
+        *,
+        source: str,
+        start: int,
+        end: int,
+        node: ast.AST,
+        start_row: int,
+        start_col: int,
+        indent: str = "",
+        line_offsets: Sequence[int],
+        parent: Optional[Statement] = None,
+        index: int = 0,
     ) -> None:
-        self.text = text
+        """
+        :param source:
+            The text that the statement was split from.
+        :param start:
+            Offset in `source` of the first character of the statement.
+        :param end:
+            Offset in `source` one past the last character of the statement.
+        :param node:
+            The syntax tree of the statement.
+        :param start_row:
+            The row, in the coordinates used by `node`, at which the text of
+            the statement starts.
+        :param start_col:
+            The column at which the text of the statement starts.
+        :param indent:
+            Whitespace to put in front of the text of the statement so that it
+            can be rendered on a line of its own.
+        :param line_offsets:
+            The offset in `source` of the start of each row.  Shared between
+            all statements split from the same source.
+        :param parent:
+            The class definition statement that this statement was split
+            from, if it is part of the body of a class.
+        :param index:
+            The position of the statement in the body of `parent`.
+        """
+        self.source = source
+        self.start = start
+        self.end = end
+        self.indent = indent
+        self.line_offsets = line_offsets
         self.node = node
         self.start_row = start_row
         self.start_col = start_col
+        self.parent = parent
+        self.index = index
+
+        self._analysis: Optional[Analysis] = None
+
+    @property
+    def text(self) -> str:
+        """
+        The source text of the statement.
+        """
+        return self.indent + self.source[self.start : self.end]
 
-    @cached_method
     def text_padded(self) -> str:
         """
         Return the statement text padded with leading whitespace so that
@@ -26,28 +101,37 @@ class Statement:
         """
         return ("\n" * self.start_row) + (" " * self.start_col) + self.text
 
-    @cached_method
+    def analysis(self) -> Analysis:
+        """
+        Returns the bindings, requirements and method requirements of this
+        statement, computed together in a single pass over its syntax tree.
+        """
+        if self._analysis is None:
+            if self.parent is not None:
+                self._analysis = self.parent.analysis().body[self.index]
+            else:
+                self._analysis = analyze(self.node)
+        return self._analysis
+
     def requirements(self) -> Iterable[Requirement]:
         """
         Returns an iterable yielding Requirement objects describing the
         bindings that this statement references.
         """
-        return tuple(get_requirements(self.node))
+        return self.analysis().requirements
 
-    @cached_method
     def method_requirements(self) -> Iterable[str]:
         """
         Returns an iterable yielding the names of attributes of the `self`
         parameter that this statement depends on.
         """
-        return tuple(get_method_requirements(self.node))
+        return self.analysis().method_requirements
 
-    @cached_method
     def bindings(self) -> Iterable[str]:
         """
         Returns an iterable yielding the names bound by this statement.
         """
-        return tuple(get_bindings(self.node))
+        return self.analysis().bindings
 
     def __repr__(self) -> str:
         return f"<Statement text={self.text!r}>"
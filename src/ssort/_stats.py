@@ -0,0 +1,423 @@
+"""
+Statistics about where the time goes when sorting files, collected for the
+`--stats` and `--profile` options of the command line tool.
+
+The sorter marks each phase of its work with `phase`, which does nothing
+unless statistics are being recorded for the file being sorted in the
+current thread.  Times are exclusive: time spent in a phase that starts
+inside another phase is only counted against the inner one.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import hashlib
+import heapq
+import json
+import os
+import sys
+import time
+import urllib.parse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# The phases that time is recorded against, in the order that they happen,
+# with descriptions for reports.
+PHASES = {
+    "read": "reading files",
+    "cache": "cache lookups and updates",
+    "decode": "decoding source",
+    "parse": "ast.parse",
+    "split": "splitting statements",
+    "requirements": "requirement analysis",
+    "graph": "graph construction",
+    "cycles": "cycle replacement",
+    "sort": "topological sort",
+    "classes": "class sorting",
+    "render": "rendering",
+    "diff": "diffing",
+    "write": "writing files",
+}
+
+_PHASE_ORDER = {name: index for index, name in enumerate(PHASES)}
+
+# The longest name, in characters, given to a profile, which leaves room for
+# the suffix within the 255 byte limit of most file systems.
+_MAX_PROFILE_NAME = 200
+
+
+class FileStats:
+    """
+    The statistics recorded while sorting, or checking, one file.
+
+    `phases` maps the name of each phase to the wall clock and CPU time, in
+    seconds, spent in it.  Time not spent in any phase is not included, but
+    is part of the totals in `wall` and `cpu`.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.phases: Dict[str, List[float]] = {}
+        self.cached = False
+        self.statements = 0
+        self.edges = 0
+        self.cycles = 0
+        self.profile: Optional[str] = None
+        self.profile_error: Optional[str] = None
+        # The wall clock and CPU time spent in nested phases, for each phase
+        # that has been entered and not yet left.
+        self._nested: List[List[float]] = []
+
+    def add(self, name: str, wall: float, cpu: float) -> None:
+        times = self.phases.get(name)
+        if times is None:
+            self.phases[name] = [wall, cpu]
+        else:
+            times[0] += wall
+            times[1] += cpu
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "cached": self.cached,
+            "statements": self.statements,
+            "edges": self.edges,
+            "cycles": self.cycles,
+            "phases": {
+                name: {"wall": wall, "cpu": cpu}
+                for name, (wall, cpu) in self.phases.items()
+            },
+            "profile": self.profile,
+        }
+
+
+_current: contextvars.ContextVar[Optional[FileStats]] = contextvars.ContextVar(
+    "ssort_stats", default=None
+)
+
+
+class _Phase:
+    __slots__ = ("_stats", "_name", "_wall", "_cpu")
+
+    def __init__(self, stats: FileStats, name: str) -> None:
+        self._stats = stats
+        self._name = name
+
+    def __enter__(self) -> None:
+        self._stats._nested.append([0.0, 0.0])
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        nested = self._stats._nested
+        nested_wall, nested_cpu = nested.pop()
+        self._stats.add(self._name, wall - nested_wall, cpu - nested_cpu)
+        if nested:
+            nested[-1][0] += wall
+            nested[-1][1] += cpu
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def current() -> Optional[FileStats]:
+    """
+    Returns the statistics being recorded in the current thread, if any.
+    """
+    return _current.get()
+
+
+def phase(name: str) -> Any:
+    """
+    Returns a context manager that times the code that it wraps as part of
+    the named phase.
+    """
+    stats = _current.get()
+    if stats is None:
+        return _NO_PHASE
+    return _Phase(stats, name)
+
+
+def _profile_name(path: str) -> str:
+    name = urllib.parse.quote(path, safe="")
+    if len(name) <= _MAX_PROFILE_NAME:
+        return name + ".prof"
+
+    # Names that are too long are cut down to the end of the path, which is
+    # the part worth seeing, and made unique again with a hash of all of it.
+    digest = hashlib.blake2b(name.encode(), digest_size=8).hexdigest()
+    budget = _MAX_PROFILE_NAME - len(digest) - 1
+    start = len(path)
+    while start > 0:
+        size = len(urllib.parse.quote(path[start - 1], safe=""))
+        if size > budget:
+            break
+        budget -= size
+        start -= 1
+    return f"{digest}-{urllib.parse.quote(path[start:], safe='')}.prof"
+
+
+class Recorder:
+    """
+    Records `FileStats` for each file that it is asked to.
+
+    If `profile_dir` is given, each file is also sorted under `cProfile`,
+    and the profiles of files that take at least `profile_threshold` seconds
+    are saved there, named after the quoted path of the file, or the end of
+    it if it is too long.  If a profile can not be saved, the reason is left
+    in `profile_error` rather than raised.  Profiling slows sorting down,
+    and the times that are recorded include its overhead.
+
+    Recorders only hold their settings, so can be sent to worker processes.
+    """
+
+    def __init__(
+        self,
+        *,
+        profile_dir: Optional[str] = None,
+        profile_threshold: float = 0.0,
+    ) -> None:
+        self.profile_dir = profile_dir
+        self.profile_threshold = profile_threshold
+
+    @contextlib.contextmanager
+    def record(self, path: str) -> Iterator[FileStats]:
+        stats = FileStats(path)
+        profiler = None
+        if self.profile_dir is not None:
+            import cProfile
+
+            profiler = cProfile.Profile()
+
+        token = _current.set(stats)
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield stats
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            stats.wall = time.perf_counter() - wall
+            stats.cpu = time.thread_time() - cpu
+            _current.reset(token)
+
+        if profiler is not None and stats.wall >= self.profile_threshold:
+            assert self.profile_dir is not None
+            profile = os.path.join(self.profile_dir, _profile_name(path))
+            try:
+                profiler.dump_stats(profile)
+            except OSError as exc:
+                stats.profile_error = exc.strerror or str(exc)
+            else:
+                stats.profile = profile
+
+
+def _peak_memory() -> Tuple[Optional[int], Optional[int]]:
+    # Returns the peak resident set size, in bytes, of this process and of
+    # the largest of its child processes that have exited.
+    try:
+        import resource
+    except ImportError:
+        return None, None
+
+    # Linux reports sizes in kilobytes, and macOS in bytes.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    )
+
+
+def _cpu_time() -> float:
+    times = os.times()
+    return (
+        times.user + times.system + times.children_user + times.children_system
+    )
+
+
+class RunStats:
+    """
+    Totals of the statistics recorded for each file in a run, along with the
+    `slowest` files.
+
+    Only the totals and the slowest files are kept, so that runs over any
+    number of files take the same amount of memory.
+
+    `worker_processes` should be set to the number of worker processes that
+    files were sorted in, if any, for their peak memory to be reported.
+    """
+
+    def __init__(self, *, slowest: int = 10) -> None:
+        self.slowest = slowest
+        self.worker_processes = 0
+        self.files = 0
+        self.cached = 0
+        self.statements = 0
+        self.edges = 0
+        self.cycles = 0
+        self.phases: Dict[str, List[float]] = {}
+        self.file_wall = 0.0
+        self.file_cpu = 0.0
+        self._slowest: List[Tuple[float, int, FileStats]] = []
+        self._wall = time.perf_counter()
+        self._cpu = _cpu_time()
+
+    def add(self, stats: FileStats) -> None:
+        self.files += 1
+        self.cached += stats.cached
+        self.statements += stats.statements
+        self.edges += stats.edges
+        self.cycles += stats.cycles
+        self.file_wall += stats.wall
+        self.file_cpu += stats.cpu
+        for name, (wall, cpu) in stats.phases.items():
+            times = self.phases.setdefault(name, [0.0, 0.0])
+            times[0] += wall
+            times[1] += cpu
+
+        if self.slowest > 0:
+            item = (stats.wall, self.files, stats)
+            if len(self._slowest) < self.slowest:
+                heapq.heappush(self._slowest, item)
+            else:
+                heapq.heappushpop(self._slowest, item)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the statistics for the run so far.  The CPU time and peak
+        memory of worker processes are only included once they have exited.
+        """
+        peak_memory, peak_worker_memory = _peak_memory()
+        if not self.worker_processes:
+            peak_worker_memory = None
+        phases = {
+            name: {"wall": wall, "cpu": cpu}
+            for name, (wall, cpu) in sorted(
+                self.phases.items(),
+                key=lambda item: _PHASE_ORDER.get(item[0], len(PHASES)),
+            )
+        }
+        return {
+            "wall": time.perf_counter() - self._wall,
+            "cpu": _cpu_time() - self._cpu,
+            "files": self.files,
+            "cached": self.cached,
+            "statements": self.statements,
+            "edges": self.edges,
+            "cycles": self.cycles,
+            "peak_memory": peak_memory,
+            "worker_processes": self.worker_processes,
+            "peak_worker_memory": peak_worker_memory,
+            "file_wall": self.file_wall,
+            "file_cpu": self.file_cpu,
+            "phases": phases,
+            "slowest": [
+                stats.to_dict()
+                for _, _, stats in sorted(self._slowest, reverse=True)
+            ],
+        }
+
+
+def _format_size(size: int) -> str:
+    return f"{size / (1 << 20):.1f} MiB"
+
+
+def _format_phases(phases: Dict[str, Dict[str, float]]) -> str:
+    # Phases are listed slowest first, leaving out any that took less than a
+    # millisecond.
+    return ", ".join(
+        f"{name} {times['wall']:.3f}s"
+        for name, times in sorted(
+            phases.items(), key=lambda item: item[1]["wall"], reverse=True
+        )
+        if times["wall"] >= 0.0005
+    )
+
+
+def format_text(report: Dict[str, Any]) -> str:
+    """
+    Formats the statistics returned by `RunStats.to_dict` for people to
+    read.
+    """
+    lines = [
+        f"Run time: {report['wall']:.3f}s, {report['cpu']:.3f}s CPU",
+        f"Files: {report['files']}, {report['cached']} from the cache",
+        f"Statements: {report['statements']}, dependencies: "
+        f"{report['edges']}, cycles: {report['cycles']}",
+    ]
+    if report["peak_memory"] is not None:
+        memory = f"Peak memory: {_format_size(report['peak_memory'])}"
+        if report["peak_worker_memory"] is not None:
+            memory += (
+                f", {_format_size(report['peak_worker_memory'])} in the "
+                "largest worker process"
+            )
+        lines.append(memory)
+
+    lines.append("")
+    lines.append(f"{'Phase':<36} {'Wall':>10} {'CPU':>10}")
+    rows = [
+        (f"{name} ({PHASES.get(name, name)})", times["wall"], times["cpu"])
+        for name, times in report["phases"].items()
+    ]
+    rows.append(
+        (
+            "other, including imports",
+            report["file_wall"]
+            - sum(times["wall"] for times in report["phases"].values()),
+            report["file_cpu"]
+            - sum(times["cpu"] for times in report["phases"].values()),
+        )
+    )
+    rows.append(
+        ("total, summed over files", report["file_wall"], report["file_cpu"])
+    )
+    for label, wall, cpu in rows:
+        lines.append(f"{label:<36} {wall:>9.3f}s {cpu:>9.3f}s")
+
+    if report["slowest"]:
+        lines.append("")
+        lines.append("Slowest files:")
+        for stats in report["slowest"]:
+            lines.append(f"{stats['wall']:>9.3f}s  {stats['path']}")
+            if stats["cached"]:
+                lines.append(f"{'':>12}cached")
+            else:
+                lines.append(
+                    f"{'':>12}statements: {stats['statements']}, "
+                    f"dependencies: {stats['edges']}, "
+                    f"cycles: {stats['cycles']}"
+                )
+            phases = _format_phases(stats["phases"])
+            if phases:
+                lines.append(f"{'':>12}{phases}")
+            if stats["profile"] is not None:
+                lines.append(f"{'':>12}profile: {stats['profile']}")
+
+    return "".join(line + "\n" for line in lines)
+
+
+def format_json(report: Dict[str, Any]) -> str:
+    """
+    Formats the statistics returned by `RunStats.to_dict` as a single line
+    of JSON.
+    """
+    return json.dumps(report) + "\n"
@@ -0,0 +1,392 @@
+"""
+An alternative to `ssort._analysis` that takes the scoping of names inside
+functions and lambdas from CPython's `symtable` module instead of working it
+out by hand.
+
+Statement level code, class bodies and comprehensions are still walked by the
+visitor from `ssort._analysis` so that the bindings it reports are unchanged,
+but the requirements of everything below a function or lambda boundary are
+read off the symbol table.  The syntax tree is only used to find the positions
+to report for those requirements.
+
+This is slower than the visitor, so it is not used for sorting.  It is kept as
+an independent cross-check on the visitor, which the tests compare it against
+for every statement in the sample modules.
+"""
+
+from __future__ import annotations
+
+import ast
+import collections
+import symtable
+from typing import Callable, DefaultDict, Deque, Iterator, Optional
+
+from ssort._analysis import (
+    _HANDLERS,
+    Analysis,
+    LexicalScope,
+    Requirement,
+    Scope,
+    _Analyzer,
+    _merge_requirements,
+)
+from ssort._analysis import analyze as _analyze_with_visitor
+from ssort._ast import iter_child_nodes
+from ssort._utils import ignore_warnings
+
+_COMPREHENSION_NAMES = {
+    ast.ListComp: "listcomp",
+    ast.SetComp: "setcomp",
+    ast.DictComp: "dictcomp",
+    ast.GeneratorExp: "genexpr",
+}
+
+_SCOPE_NAMES: dict[type[ast.AST], str] = {
+    ast.Lambda: "lambda",
+    **_COMPREHENSION_NAMES,
+}
+
+
+def _node_key(node: ast.AST) -> tuple[str, int]:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return node.name, node.lineno
+    return _SCOPE_NAMES[type(node)], node.lineno  # type: ignore
+
+
+def _table_name(table: symtable.SymbolTable) -> str:
+    # Newer versions of python wrap the names of anonymous scopes in angle
+    # brackets.
+    return table.get_name().strip("<>")
+
+
+def _table_bindings(table: symtable.SymbolTable) -> tuple[str, ...]:
+    return tuple(
+        symbol.get_name()
+        for symbol in table.get_symbols()
+        if symbol.is_local()
+        or symbol.is_declared_global()
+        or symbol.is_nonlocal()
+    )
+
+
+def _is_bound(table: symtable.SymbolTable, name: str) -> bool:
+    try:
+        return table.lookup(name).is_local()
+    except KeyError:
+        return False
+
+
+class _Locations:
+    """
+    The positions of the names referenced within the body of a function or
+    lambda, and the nodes within it that introduce nested scopes, collected
+    in a single walk of its subtree.
+    """
+
+    def __init__(self, body: list[ast.AST], self_name: str | None) -> None:
+        self.names: dict[str, ast.AST] = {}
+        self.declarations: dict[str, ast.AST] = {}
+        self.scopes: DefaultDict[tuple[str, int], Deque[ast.AST]] = (
+            collections.defaultdict(collections.deque)
+        )
+        self.method_requirements: list[str] = []
+
+        # Walk in source order so that the first occurrence of each name is
+        # the one that gets reported.
+        stack = [(node, self_name) for node in reversed(body)]
+        while stack:
+            node, self_name = stack.pop()
+
+            if isinstance(node, ast.Name):
+                if not isinstance(node.ctx, ast.Store):
+                    self.names.setdefault(node.id, node)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                for name in node.names:
+                    self.declarations.setdefault(name, node)
+            elif isinstance(node, ast.Attribute):
+                if (
+                    self_name is not None
+                    and isinstance(node.ctx, ast.Load)
+                    and isinstance(node.value, ast.Name)
+                    and node.value.id == self_name
+                ):
+                    self.method_requirements.append(node.attr)
+            elif type(node) in _SCOPE_NAMES or isinstance(
+                node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+            ):
+                self.scopes[_node_key(node)].append(node)
+
+                # Attribute accesses within nested classes refer to a
+                # different `self`.
+                if isinstance(node, ast.ClassDef):
+                    self_name = None
+
+            stack.extend(
+                (child, self_name)
+                for child in reversed(list(iter_child_nodes(node)))
+            )
+
+    def pop_scope(self, key: tuple[str, int]) -> ast.AST | None:
+        nodes = self.scopes.get(key)
+        if not nodes:
+            return None
+        return nodes.popleft()
+
+
+class _SymtableAnalyzer(_Analyzer):
+    """
+    A variant of `ssort._analysis._Analyzer` that, rather than visiting the
+    bodies of functions and lambdas, looks up what they require in the symbol
+    table of the statement.
+    """
+
+    def _table_key(self, table: symtable.SymbolTable) -> tuple[str, int]:
+        return _table_name(table), table.get_lineno() + self._line_offset
+
+    def __init__(
+        self, root: ast.AST, table: symtable.SymbolTable, line_offset: int
+    ) -> None:
+        super().__init__(root)
+
+        self._line_offset = line_offset
+        self._tables: DefaultDict[
+            tuple[str, int], Deque[symtable.SymbolTable]
+        ] = collections.defaultdict(collections.deque)
+
+        # Only scopes that the visitor can reach directly need to be indexed.
+        # Everything nested inside a function or lambda is reached through the
+        # symbol table of its parent instead.
+        stack = list(reversed(table.get_children()))
+        while stack:
+            child = stack.pop()
+            self._tables[self._table_key(child)].append(child)
+            if (
+                child.get_type() == "class"
+                or _table_name(child) in _COMPREHENSION_NAMES.values()
+            ):
+                stack.extend(reversed(child.get_children()))
+
+    def _pop_table(self, node: ast.AST) -> symtable.SymbolTable | None:
+        tables = self._tables.get(_node_key(node))
+        if not tables:
+            return None
+        return tables.popleft()
+
+    def _dispatch(self, node: ast.AST) -> Optional[Iterator[ast.AST]]:
+        return _SYMTABLE_HANDLERS.get(type(node), _Analyzer._visit_generic)(
+            self, node
+        )
+
+    def _requirement(
+        self,
+        name: str,
+        position: ast.AST,
+        *,
+        deferred: bool,
+        scope: Scope = Scope.LOCAL,
+    ) -> Requirement:
+        return Requirement(
+            name=name,
+            lineno=position.lineno,  # type: ignore
+            col_offset=position.col_offset,  # type: ignore
+            deferred=deferred,
+            scope=scope,
+        )
+
+    def _table_scopes(
+        self,
+        table: symtable.SymbolTable,
+        locations: _Locations,
+        *,
+        deferred: bool,
+    ) -> tuple[list[Requirement], list[LexicalScope]]:
+        requirements = []
+        for symbol in table.get_symbols():
+            name = symbol.get_name()
+            if symbol.is_declared_global():
+                requirements.append(
+                    self._requirement(
+                        name,
+                        locations.declarations[name],
+                        deferred=deferred,
+                        scope=Scope.GLOBAL,
+                    )
+                )
+
+            # Names that the compiler references implicitly, for example
+            # `__class__` in methods that call `super()`, will not appear in
+            # the syntax tree.
+            elif (
+                symbol.is_referenced()
+                and not symbol.is_local()
+                and name in locations.names
+            ):
+                requirements.append(
+                    self._requirement(
+                        name, locations.names[name], deferred=deferred
+                    )
+                )
+
+        # Class scopes do not enclose the functions defined in them, so
+        # anything required by their children is passed straight through.
+        is_class = table.get_type() == "class"
+
+        children = []
+        for child_table in table.get_children():
+            child_node = locations.pop_scope(self._table_key(child_table))
+            child_requirements, grandchildren = self._table_scopes(
+                child_table,
+                locations,
+                deferred=deferred
+                or isinstance(
+                    child_node, (ast.FunctionDef, ast.AsyncFunctionDef)
+                ),
+            )
+
+            if child_node is None:
+                # A scope with no counterpart in the syntax tree, for example
+                # one used to evaluate annotations.
+                children += grandchildren
+            else:
+                children.append(
+                    LexicalScope(
+                        node=child_node,
+                        bindings=_table_bindings(child_table),
+                        requirements=_merge_requirements(child_requirements),
+                        children=tuple(grandchildren),
+                    )
+                )
+
+            requirements.extend(
+                requirement
+                for requirement in child_requirements
+                if is_class
+                or requirement.scope == Scope.GLOBAL
+                or not _is_bound(table, requirement.name)
+            )
+
+        return requirements, children
+
+    def _visit_function_scope(
+        self,
+        node: ast.FunctionDef | ast.AsyncFunctionDef | ast.Lambda,
+        table: symtable.SymbolTable,
+        *,
+        deferred: bool,
+    ) -> None:
+        self_name = None
+        if (
+            self._is_statement(node)
+            and not isinstance(node, ast.Lambda)
+            and node.args.args
+        ):
+            self_name = node.args.args[0].arg
+
+        body: list[ast.AST] = []
+        if isinstance(node, ast.Lambda):
+            body.append(node.body)
+        else:
+            body.extend(node.body)
+        locations = _Locations(body, self_name)
+
+        requirements, children = self._table_scopes(
+            table, locations, deferred=deferred
+        )
+        merged = _merge_requirements(
+            sorted(
+                requirements,
+                key=lambda requirement: (
+                    requirement.lineno,
+                    requirement.col_offset,
+                ),
+            )
+        )
+
+        self.scopes.append(
+            LexicalScope(
+                node=node,
+                bindings=_table_bindings(table),
+                requirements=merged,
+                children=tuple(children),
+            )
+        )
+        self.requirements += merged
+        self.method_requirements += locations.method_requirements
+
+    def _visit_function_def(
+        self, node: ast.FunctionDef | ast.AsyncFunctionDef
+    ) -> Iterator[ast.AST]:
+        table = self._pop_table(node)
+        if table is None:
+            yield from _Analyzer._visit_function_def(self, node)
+            return
+
+        yield from node.decorator_list
+        self.bindings.append(node.name)
+        yield node.args
+        if node.returns is not None:
+            yield node.returns
+
+        self._visit_function_scope(node, table, deferred=True)
+
+    def _visit_lambda(self, node: ast.Lambda) -> Iterator[ast.AST]:
+        table = self._pop_table(node)
+        if table is None:
+            yield from _Analyzer._visit_lambda(self, node)
+            return
+
+        yield node.args
+
+        self._visit_function_scope(node, table, deferred=False)
+
+
+_SYMTABLE_HANDLERS: dict[
+    type[ast.AST], Callable[..., Optional[Iterator[ast.AST]]]
+] = {
+    **_HANDLERS,
+    ast.FunctionDef: _SymtableAnalyzer._visit_function_def,
+    ast.AsyncFunctionDef: _SymtableAnalyzer._visit_function_def,
+    ast.Lambda: _SymtableAnalyzer._visit_lambda,
+}
+
+
+def analyze(
+    node: ast.AST, text: str, *, start_row: int = 0, start_col: int = 0
+) -> Analysis:
+    """
+    Returns the same information as `ssort._analysis.analyze`, using the
+    symbol table that python builds when compiling the statement to resolve
+    names inside functions and lambdas.
+
+    :param node:
+        The syntax tree of the statement.
+    :param text:
+        The source text of the statement.
+    :param start_row:
+        The row, counting from zero, at which the text starts in the file
+        that the syntax tree was parsed from.
+    :param start_col:
+        The column at which the text starts.
+    """
+    if node.col_offset:  # type: ignore
+        # Statements that are not at the start of a line, or that belong to
+        # a class body, have to be nested in a block to be compiled on their
+        # own.
+        source = "if 1:\n" + " " * start_col + text
+        line_offset = start_row - 1
+    else:
+        source = text
+        line_offset = start_row
+
+    try:
+        with ignore_warnings():
+            table = symtable.symtable(source, "<statement>", "exec")
+    except (SyntaxError, RecursionError):
+        # Some errors, for example misplaced `nonlocal` declarations, are only
+        # detected by the compiler, and the compiler's own recursion limit is
+        # lower than the parser's.  Leave these statements to the visitor.
+        return _analyze_with_visitor(node)
+
+    analyzer = _SymtableAnalyzer(node, table, line_offset)
+    analyzer.visit(node)
+    return analyzer.result()
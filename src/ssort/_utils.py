@@ -1,19 +1,20 @@
 from __future__ import annotations
 
+import codecs
+import contextlib
 import functools
 import io
 import re
 import shlex
 import sys
+import threading
 import tokenize
-from typing import Any, Callable, Generic, TypeVar
+import warnings
+from typing import Any, Callable, Generic, Iterator, TypeVar
 
 from ssort._exceptions import UnknownEncodingError
 
-if sys.version_info < (3, 9):
-    memoize = functools.lru_cache(maxsize=None)
-else:
-    memoize = functools.cache
+_WARNINGS_LOCK = threading.Lock()
 
 
 def sort_key_from_iter(values):
@@ -49,21 +50,6 @@ class _SingleDispatch(Generic[_T]):
 single_dispatch = _SingleDispatch
 
 
-def cached_method(function: Callable[[Any], _T]) -> Callable[[Any], _T]:
-    cached_attribute_name = f"_{function.__name__}_cache"
-
-    @functools.wraps(function)
-    def wrapper(self) -> _T:
-        try:
-            return getattr(self, cached_attribute_name)
-        except AttributeError:
-            value = function(self)
-            setattr(self, cached_attribute_name, value)
-            return value
-
-    return wrapper
-
-
 def escape_path(path):
     """
     Takes a `pathlib.Path` object and returns a string representation that can
@@ -81,8 +67,20 @@ def detect_encoding(bytestring):
     Detect the encoding of a python source file based on "coding" comments, as
     defined in [PEP 263](https://www.python.org/dev/peps/pep-0263/).
     """
+    # Only the first two lines can declare an encoding.
+    head_end = bytestring.find(b"\n")
+    if head_end != -1:
+        head_end = bytestring.find(b"\n", head_end + 1)
+    head = bytestring[: head_end + 1] if head_end != -1 else bytestring[:]
+
+    # Most files have no coding comment, and can skip the tokenizer.
+    if b"coding" not in head:
+        if head.startswith(codecs.BOM_UTF8):
+            return "utf-8-sig"
+        return "utf-8"
+
     try:
-        encoding, _ = tokenize.detect_encoding(io.BytesIO(bytestring).readline)
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(head).readline)
     except SyntaxError as exc:
         raise UnknownEncodingError(
             exc.msg, encoding=re.match("unknown encoding: (.*)", exc.msg)[1]
@@ -108,4 +106,30 @@ def normalize_newlines(text):
     """
     Replaces all occurrences of '\r' and '\\r\\n' with \n.
     """
-    return re.sub(_NEWLINE_RE, "\n", text)
+    if "\r" not in text:
+        return text
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+@contextlib.contextmanager
+def ignore_warnings() -> Iterator[None]:
+    """
+    Suppresses any warnings raised within the block, for example by the python
+    parser.
+
+    Unless the interpreter was started with context aware warnings, as free
+    threaded builds of python 3.14 are by default, `warnings.catch_warnings`
+    swaps out process-global state and can't be used from more than one
+    thread at a time.  In that case, blocks are serialised with a lock, and
+    warnings raised by other threads while a block is running are suppressed
+    as well.
+    """
+    if getattr(sys.flags, "context_aware_warnings", False):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            yield
+        return
+
+    with _WARNINGS_LOCK, warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
@@ -0,0 +1,71 @@
+import http.server
+import threading
+
+import pytest
+
+
+class _CacheRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _send(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append(
+            ("GET", self.path, self.headers.get("Authorization"))
+        )
+        data = self.server.entries.get(self.path)
+        if data is None:
+            self._send(404)
+        else:
+            self._send(200, data)
+
+    def do_PUT(self):
+        self.server.requests.append(
+            ("PUT", self.path, self.headers.get("Authorization"))
+        )
+        length = int(self.headers["Content-Length"])
+        self.server.entries[self.path] = self.rfile.read(length)
+        self._send(204)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _CacheServer(http.server.ThreadingHTTPServer):
+    """
+    A stand-in for a shared cache server that keeps entries in memory.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _CacheRequestHandler)
+        self.entries = {}
+        self.requests = []
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/ssort/"
+
+
+@pytest.fixture
+def cache_server():
+    server = _CacheServer()
+    thread = threading.Thread(
+        target=server.serve_forever,
+        kwargs={"poll_interval": 0.05},
+        daemon=True,
+    )
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,217 @@
+import ast
+import textwrap
+
+from ssort._analysis import Requirement, Scope, analyze
+
+
+def _parse(source):
+    source = textwrap.dedent(source)
+    root = ast.parse(source)
+    assert len(root.body) == 1
+    return root.body[0]
+
+
+def _scope_names(scope):
+    return (
+        type(scope.node).__name__,
+        list(scope.bindings),
+        [requirement.name for requirement in scope.requirements],
+        [_scope_names(child) for child in scope.children],
+    )
+
+
+def test_analysis_method_requirements():
+    node = _parse(
+        """
+        def method(self, other):
+            self._a
+            other._b
+            def inner():
+                return self._c
+            class Inner:
+                def method(self):
+                    return self._d
+        """
+    )
+    assert analyze(node).method_requirements == ("_a", "_c")
+
+
+def test_analysis_nested_closures():
+    node = _parse(
+        """
+        def outer(a):
+            def middle(b):
+                def inner(c):
+                    def innermost():
+                        nonlocal c
+                        global g
+                        return a + b + c + d + g
+                    return innermost
+                return inner
+            return middle
+        """
+    )
+    analysis = analyze(node)
+
+    assert analysis.bindings == ("outer",)
+    assert analysis.requirements == (
+        Requirement(
+            name="g",
+            lineno=7,
+            col_offset=16,
+            deferred=True,
+            scope=Scope.GLOBAL,
+        ),
+        Requirement(name="d", lineno=8, col_offset=35, deferred=True),
+    )
+    assert _scope_names(analysis.scope) == (
+        "FunctionDef",
+        ["outer"],
+        ["g", "d"],
+        [
+            (
+                "FunctionDef",
+                ["a", "middle"],
+                ["g", "d"],
+                [
+                    (
+                        "FunctionDef",
+                        ["b", "inner"],
+                        ["g", "a", "d"],
+                        [
+                            (
+                                "FunctionDef",
+                                ["c", "innermost"],
+                                ["g", "a", "b", "d"],
+                                [
+                                    (
+                                        "FunctionDef",
+                                        ["c", "g"],
+                                        ["c", "g", "a", "b", "d"],
+                                        [],
+                                    )
+                                ],
+                            )
+                        ],
+                    )
+                ],
+            )
+        ],
+    )
+
+
+def test_analysis_nested_comprehensions():
+    node = _parse(
+        """
+        result = [
+            [(i, j, k) for k in f(j) if k > i]
+            for i in range(n)
+            for j in {m: m for m in g(i)}
+        ]
+        """
+    )
+    analysis = analyze(node)
+
+    assert analysis.bindings == ("result", "k", "i", "j", "m")
+    assert analysis.requirements == (
+        Requirement(name="f", lineno=3, col_offset=24),
+        Requirement(name="range", lineno=4, col_offset=13),
+        Requirement(name="n", lineno=4, col_offset=19),
+        Requirement(name="g", lineno=5, col_offset=28),
+    )
+    assert _scope_names(analysis.scope) == (
+        "Assign",
+        ["result", "k", "i", "j", "m"],
+        ["f", "range", "n", "g"],
+        [
+            (
+                "ListComp",
+                ["k", "i", "j", "m"],
+                ["f", "range", "n", "g"],
+                [
+                    ("ListComp", ["k"], ["i", "j", "f"], []),
+                    ("DictComp", ["m"], ["g", "i"], []),
+                ],
+            )
+        ],
+    )
+
+
+def test_analysis_class_in_method():
+    node = _parse(
+        """
+        class Outer:
+            x = 1
+            def method(self):
+                class Inner:
+                    y = x
+                    z = [lambda q: q + y + w for w in self.items]
+                return Inner
+        """
+    )
+    analysis = analyze(node)
+
+    assert analysis.bindings == ("Outer",)
+    assert analysis.requirements == (
+        Requirement(name="x", lineno=6, col_offset=16, deferred=True),
+    )
+
+
+def test_analysis_nested_lambdas():
+    node = _parse(
+        """
+        f = lambda a: lambda b: lambda c: a + b + c + d
+        """
+    )
+    analysis = analyze(node)
+
+    assert analysis.bindings == ("f",)
+    assert analysis.requirements == (
+        Requirement(name="d", lineno=2, col_offset=46),
+    )
+    assert _scope_names(analysis.scope) == (
+        "Assign",
+        ["f"],
+        ["d"],
+        [
+            (
+                "Lambda",
+                ["a"],
+                ["d"],
+                [
+                    (
+                        "Lambda",
+                        ["b"],
+                        ["a", "d"],
+                        [("Lambda", ["c"], ["a", "b", "d"], [])],
+                    )
+                ],
+            )
+        ],
+    )
+
+
+def test_analysis_deep_binop_chain():
+    # Deeper than the analysis could manage with one python stack frame per
+    # level of the syntax tree.
+    node = _parse("x = " + " + ".join(f"a{i}" for i in range(2000)))
+
+    analysis = analyze(node)
+
+    assert analysis.bindings == ("x",)
+    assert [requirement.name for requirement in analysis.requirements] == [
+        f"a{i}" for i in range(2000)
+    ]
+
+
+def test_analysis_deep_elif_chain():
+    source = "if a0:\n    pass\n"
+    source += "".join(f"elif a{i}:\n    b{i} = 1\n" for i in range(1, 1000))
+    node = _parse(source)
+
+    analysis = analyze(node)
+
+    assert analysis.bindings == tuple(f"b{i}" for i in range(1, 1000))
+    assert [requirement.name for requirement in analysis.requirements] == [
+        f"a{i}" for i in range(1000)
+    ]
@@ -0,0 +1,224 @@
+import os
+import pickle
+import socket
+import sys
+
+import pytest
+
+from ssort import _cache
+from ssort._cache import (
+    DirectoryStore,
+    HTTPStore,
+    LayeredStore,
+    ResultCache,
+    content_key,
+    default_cache_dir,
+)
+
+
+def _entries(directory):
+    return sorted(path for path in directory.rglob("*") if path.is_file())
+
+
+def test_cache_round_trip(tmp_path):
+    cache = ResultCache(DirectoryStore(tmp_path))
+    key = content_key(b"a = 1\n")
+
+    assert cache.get(key) is None
+
+    cache.put(
+        key, "unsortable", [("syntax-error", 3, 5), ("wildcard-import",)]
+    )
+    assert cache.get(key) == (
+        "unsortable",
+        [("syntax-error", 3, 5), ("wildcard-import",)],
+    )
+
+
+def test_cache_overwrite(tmp_path):
+    cache = ResultCache(DirectoryStore(tmp_path))
+    key = content_key(b"a = 1\n")
+
+    cache.put(key, "unsortable", [("syntax-error", 3, 5)])
+    cache.put(key, "unchanged", [])
+    assert cache.get(key) == ("unchanged", [])
+    assert len(_entries(tmp_path)) == 1
+
+
+def test_cache_corrupt_entry(tmp_path):
+    cache = ResultCache(DirectoryStore(tmp_path))
+    key = content_key(b"a = 1\n")
+    cache.put(key, "unchanged", [])
+
+    (entry,) = _entries(tmp_path)
+    entry.write_bytes(b'{"status": "unch')
+    assert cache.get(key) is None
+
+
+def test_cache_missing_directory(tmp_path):
+    cache = ResultCache(DirectoryStore(tmp_path / "missing"))
+    key = content_key(b"a = 1\n")
+
+    assert cache.get(key) is None
+    cache.trim()
+
+    cache.put(key, "unchanged", [])
+    assert cache.get(key) == ("unchanged", [])
+
+
+def test_content_key_depends_on_version(monkeypatch):
+    key = content_key(b"a = 1\n")
+    assert content_key(b"a = 1\n") == key
+    assert content_key(b"a = 2\n") != key
+
+    monkeypatch.setattr(_cache, "__version__", "0.0.0")
+    assert content_key(b"a = 1\n") != key
+
+
+def test_cache_trim_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(DirectoryStore(tmp_path))
+    keys = [content_key(f"a = {index}\n".encode()) for index in range(8)]
+    for index, key in enumerate(keys):
+        cache.put(key, "unchanged", [])
+        entry = cache.store._entry_path(key)
+        os.utime(entry, (1000000 + index, 1000000 + index))
+
+    # Reading an old entry marks it as recently used.
+    assert cache.get(keys[0]) == ("unchanged", [])
+
+    sizes = [_cache._disk_usage(entry.stat()) for entry in _entries(tmp_path)]
+    cache.store.max_size = sum(sizes) - 1
+    cache.trim()
+
+    remaining = [key for key in keys if cache.get(key) is not None]
+    assert keys[0] in remaining
+    assert keys[1] not in remaining
+    assert keys[-1] in remaining
+    assert (
+        sum(_cache._disk_usage(entry.stat()) for entry in _entries(tmp_path))
+        <= cache.store.max_size * 3 // 4
+    )
+
+
+def test_cache_trim_under_limit(tmp_path):
+    cache = ResultCache(DirectoryStore(tmp_path))
+    key = content_key(b"a = 1\n")
+    cache.put(key, "unchanged", [])
+    cache.trim()
+    assert cache.get(key) == ("unchanged", [])
+
+
+def test_cache_trim_amortised(tmp_path):
+    cache = ResultCache(DirectoryStore(tmp_path, max_size=0))
+    key = content_key(b"a = 1\n")
+    cache.put(key, "unchanged", [])
+
+    # Directories that were trimmed recently are not scanned again.
+    (tmp_path / _cache._TRIM_STAMP).touch()
+    cache.trim()
+    assert cache.get(key) == ("unchanged", [])
+
+    stamp_time = 1000000
+    os.utime(tmp_path / _cache._TRIM_STAMP, (stamp_time, stamp_time))
+    cache.trim()
+    assert cache.get(key) is None
+    assert (tmp_path / _cache._TRIM_STAMP).stat().st_mtime > stamp_time
+
+
+@pytest.mark.skipif(
+    sys.platform in ("win32", "darwin"), reason="XDG is only used on unix"
+)
+def test_default_cache_dir_xdg(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_cache_dir() == tmp_path / "ssort"
+
+
+def test_http_store_round_trip(cache_server):
+    cache = ResultCache(HTTPStore(cache_server.url))
+    key = content_key(b"a = 1\n")
+
+    assert cache.get(key) is None
+    cache.put(key, "unsortable", [("syntax-error", 3, 5)])
+    assert cache.get(key) == ("unsortable", [("syntax-error", 3, 5)])
+
+    assert [(method, path) for method, path, _ in cache_server.requests] == [
+        ("GET", f"/ssort/{key}"),
+        ("PUT", f"/ssort/{key}"),
+        ("GET", f"/ssort/{key}"),
+    ]
+
+
+def test_http_store_shared(cache_server):
+    key = content_key(b"a = 1\n")
+    ResultCache(HTTPStore(cache_server.url)).put(key, "unchanged", [])
+    assert ResultCache(HTTPStore(cache_server.url)).get(key) == (
+        "unchanged",
+        [],
+    )
+
+
+def test_http_store_basic_auth(cache_server):
+    url = cache_server.url.replace("http://", "http://user:p%40ss@")
+    store = HTTPStore(url)
+    assert store.get(content_key(b"a = 1\n")) is None
+
+    ((_, _, authorization),) = cache_server.requests
+    assert authorization == "Basic dXNlcjpwQHNz"
+
+
+def test_http_store_unreachable():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        host, port = sock.getsockname()
+    store = HTTPStore(f"http://{host}:{port}/", timeout=1)
+    key = content_key(b"a = 1\n")
+
+    assert store.get(key) is None
+    store.put(key, b"{}")
+    assert store.get(key) is None
+
+
+def test_http_store_gives_up_after_failure(cache_server):
+    store = HTTPStore(cache_server.url)
+    key = content_key(b"a = 1\n")
+    cache_server.shutdown()
+    cache_server.server_close()
+
+    assert store.get(key) is None
+    assert store.get(key) is None
+    assert store._failed
+
+
+def test_http_store_pickle(cache_server):
+    store = HTTPStore(cache_server.url)
+    key = content_key(b"a = 1\n")
+    store.put(key, b"{}")
+
+    assert pickle.loads(pickle.dumps(store)).get(key) == b"{}"
+
+
+@pytest.mark.parametrize(
+    "url", ["ftp://example.com/", "http:///cache/", "http://host/?a=1"]
+)
+def test_http_store_invalid_url(url):
+    with pytest.raises(ValueError):
+        HTTPStore(url)
+
+
+def test_layered_store(tmp_path, cache_server):
+    key = content_key(b"a = 1\n")
+    local = DirectoryStore(tmp_path)
+    remote = HTTPStore(cache_server.url)
+    store = LayeredStore([local, remote])
+
+    remote.put(key, b"{}")
+    assert local.get(key) is None
+
+    # Entries found in the shared store are copied to the local one.
+    assert store.get(key) == b"{}"
+    assert local.get(key) == b"{}"
+
+    other = content_key(b"a = 2\n")
+    store.put(other, b"[]")
+    assert local.get(other) == b"[]"
+    assert remote.get(other) == b"[]"
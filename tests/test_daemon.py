@@ -0,0 +1,363 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from ssort import _daemon, _main
+from ssort._client import request, run_in_daemon
+from ssort._daemon import Daemon, HTTPServer, SocketServer
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="requires unix sockets"
+)
+
+_good = """
+def _private():
+    pass
+
+def public():
+    return _private()
+"""
+
+_unsorted = """
+def public():
+    return _private()
+
+def _private():
+    pass
+"""
+
+_syntax = """
+def _private(
+    pass
+
+def public(
+    return _private()
+"""
+
+
+class _RecordingDaemon(Daemon):
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def handle(self, request, **kwargs):
+        self.requests.append(request)
+        return super().handle(request, **kwargs)
+
+
+def _serve(server):
+    thread = threading.Thread(
+        target=server.serve_forever,
+        kwargs={"poll_interval": 0.05},
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+@pytest.fixture
+def daemon():
+    return _RecordingDaemon()
+
+
+@pytest.fixture
+def socket_path(tmp_path, daemon):
+    path = str(tmp_path / "run" / "ssortd.sock")
+    server = SocketServer(path, daemon)
+    thread = _serve(server)
+    try:
+        yield path
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@pytest.fixture
+def http_port(daemon):
+    server = HTTPServer(("127.0.0.1", 0), daemon)
+    thread = _serve(server)
+    try:
+        yield server.server_port
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_daemon_sort(socket_path):
+    assert request(socket_path, {"op": "sort", "source": _unsorted}) == {
+        "status": "unsorted",
+        "output": _good,
+        "messages": [],
+    }
+    assert request(socket_path, {"op": "sort", "source": _good}) == {
+        "status": "unchanged",
+        "output": None,
+        "messages": [],
+    }
+
+
+def test_daemon_sort_unsortable(socket_path):
+    response = request(
+        socket_path, {"op": "sort", "source": _syntax, "filename": "a.py"}
+    )
+    assert response == {
+        "status": "unsortable",
+        "output": None,
+        "messages": ["ERROR: syntax error in a.py: line 3, column 5\n"],
+    }
+
+
+def test_daemon_sort_keeps_newlines(socket_path):
+    response = request(
+        socket_path,
+        {"op": "sort", "source": _unsorted.replace("\n", "\r\n")},
+    )
+    assert response["output"] == _good.replace("\n", "\r\n")
+
+
+def test_daemon_refuses_other_versions(socket_path):
+    assert (
+        request(
+            socket_path,
+            {"op": "sort", "source": _good, "version": "0.0.0"},
+        )
+        is None
+    )
+
+
+def test_daemon_invalid_request(socket_path):
+    assert request(socket_path, {"op": "sort", "source": 1}) is None
+    assert request(socket_path, {"op": "unknown"}) is None
+
+
+def test_daemon_http_sort(http_port):
+    connection = http.client.HTTPConnection("127.0.0.1", http_port)
+    connection.request("POST", "/sort", body=json.dumps({"source": _unsorted}))
+    response = connection.getresponse()
+    assert response.status == 200
+    assert json.loads(response.read())["output"] == _good
+
+
+def test_daemon_http_refuses_runs(http_port, daemon, tmp_path):
+    connection = http.client.HTTPConnection("127.0.0.1", http_port)
+    connection.request(
+        "POST",
+        "/run",
+        body=json.dumps({"argv": [], "cwd": str(tmp_path)}),
+    )
+    response = connection.getresponse()
+    assert response.status == 404
+    response.read()
+
+    # Requests posted to `/sort` are always treated as requests to sort.
+    connection.request(
+        "POST",
+        "/sort",
+        body=json.dumps({"op": "run", "argv": [], "cwd": str(tmp_path)}),
+    )
+    response = connection.getresponse()
+    assert response.status == 400
+    response.read()
+    assert daemon.requests == [
+        {"op": "sort", "argv": [], "cwd": str(tmp_path)}
+    ]
+
+
+def test_daemon_run(socket_path, daemon, tmp_path):
+    (tmp_path / "good.py").write_text(_good)
+    (tmp_path / "unsorted.py").write_text(_unsorted)
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "ssort",
+            "--daemon-socket",
+            socket_path,
+            "--no-cache",
+            ".",
+        ],
+        cwd=tmp_path,
+        capture_output=True,
+        encoding="utf-8",
+    )
+    assert result.returncode == 0
+    assert result.stderr.splitlines(keepends=True) == [
+        "Sorting unsorted.py\n",
+        "1 file was resorted, 1 file was left unchanged\n",
+    ]
+    assert (tmp_path / "unsorted.py").read_text() == _good
+
+    (run_request,) = [r for r in daemon.requests if r["op"] == "run"]
+    assert run_request["argv"] == [
+        "--daemon-socket",
+        socket_path,
+        "--no-cache",
+        ".",
+    ]
+    assert run_request["cwd"] == str(tmp_path)
+
+
+def test_daemon_run_usage_error(socket_path, tmp_path):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "ssort",
+            "--daemon-socket",
+            socket_path,
+            "--cache-url",
+            "ftp://example.com/",
+            ".",
+        ],
+        cwd=tmp_path,
+        capture_output=True,
+        encoding="utf-8",
+    )
+    assert result.returncode == 2
+    assert result.stderr.startswith("usage: ")
+    assert "invalid cache url" in result.stderr
+
+
+def test_daemon_run_busy(socket_path, daemon, tmp_path, monkeypatch):
+    monkeypatch.setattr(_daemon, "_RUN_WAIT", 0.05)
+    with daemon._run_lock:
+        assert (
+            run_in_daemon(["."], prog="ssort", socket_path=socket_path) is None
+        )
+    assert [r["op"] for r in daemon.requests] == ["run"]
+
+
+def test_daemon_run_outlasts_timeout(socket_path, tmp_path, monkeypatch):
+    def slow_sort_files(parser, args, **kwargs):
+        time.sleep(0.3)
+        print("sorted")
+
+    monkeypatch.setattr(_main, "_sort_files", slow_sort_files)
+    response = request(
+        socket_path,
+        {"op": "run", "argv": ["."], "cwd": str(tmp_path), "prog": "ssort"},
+        timeout=0.1,
+    )
+    assert response == {"stdout": "sorted\n", "stderr": "", "returncode": 0}
+
+
+def test_client_with_stuck_daemon(tmp_path):
+    socket_path = str(tmp_path / "stuck.sock")
+    with socket.socket(socket.AF_UNIX) as listener:
+        listener.bind(socket_path)
+        listener.listen()
+
+        start = time.perf_counter()
+        assert (
+            request(socket_path, {"op": "sort", "source": _good}, timeout=0.1)
+            is None
+        )
+        assert time.perf_counter() - start < 5
+
+
+def _check_empty(tmp_path, socket_path):
+    # Nothing is ever written, even if the daemon does handle the run.
+    directory = tmp_path / "empty"
+    directory.mkdir(exist_ok=True)
+    return run_in_daemon(
+        ["--check", "--no-cache", str(directory)],
+        prog="ssort",
+        socket_path=socket_path,
+    )
+
+
+def test_client_accepts_private_directory(socket_path, daemon, tmp_path):
+    assert _check_empty(tmp_path, socket_path) is not None
+    assert [request["op"] for request in daemon.requests] == ["run"]
+
+
+def test_client_refuses_shared_directory(socket_path, daemon, tmp_path):
+    os.chmod(os.path.dirname(socket_path), 0o755)
+
+    assert _check_empty(tmp_path, socket_path) is None
+    assert daemon.requests == []
+
+
+def test_client_refuses_other_users(
+    socket_path, daemon, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(socket_path).st_uid + 1)
+
+    assert _check_empty(tmp_path, socket_path) is None
+    assert daemon.requests == []
+
+
+def test_client_refuses_linked_directory(socket_path, daemon, tmp_path):
+    link = tmp_path / "link"
+    link.symlink_to(os.path.dirname(socket_path))
+
+    assert _check_empty(tmp_path, str(link / "ssortd.sock")) is None
+    assert daemon.requests == []
+
+
+def test_socket_server_refuses_shared_directory(tmp_path):
+    directory = tmp_path / "shared"
+    directory.mkdir(mode=0o755)
+    directory.chmod(0o755)
+
+    with pytest.raises(OSError, match="only you can access"):
+        SocketServer(str(directory / "ssortd.sock"), Daemon())
+
+
+def test_client_without_daemon(tmp_path):
+    socket_path = str(tmp_path / "missing.sock")
+    assert request(socket_path, {"op": "sort", "source": _good}) is None
+    assert run_in_daemon(["."], prog="ssort", socket_path=socket_path) is None
+
+    (tmp_path / "unsorted.py").write_text(_unsorted)
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "ssort",
+            "--daemon-socket",
+            socket_path,
+            "--no-cache",
+            "--check",
+            ".",
+        ],
+        cwd=tmp_path,
+        capture_output=True,
+        encoding="utf-8",
+    )
+    assert result.returncode == 1
+    assert result.stderr.splitlines(keepends=True) == [
+        "ERROR: unsorted.py is incorrectly sorted\n",
+        "1 file would be resorted\n",
+    ]
+
+
+def test_socket_server_replaces_stale_socket(tmp_path):
+    path = str(tmp_path / "ssortd.sock")
+    with socket.socket(socket.AF_UNIX) as stale:
+        stale.bind(path)
+
+    server = SocketServer(path, Daemon())
+    thread = _serve(server)
+    try:
+        assert request(path, {"op": "sort", "source": _good}) is not None
+
+        with pytest.raises(OSError, match="already listening"):
+            SocketServer(path, Daemon())
+
+        # The socket of the daemon that is running is left alone.
+        assert request(path, {"op": "sort", "source": _good}) is not None
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
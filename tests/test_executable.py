@@ -1,9 +1,14 @@
+import json
 import pathlib
+import shutil
 import subprocess
 import sys
+import time
+import urllib.parse
 
 import pytest
 
+from ssort._cache import content_key
 from ssort._utils import escape_path
 
 _good = b"""
@@ -65,16 +70,31 @@ def _write_fixtures(dirpath, texts):
     return paths
 
 
+@pytest.fixture
+def cache_dir(tmp_path_factory):
+    # Each test gets a cache of its own, kept out of the directory that is
+    # being sorted.
+    return tmp_path_factory.mktemp("cache")
+
+
 @pytest.fixture(params=["entrypoint", "module"])
-def check(request):
-    def _check(dirpath):
+def check(request, cache_dir):
+    def _check(dirpath, *args):
         ssort_exe = {
             "entrypoint": ["ssort"],
             "module": [sys.executable, "-m", "ssort"],
         }[request.param]
 
         result = subprocess.run(
-            [*ssort_exe, "--check", str(dirpath)],
+            [
+                *ssort_exe,
+                "--check",
+                "--no-daemon",
+                "--cache-dir",
+                str(cache_dir),
+                *args,
+                str(dirpath),
+            ],
             capture_output=True,
             encoding="utf-8",
         )
@@ -84,15 +104,22 @@ def check(request):
 
 
 @pytest.fixture(params=["entrypoint", "module"])
-def ssort(request):
-    def _ssort(dirpath):
+def ssort(request, cache_dir):
+    def _ssort(dirpath, *args):
         ssort_exe = {
             "entrypoint": ["ssort"],
             "module": [sys.executable, "-m", "ssort"],
         }[request.param]
 
         result = subprocess.run(
-            [*ssort_exe, str(dirpath)],
+            [
+                *ssort_exe,
+                "--no-daemon",
+                "--cache-dir",
+                str(cache_dir),
+                *args,
+                str(dirpath),
+            ],
             capture_output=True,
             encoding="utf-8",
         )
@@ -111,6 +138,16 @@ def test_check_all_well(check, tmp_path):
     assert (actual_msgs, actual_status) == (expected_msgs, expected_status)
 
 
+def test_check_mixed_endlines(check, tmp_path):
+    _write_fixtures(tmp_path, [b"b = 4\r\na = b\n"])
+    expected_msgs = [
+        "1 file would be left unchanged\n",
+    ]
+    expected_status = 0
+    actual_msgs, actual_status = check(tmp_path)
+    assert (actual_msgs, actual_status) == (expected_msgs, expected_status)
+
+
 def test_check_one_unsorted(check, tmp_path):
     paths = _write_fixtures(tmp_path, [_unsorted, _good, _good])
     expected_msgs = [
@@ -194,6 +231,152 @@ def test_check_one_unsorted_one_syntax_error(check, tmp_path):
     assert (actual_msgs, actual_status) == (expected_msgs, expected_status)
 
 
+@pytest.mark.parametrize(
+    "parallelism", [("--threads", "4"), ("--jobs", "4"), ("--jobs", "1")]
+)
+def test_check_parallel(check, tmp_path, parallelism):
+    paths = _write_fixtures(
+        tmp_path, [_syntax, _unsorted, _good, _unsorted, _good, _resolution]
+    )
+    expected_msgs = [
+        f"ERROR: syntax error in {escape_path(paths[0])}: line 3, column 5\n",
+        f"ERROR: {escape_path(paths[1])} is incorrectly sorted\n",
+        f"ERROR: {escape_path(paths[3])} is incorrectly sorted\n",
+        f"ERROR: unresolved dependency '_other' in {escape_path(paths[5])}: line 6, column 11\n",
+        "2 files would be resorted, 2 files would be left unchanged, 2 files would not be sortable\n",
+    ]
+    expected_status = 1
+    actual_msgs, actual_status = check(tmp_path, *parallelism)
+    assert (actual_msgs, actual_status) == (expected_msgs, expected_status)
+
+
+@pytest.mark.parametrize("option", ["--threads", "--jobs"])
+def test_check_parallel_invalid(check, tmp_path, option):
+    _write_fixtures(tmp_path, [_good])
+    actual_msgs, actual_status = check(tmp_path, option, "0")
+    assert actual_status == 2
+    assert option in actual_msgs[-1]
+
+
+def test_check_threads_and_jobs(check, tmp_path):
+    _write_fixtures(tmp_path, [_good])
+    actual_msgs, actual_status = check(
+        tmp_path, "--threads", "2", "--jobs", "2"
+    )
+    assert actual_status == 2
+    assert "not allowed with" in actual_msgs[-1]
+
+
+def test_check_cached(check, tmp_path, cache_dir):
+    paths = _write_fixtures(tmp_path, [_syntax, _unsorted, _good, _good])
+    expected_msgs = [
+        f"ERROR: syntax error in {escape_path(paths[0])}: line 3, column 5\n",
+        f"ERROR: {escape_path(paths[1])} is incorrectly sorted\n",
+        "1 file would be resorted, 2 files would be left unchanged, 1 file would not be sortable\n",
+    ]
+    expected_status = 1
+
+    actual_msgs, actual_status = check(tmp_path)
+    assert (actual_msgs, actual_status) == (expected_msgs, expected_status)
+
+    # Files with the same contents share an entry, and unsorted files are
+    # not cached.
+    entries = list(cache_dir.glob("*/*"))
+    assert len(entries) == 2
+
+    actual_msgs, actual_status = check(tmp_path)
+    assert (actual_msgs, actual_status) == (expected_msgs, expected_status)
+
+
+def test_check_cached_skips_sorting(check, tmp_path, cache_dir):
+    paths = _write_fixtures(tmp_path, [_good])
+    check(tmp_path)
+
+    # Move the entry for the sorted file to the key of a file that can not be
+    # parsed.  Checking that file should report the cached result rather
+    # than parsing it again.
+    (entry,) = cache_dir.glob("*/*")
+    key = content_key(_syntax)
+    moved = cache_dir / key[:2] / key[2:]
+    moved.parent.mkdir(exist_ok=True)
+    entry.rename(moved)
+    pathlib.Path(paths[0]).write_bytes(_syntax)
+
+    actual_msgs, actual_status = check(tmp_path)
+    assert (actual_msgs, actual_status) == (
+        ["1 file would be left unchanged\n"],
+        0,
+    )
+
+    actual_msgs, actual_status = check(tmp_path, "--no-cache")
+    assert actual_status == 1
+
+
+def test_check_cache_url(check, tmp_path, cache_dir, cache_server):
+    paths = _write_fixtures(tmp_path, [_good])
+    check(tmp_path, "--cache-url", cache_server.url)
+
+    # Another machine, with a cache directory of its own, should get the
+    # result for the same contents from the server without parsing them.
+    # The entry is moved to the key of a file that can not be parsed, which
+    # would otherwise fail.
+    shutil.rmtree(cache_dir)
+    ((_, entry),) = cache_server.entries.items()
+    cache_server.entries = {
+        f"/ssort/{content_key(_syntax)}": entry,
+    }
+    pathlib.Path(paths[0]).write_bytes(_syntax)
+
+    actual_msgs, actual_status = check(
+        tmp_path, "--cache-url", cache_server.url
+    )
+    assert (actual_msgs, actual_status) == (
+        ["1 file would be left unchanged\n"],
+        0,
+    )
+
+
+def test_check_invalid_cache_url(check, tmp_path):
+    _write_fixtures(tmp_path, [_good])
+    actual_msgs, actual_status = check(
+        tmp_path, "--cache-url", "ftp://example.com/"
+    )
+    assert actual_status == 2
+    assert "invalid cache url" in actual_msgs[-1]
+
+
+def test_check_files_from(check, tmp_path):
+    (tmp_path / "listed").mkdir()
+    (tmp_path / "other").mkdir()
+    paths = _write_fixtures(tmp_path / "listed", [_unsorted, _good, _syntax])
+    _write_fixtures(tmp_path / "other", [_good])
+    files_from = tmp_path / "files.txt"
+    files_from.write_text(f"{paths[0]}\n{paths[1]}\n{paths[0]}\n{paths[2]}\n")
+
+    expected_msgs = [
+        f"ERROR: {escape_path(paths[0])} is incorrectly sorted\n",
+        f"ERROR: syntax error in {escape_path(paths[2])}: line 3, column 5\n",
+        "1 file would be resorted, 2 files would be left unchanged, 1 file would not be sortable\n",
+    ]
+
+    for _ in range(2):
+        # The second run reads results from the cache.
+        actual_msgs, actual_status = check(
+            tmp_path / "other", "--files-from", str(files_from), "--jobs", "2"
+        )
+        assert (actual_msgs, actual_status) == (expected_msgs, 1)
+
+
+def test_check_no_cache(check, tmp_path, cache_dir):
+    _write_fixtures(tmp_path, [_good])
+    actual_msgs, actual_status = check(tmp_path, "--no-cache")
+    assert (actual_msgs, actual_status) == (
+        ["1 file would be left unchanged\n"],
+        0,
+    )
+    assert not list(cache_dir.iterdir())
+
+
 def test_ssort_all_well(ssort, tmp_path):
     _write_fixtures(tmp_path, [_good, _good, _good])
 
@@ -237,6 +420,28 @@ def test_ssort_all_unsorted(ssort, tmp_path):
     assert (actual_msgs, actual_status) == (expected_msgs, expected_status)
 
 
+def test_ssort_jobs(ssort, tmp_path):
+    paths = _write_fixtures(tmp_path, [_unsorted, _good, _unsorted, _syntax])
+
+    expected_msgs = [
+        f"Sorting {escape_path(paths[0])}\n",
+        f"Sorting {escape_path(paths[2])}\n",
+        f"ERROR: syntax error in {escape_path(paths[3])}: line 3, column 5\n",
+        "2 files were resorted, 1 file was left unchanged, 1 file was not sortable\n",
+    ]
+    expected_status = 1
+
+    actual_msgs, actual_status = ssort(tmp_path, "--jobs", "3")
+
+    assert (actual_msgs, actual_status) == (expected_msgs, expected_status)
+    assert [pathlib.Path(path).read_bytes() for path in paths] == [
+        _good,
+        _good,
+        _good,
+        _syntax,
+    ]
+
+
 def test_ssort_one_syntax_error(ssort, tmp_path):
     paths = _write_fixtures(tmp_path, [_syntax, _good, _good])
 
@@ -345,6 +550,43 @@ def test_ssort_preserve_crlf_endlines(ssort, tmp_path):
     assert output == expected_output
 
 
+def test_ssort_mixed_endlines(ssort, tmp_path):
+    input = b"a = b\r\nb = 4\n"
+    expected_output = b"b = 4\r\na = b\r\n"
+
+    paths = _write_fixtures(tmp_path, [input])
+
+    expected_msgs = [
+        f"Sorting {escape_path(paths[0])}\n",
+        "1 file was resorted\n",
+    ]
+    expected_status = 0
+
+    actual_msgs, actual_status = ssort(tmp_path)
+
+    assert actual_msgs == expected_msgs
+    assert actual_status == expected_status
+
+    (output,) = [pathlib.Path(path).read_bytes() for path in paths]
+    assert output == expected_output
+
+
+def test_ssort_mixed_endlines_sorted(ssort, tmp_path):
+    # Files are only rewritten when their statements move, not to make their
+    # newlines consistent.
+    input = b"b = 4\r\na = b\n"
+
+    paths = _write_fixtures(tmp_path, [input])
+
+    actual_msgs, actual_status = ssort(tmp_path)
+
+    assert actual_msgs == ["1 file was left unchanged\n"]
+    assert actual_status == 0
+
+    (output,) = [pathlib.Path(path).read_bytes() for path in paths]
+    assert output == input
+
+
 def test_ssort_empty_dir(ssort, tmp_path):
     expected_msgs = ["No files are present to be sorted. Nothing to do.\n"]
     expected_status = 0
@@ -409,3 +651,273 @@ def test_ssort_run_module():
     module_output = module_result.stderr.splitlines(keepends=True)
 
     assert module_output == entrypoint_output
+
+
+def _run_stdin(*args, input):
+    result = subprocess.run(
+        [sys.executable, "-m", "ssort", "--no-daemon", "--no-cache", *args],
+        input=input,
+        capture_output=True,
+    )
+    return (
+        result.stdout,
+        result.stderr.decode("utf-8").splitlines(keepends=True),
+        result.returncode,
+    )
+
+
+def test_ssort_stdin():
+    assert _run_stdin("-", input=_unsorted) == (
+        _good,
+        ["Sorting -\n", "1 file was resorted\n"],
+        0,
+    )
+
+
+def test_ssort_stdin_preserve_crlf_endlines():
+    stdout, _, status = _run_stdin(
+        "-", input=_unsorted.replace(b"\n", b"\r\n")
+    )
+    assert status == 0
+    assert stdout == _good.replace(b"\n", b"\r\n")
+
+
+def test_ssort_stdin_unchanged():
+    assert _run_stdin("-", input=_good) == (
+        _good,
+        ["1 file was left unchanged\n"],
+        0,
+    )
+
+
+def test_ssort_stdin_syntax_error():
+    # The input is passed through so that it can always replace the
+    # original.
+    assert _run_stdin("--stdin-filename", "a.py", "-", input=_syntax) == (
+        _syntax,
+        [
+            "ERROR: syntax error in a.py: line 3, column 5\n",
+            "1 file was not sortable\n",
+        ],
+        1,
+    )
+
+
+def test_check_stdin():
+    assert _run_stdin(
+        "--check", "--stdin-filename", "a.py", "-", input=_unsorted
+    ) == (
+        b"",
+        ["ERROR: a.py is incorrectly sorted\n", "1 file would be resorted\n"],
+        1,
+    )
+
+
+@pytest.mark.parametrize(
+    "args",
+    [("-", "file.py"), ("--stdin-filename", "a.py", "file.py")],
+)
+def test_ssort_stdin_invalid(args):
+    _, _, status = _run_stdin(*args, input=_good)
+    assert status == 2
+
+
+def test_ssort_files_from_stdin(tmp_path):
+    paths = _write_fixtures(tmp_path, [_unsorted, _good, _unsorted])
+    stdout, messages, status = _run_stdin(
+        "--files-from",
+        "-",
+        "--jobs",
+        "2",
+        input=b"\0".join(path.encode() for path in [*paths, paths[0]]),
+    )
+    assert (stdout, messages, status) == (
+        b"",
+        [
+            f"Sorting {escape_path(paths[0])}\n",
+            f"Sorting {escape_path(paths[2])}\n",
+            "2 files were resorted, 1 file was left unchanged\n",
+        ],
+        0,
+    )
+    assert [pathlib.Path(path).read_bytes() for path in paths] == [
+        _good,
+        _good,
+        _good,
+    ]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_ssort_files_from_streams_paths(tmp_path, jobs):
+    (path,) = _write_fixtures(tmp_path, [_unsorted])
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-u",
+            "-m",
+            "ssort",
+            "--no-daemon",
+            "--no-cache",
+            "--jobs",
+            jobs,
+            "--files-from",
+            "-",
+        ],
+        stdin=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        process.stdin.write(path.encode() + b"\n")
+        process.stdin.flush()
+
+        # The file is sorted before the list has been closed.  Worker
+        # processes only report back once the next path is read, so only
+        # the file itself can be waited on.
+        deadline = time.monotonic() + 60
+        while pathlib.Path(path).read_bytes() != _good:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        process.stdin.close()
+        messages = process.stderr.read().decode("utf-8")
+        process.stderr.close()
+        assert process.wait(timeout=60) == 0
+    assert messages == f"Sorting {escape_path(path)}\n1 file was resorted\n"
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ("--files-from", "-", "-"),
+        ("--files-from", "missing.txt"),
+        ("--batch", "--files-from", "-"),
+    ],
+)
+def test_ssort_files_from_invalid(args):
+    _, _, status = _run_stdin(*args, input=b"")
+    assert status == 2
+
+
+def test_check_stats(check, tmp_path):
+    paths = _write_fixtures(tmp_path, [_unsorted, _good, _syntax])
+
+    actual_msgs, actual_status = check(tmp_path, "--stats")
+    assert actual_status == 1
+    assert actual_msgs[:3] == [
+        f"ERROR: {escape_path(paths[0])} is incorrectly sorted\n",
+        f"ERROR: syntax error in {escape_path(paths[2])}: line 3, column 5\n",
+        "1 file would be resorted, 1 file would be left unchanged, 1 file would not be sortable\n",
+    ]
+    assert actual_msgs[3].startswith("Run time: ")
+    assert "Files: 3, 0 from the cache\n" in actual_msgs
+    assert "Slowest files:\n" in actual_msgs
+
+
+def test_check_stats_json(check, tmp_path):
+    _write_fixtures(tmp_path, [_unsorted, _good, _good])
+    check(tmp_path)
+
+    actual_msgs, actual_status = check(
+        tmp_path, "--stats", "--stats-format", "json", "--stats-slowest", "1"
+    )
+    assert actual_status == 1
+
+    # The two sorted files come from the cache.
+    report = json.loads(actual_msgs[-1])
+    assert (report["files"], report["cached"]) == (3, 2)
+    assert report["statements"] == 2
+    assert report["edges"] == 1
+    assert report["phases"].keys() >= {"read", "cache", "parse", "graph"}
+    assert len(report["slowest"]) == 1
+
+
+def test_ssort_profile(ssort, tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("src")
+    profile_dir = tmp_path_factory.mktemp("profiles")
+    paths = _write_fixtures(tmp_path, [_unsorted, _good])
+
+    actual_msgs, actual_status = ssort(
+        tmp_path,
+        "--no-cache",
+        "--profile",
+        str(profile_dir),
+        "--profile-threshold",
+        "0",
+    )
+    assert actual_status == 0
+    assert sorted(path.name for path in profile_dir.iterdir()) == sorted(
+        urllib.parse.quote(escape_path(path), safe="") + ".prof"
+        for path in paths
+    )
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ("--batch", "--stats"),
+        ("--profile", "profiles", "--threads", "2", "file.py"),
+        ("--stats", "--stats-slowest", "-1", "file.py"),
+    ],
+)
+def test_ssort_stats_invalid(args):
+    _, _, status = _run_stdin(*args, input=b"")
+    assert status == 2
+
+
+def test_ssort_batch():
+    requests = [
+        {"id": 1, "filename": "a.py", "source": _unsorted.decode()},
+        {"id": 2, "source": _good.decode(), "mode": "check"},
+        {"id": 3, "filename": "b.py", "source": _syntax.decode()},
+        {"id": 4, "source": _unsorted.decode(), "mode": "diff"},
+        {"id": 5, "source": _good.decode(), "mode": "unknown"},
+    ]
+    stdout, messages, status = _run_stdin(
+        "--batch",
+        input=b"".join(
+            json.dumps(request).encode() + b"\n" for request in requests
+        )
+        + b"\nnot json\n",
+    )
+    assert (messages, status) == ([], 0)
+
+    responses = [json.loads(line) for line in stdout.splitlines()]
+    assert responses[0] == {
+        "id": 1,
+        "status": "unsorted",
+        "messages": [],
+        "output": _good.decode(),
+    }
+    assert responses[1] == {"id": 2, "status": "unchanged", "messages": []}
+    assert responses[2] == {
+        "id": 3,
+        "status": "unsortable",
+        "messages": ["ERROR: syntax error in b.py: line 3, column 5\n"],
+        "output": None,
+    }
+    assert responses[3]["diff"].startswith("--- -:before\n+++ -:after\n")
+    assert responses[4] == {"id": 5, "error": "unknown mode 'unknown'"}
+    assert responses[5].keys() == {"error"}
+    assert len(responses) == 6
+
+
+def test_ssort_batch_streams_responses():
+    process = subprocess.Popen(
+        [sys.executable, "-m", "ssort", "--no-daemon", "--batch"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    try:
+        for index in range(3):
+            request = {"id": index, "source": _good.decode()}
+            process.stdin.write(json.dumps(request).encode() + b"\n")
+            process.stdin.flush()
+
+            # Each response is written before the next request is sent.
+            response = json.loads(process.stdout.readline())
+            assert response["id"] == index
+            assert response["status"] == "unchanged"
+    finally:
+        process.stdin.close()
+        process.stdout.close()
+        assert process.wait(timeout=60) == 0
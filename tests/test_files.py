@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import io
+import os
 import pathlib
 
 import pytest
 
-from ssort._files import is_ignored
+from ssort._files import find_python_files, is_ignored, read_paths
 
 
 def test_ignore_git(
@@ -221,3 +223,47 @@ def test_ignore_symlink_circular(
 
     assert not is_ignored("link1")
     assert not is_ignored("link2")
+
+
+def test_read_paths_newlines() -> None:
+    assert list(read_paths(io.BytesIO(b"a.py\nb c.py\r\n\nd.py"))) == [
+        "a.py",
+        "b c.py",
+        "d.py",
+    ]
+
+
+def test_read_paths_nul() -> None:
+    assert list(read_paths(io.BytesIO(b"a.py\0b\nc.py\0\0d.py\0"))) == [
+        "a.py",
+        "b\nc.py",
+        "d.py",
+    ]
+
+
+def test_read_paths_streams() -> None:
+    read_fd, write_fd = os.pipe()
+    with open(read_fd, "rb") as reader, open(write_fd, "wb") as writer:
+        paths = read_paths(reader)
+
+        writer.write(b"a.py\nb")
+        writer.flush()
+        assert next(paths) == "a.py"
+
+        writer.write(b".py\n")
+        writer.close()
+        assert list(paths) == ["b.py"]
+
+
+def test_find_python_files_skips_duplicates(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_text("")
+    (tmp_path / "src" / "b.py").write_text("")
+
+    assert list(
+        find_python_files(iter(["src/b.py", "./src/b.py", "src", "src/a.py"]))
+    ) == [pathlib.Path("src/b.py"), pathlib.Path("src/a.py")]
@@ -1,6 +1,13 @@
 import random
 
-from ssort._graphs import Graph, topological_sort
+import pytest
+
+from ssort._graphs import (
+    Graph,
+    replace_cycles,
+    topological_order,
+    topological_sort,
+)
 
 
 def test_topological_sort_chain():
@@ -90,3 +97,131 @@ def test_random_stable():
         graph.add_dependency(nodes[src_index], nodes[tgt_index])
 
     assert topological_sort(graph) == nodes
+
+
+def test_dependencies_preserve_insertion_order():
+    graph = Graph()
+
+    for node in range(5):
+        graph.add_node(node)
+
+    graph.add_dependency(0, 3)
+    graph.add_dependency(0, 1)
+    graph.add_dependency(0, 4)
+    graph.add_dependency(0, 1)
+
+    assert graph.dependencies[0] == [3, 1, 4]
+    assert graph.dependants[1] == [0]
+
+
+def test_remove_node():
+    graph = Graph()
+
+    for node in range(4):
+        graph.add_node(node)
+
+    graph.add_dependency(1, 0)
+    graph.add_dependency(2, 1)
+    graph.add_dependency(3, 1)
+
+    graph.remove_node(1)
+
+    assert graph.nodes == [0, 2, 3]
+    assert 1 not in graph
+    assert graph.dependants[0] == []
+    assert graph.dependencies[2] == []
+    assert graph.dependencies[3] == []
+
+
+def test_node_ids_are_dense():
+    graph = Graph()
+
+    for node in "abc":
+        graph.add_node(node)
+
+    assert [graph.node_id(node) for node in "abc"] == [0, 1, 2]
+    assert [graph.node_from_id(node_id) for node_id in range(3)] == list("abc")
+
+
+def test_topological_order_uses_key_to_break_ties():
+    graph = Graph()
+
+    for node in range(4):
+        graph.add_node(node)
+
+    graph.add_dependency(0, 3)
+
+    assert topological_order(graph, key=lambda node: -node) == [3, 2, 1, 0]
+    assert topological_order(graph, key=lambda node: node) == [3, 0, 1, 2]
+
+
+def test_topological_order_does_not_modify_graph():
+    graph = Graph()
+
+    for node in range(3):
+        graph.add_node(node)
+
+    graph.add_dependency(2, 1)
+    graph.add_dependency(1, 0)
+
+    topological_order(graph, key=lambda node: node)
+
+    assert graph.nodes == [0, 1, 2]
+    assert graph.dependencies[2] == [1]
+    assert graph.dependencies[1] == [0]
+
+
+def test_topological_order_cycle():
+    graph = Graph()
+
+    graph.add_node(1)
+    graph.add_node(2)
+
+    graph.add_dependency(1, 2)
+    graph.add_dependency(2, 1)
+
+    with pytest.raises(ValueError):
+        topological_order(graph, key=lambda node: node)
+
+
+def test_replace_cycles_linearises_cycle_by_key():
+    graph = Graph()
+
+    for node in range(3):
+        graph.add_node(node)
+
+    graph.add_dependency(0, 2)
+    graph.add_dependency(2, 1)
+    graph.add_dependency(1, 0)
+    assert graph.edge_count() == 3
+
+    assert replace_cycles(graph, key=lambda node: node) == 1
+    assert graph.edge_count() == 2
+
+    assert graph.dependencies[0] == []
+    assert graph.dependencies[1] == [0]
+    assert graph.dependencies[2] == [1]
+
+
+def test_replace_cycles_interlocking_cycles():
+    graph = Graph()
+
+    for node in range(5):
+        graph.add_node(node)
+
+    # Two cycles sharing node 2, plus a self reference and an edge from
+    # outside the component.
+    graph.add_dependency(0, 2)
+    graph.add_dependency(2, 0)
+    graph.add_dependency(2, 3)
+    graph.add_dependency(3, 2)
+    graph.add_dependency(3, 3)
+    graph.add_dependency(4, 3)
+
+    assert replace_cycles(graph, key=lambda node: node) == 1
+
+    assert graph.dependencies[0] == []
+    assert graph.dependencies[2] == [0]
+    assert graph.dependencies[3] == [2]
+    assert graph.dependencies[4] == [3]
+    assert topological_sort(graph) == [0, 1, 2, 3, 4]
@@ -0,0 +1,114 @@
+import pathlib
+import random
+
+import pytest
+
+from ssort import ssort
+from ssort._graphs import (
+    Graph,
+    is_topologically_sorted,
+    replace_cycles,
+    topological_order,
+)
+
+pytest.importorskip("numpy")
+
+CSRGraph = pytest.importorskip("ssort._numpy_graphs").CSRGraph
+
+
+def _random_edges(nodes, count):
+    edges = []
+    for _ in range(count):
+        edges.append((random.choice(nodes), random.choice(nodes)))
+    return edges
+
+
+def _graphs_from_edges(nodes, edges):
+    graph = Graph()
+    for node in nodes:
+        graph.add_node(node)
+    for node, dependency in edges:
+        graph.add_dependency(node, dependency)
+
+    return graph, CSRGraph.from_edges(nodes, edges)
+
+
+def test_from_edges_preserves_dependency_order():
+    graph = CSRGraph.from_edges(
+        [0, 1, 2, 3], [(0, 3), (0, 1), (2, 1), (0, 3), (0, 2)]
+    )
+
+    assert graph.dependencies[0] == [3, 1, 2]
+    assert graph.dependants[1] == [0, 2]
+    assert graph.dependencies[3] == []
+
+
+def test_topological_order_sorted_fast_path():
+    nodes = list(range(100))
+    edges = [(node, node - 1) for node in range(1, 100)]
+    graph = CSRGraph.from_edges(nodes, edges)
+
+    assert topological_order(graph, key=lambda node: node) == nodes
+
+
+def test_topological_order_cycle():
+    graph = CSRGraph.from_edges([0, 1], [(0, 1), (1, 0)])
+
+    with pytest.raises(ValueError):
+        topological_order(graph, key=lambda node: node)
+
+
+def test_topological_order_matches_graph():
+    for _ in range(20):
+        nodes = list(range(200))
+        random.shuffle(nodes)
+        edges = [
+            (nodes[source], nodes[target])
+            for source, target in (
+                sorted(random.sample(range(200), 2), reverse=True)
+                for _ in range(300)
+            )
+        ]
+        graph, csr_graph = _graphs_from_edges(nodes, edges)
+        key = {node: -index for index, node in enumerate(nodes)}.__getitem__
+
+        assert topological_order(csr_graph, key=key) == topological_order(
+            graph, key=key
+        )
+
+
+def test_replace_cycles_matches_graph():
+    for _ in range(20):
+        nodes = list(range(200))
+        graph, csr_graph = _graphs_from_edges(nodes, _random_edges(nodes, 300))
+
+        cycles = replace_cycles(graph, key=lambda node: node)
+        assert replace_cycles(csr_graph, key=lambda node: node) == cycles
+        assert csr_graph.edge_count() == graph.edge_count()
+
+        for node in nodes:
+            assert sorted(csr_graph.dependencies[node]) == sorted(
+                graph.dependencies[node]
+            )
+
+        order = topological_order(graph, key=lambda node: node)
+        assert topological_order(csr_graph, key=lambda node: node) == order
+        assert is_topologically_sorted(order, csr_graph)
+
+
+def test_samples_with_csr_graphs(monkeypatch):
+    monkeypatch.setattr("ssort._graphs.CSR_GRAPH_THRESHOLD", 0)
+
+    samples_dir = pathlib.Path("test_data/samples")
+    for input_path in sorted(samples_dir.glob("*_input.py")):
+        output_path = input_path.with_name(
+            input_path.name.replace("_input.py", "_output.py")
+        )
+
+        actual_text = ssort(
+            input_path.read_bytes(),
+            filename=str(input_path),
+            on_wildcard_import=lambda **kwargs: None,
+        )
+
+        assert actual_text == output_path.read_bytes()
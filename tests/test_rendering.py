@@ -0,0 +1,32 @@
+import io
+
+from ssort._parsing import parse
+from ssort._rendering import NEWLINE, render, statement_spans, text_span
+
+
+def test_render_spans():
+    source = "a = 1\nb = 2\n"
+    spans = [(source, 6, 11), NEWLINE, (source, 0, 5), NEWLINE]
+    assert render(spans) == "b = 2\na = 1\n"
+
+
+def test_render_newline_and_encoding():
+    spans = [text_span("é = 1"), NEWLINE]
+    assert render(spans, newline="\r\n", encoding="utf-8-sig") == (
+        b"\xef\xbb\xbf\xc3\xa9 = 1\r\n"
+    )
+
+
+def test_render_out():
+    spans = [text_span("a = 1"), NEWLINE]
+    out = io.BytesIO()
+    assert render(spans, encoding="utf-8", out=out) is None
+    assert out.getvalue() == b"a = 1\n"
+
+
+def test_statement_spans_share_source():
+    source = "a = 1; b = 2\n"
+    _, statement = parse(source)
+    spans = list(statement_spans(statement))
+    assert spans[-1] == (source, 7, 12)
+    assert render(spans) == statement.text
@@ -4,7 +4,7 @@ import textwrap
 
 import pytest
 
-from ssort._requirements import get_requirements
+from ssort._requirements import Requirement, get_requirements
 
 match_statement = pytest.mark.skipif(
     sys.version_info < (3, 10),
@@ -33,6 +33,19 @@ def _dep_names(node):
     return [dep.name for dep in get_requirements(node)]
 
 
+def test_requirements_merged():
+    node = _parse(
+        """
+        def f():
+            a = b + b
+            return lambda: b
+        """
+    )
+    assert get_requirements(node) == (
+        Requirement(name="b", lineno=3, col_offset=8, deferred=True),
+    )
+
+
 def test_function_def_requirements():
     node = _parse(
         """
@@ -277,7 +290,6 @@ def test_class_def_requirements():
         "B",
         "C",
         "something",
-        "something",
         "method_decorator",
         "_b",
     ]
@@ -560,7 +572,6 @@ def test_with_requirements_bindings():
         "os",
         "path",
         "parse_requirements",
-        "path",
         "results",
     ]
 
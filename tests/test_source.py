@@ -0,0 +1,79 @@
+import pytest
+
+from ssort import ssort
+from ssort._exceptions import UnknownEncodingError
+from ssort._source import Source
+
+
+def test_source_from_text():
+    source = Source.from_text("a = 1\r\nb = 2\r\n")
+
+    assert source.text == "a = 1\nb = 2\n"
+    assert source.newline == "\r\n"
+    assert source.encoding is None
+    assert source.original == "a = 1\r\nb = 2\r\n"
+
+
+def test_source_from_text_mixed_newlines():
+    source = Source.from_text("a = 1\r\nb = 2\n")
+
+    assert source.text == "a = 1\nb = 2\n"
+    assert source.newline == "\r\n"
+
+
+def test_source_from_bytes_utf8():
+    source = Source.from_bytes(b"a = '\xc3\xa9'\n")
+
+    assert source.text == "a = 'é'\n"
+    assert source.encoding == "utf-8"
+    assert source.newline == "\n"
+
+
+def test_source_from_bytes_bom():
+    source = Source.from_bytes(b"\xef\xbb\xbfa = 1\n")
+
+    assert source.text == "a = 1\n"
+    assert source.encoding == "utf-8-sig"
+
+
+def test_source_from_bytes_coding_comment():
+    source = Source.from_bytes(b"# coding: latin-1\na = '\xe9'\n")
+
+    assert source.text == "# coding: latin-1\na = 'é'\n"
+    assert source.encoding == "iso-8859-1"
+
+
+def test_source_from_bytes_unknown_encoding():
+    with pytest.raises(UnknownEncodingError):
+        Source.from_bytes(b"# coding: invalid-encoding\n")
+
+
+def test_source_from_bytes_decoding_error():
+    with pytest.raises(UnicodeDecodeError):
+        Source.from_bytes(b"a = '\xfe'\n")
+
+
+@pytest.mark.parametrize("mmap_threshold", [None, 0, 1])
+def test_source_from_path(tmp_path, mmap_threshold):
+    path = tmp_path / "module.py"
+    path.write_bytes(b"a = b\r\nb = 1\r\n")
+
+    source = Source.from_path(path, mmap_threshold=mmap_threshold)
+
+    assert source.text == "a = b\nb = 1\n"
+    assert source.newline == "\r\n"
+    assert source.encoding == "utf-8"
+    assert source.path == path
+    assert source.original == b"a = b\r\nb = 1\r\n"
+    assert ssort(source) == b"b = 1\r\na = b\r\n"
+
+
+@pytest.mark.parametrize("mmap_threshold", [None, 0])
+def test_source_from_path_empty(tmp_path, mmap_threshold):
+    path = tmp_path / "module.py"
+    path.write_bytes(b"")
+
+    source = Source.from_path(path, mmap_threshold=mmap_threshold)
+
+    assert source.text == ""
+    assert ssort(source) == b""
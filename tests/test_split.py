@@ -127,3 +127,53 @@ def test_split_class_multiple():
     actual = _split_class("def a():\n    pass\n\nclass A:\n    pass")
     expected = "\nclass A:", ["    pass"]
     assert actual == expected
+
+
+def test_split_class_nested():
+    (statement,) = parse(
+        "class A:\n    x = 1\n\n    class B:  # B.\n        y = 2\n"
+    )
+    _, (_, inner) = split_class(statement)
+    actual = split_class(inner)
+    expected = "\n    class B:  # B.", ["        y = 2"]
+    assert (actual[0], [child.text for child in actual[1]]) == expected
+
+
+def test_split_class_body_shares_source():
+    source = "a = 1\n\nclass A:\n    b = 2\n    c = 3\n\nclass B: d = 4\n"
+    _, class_a, class_b = parse(source)
+    _, body_a = split_class(class_a)
+    _, body_b = split_class(class_b)
+    for child in body_a + body_b:
+        assert child.source is source
+        assert child.line_offsets is class_a.line_offsets
+
+
+def test_split_class_bases_comment_with_colon():
+    actual = _split_class("class A(\n    B,  # Note: C.\n    C,\n):\n    pass")
+    expected = "class A(\n    B,  # Note: C.\n    C,\n):", ["    pass"]
+    assert actual == expected
+
+
+def test_split_class_keywords_before_bases():
+    actual = _split_class("class A(metaclass=M, *bases): pass")
+    expected = "class A(metaclass=M, *bases):", ["    pass"]
+    assert actual == expected
+
+
+def test_split_class_line_continuation():
+    actual = _split_class("class A \\\n    (B) \\\n    :\n    pass")
+    expected = "class A \\\n    (B) \\\n    :", ["    pass"]
+    assert actual == expected
+
+
+def test_split_class_empty_parentheses():
+    actual = _split_class("class A ( ) : pass")
+    expected = "class A ( ) :", ["    pass"]
+    assert actual == expected
+
+
+def test_split_class_non_ascii_name():
+    actual = _split_class("class Ä(B):\n    pass")
+    expected = "class Ä(B):", ["    pass"]
+    assert actual == expected
@@ -1,6 +1,7 @@
+import io
 import textwrap
 
-from ssort import ssort
+from ssort import ssort, ssort_result
 
 
 def _clean(text):
@@ -528,6 +529,33 @@ def test_lifecycle_class_private():
     assert actual == expected
 
 
+def test_class_private_rebound():
+    original = _clean(
+        """
+        class Thing:
+            def poll(self):
+                return self._inner()
+            _inner = None
+            def _inner(self):
+                ...
+            __slots__ = ()
+        """
+    )
+    expected = _clean(
+        """
+        class Thing:
+            __slots__ = ()
+            _inner = None
+            def _inner(self):
+                ...
+            def poll(self):
+                return self._inner()
+        """
+    )
+    actual = ssort(original)
+    assert actual == expected
+
+
 def test_single_comment():
     original = _clean(
         """
@@ -557,3 +585,127 @@ def test_ssort_preserve_crlf_endlines_str():
 
     actual = ssort(original)
     assert actual == expected
+
+
+def test_ssort_out_str():
+    original = "a = b\r\nclass B: c = a\r\nb = 4"
+    expected = "b = 4\r\na = b\r\nclass B:\r\n    c = a\r\n"
+    out = io.StringIO(newline="")
+
+    assert ssort(original, out=out) is None
+    assert out.getvalue() == expected
+
+
+def test_ssort_out_bytes():
+    original = "# coding: latin-1\r\na = b\r\nb = 'é'".encode("latin-1")
+    expected = "b = 'é'\r\n# coding: latin-1\r\na = b\r\n".encode("latin-1")
+    out = io.BytesIO()
+
+    assert ssort(original, out=out) is None
+    assert out.getvalue() == expected
+
+
+def test_ssort_out_bytes_bom():
+    original = b"\xef\xbb\xbfa = b\nb = 4\n"
+    out = io.BytesIO()
+
+    ssort(original, out=out)
+    assert out.getvalue() == b"\xef\xbb\xbfb = 4\na = b\n"
+
+
+def test_ssort_out_parse_error():
+    original = b"a = (\r\n"
+    out = io.BytesIO()
+
+    ssort(original, on_parse_error="ignore", out=out)
+    assert out.getvalue() == original
+
+
+def test_ssort_result_unchanged():
+    original = _clean(
+        """
+        a = 1
+
+        class A:
+            def _g(self):
+                return a
+
+            def f(self):
+                return self._g()
+        """
+    )
+    result = ssort_result(original)
+
+    assert not result.changed
+    assert result.moved == 0
+    assert result.output() == original
+
+
+def test_ssort_result_moved():
+    original = _clean(
+        """
+        c = b
+        b = a
+        a = 1
+
+        class A:
+            def _g(self):
+                return a
+
+            def __init__(self):
+                pass
+        """
+    )
+    result = ssort_result(original)
+
+    assert result.changed
+    assert result.moved == 3
+    assert result.output() == ssort(original)
+
+
+def test_ssort_result_layout_changed():
+    result = ssort_result("a = 1; b = 2\n")
+
+    assert result.changed
+    assert result.moved == 0
+    assert result.output() == "a = 1\nb = 2\n"
+
+
+def test_ssort_result_missing_trailing_newline():
+    result = ssort_result(b"a = 1")
+
+    assert result.changed
+    assert result.output() == b"a = 1\n"
+
+
+def test_ssort_result_mixed_newlines():
+    result = ssort_result(b"a = 1\r\nb = 2\n")
+
+    assert not result.changed
+    assert result.output() == b"a = 1\r\nb = 2\r\n"
+
+
+def test_ssort_result_parse_error():
+    result = ssort_result("a = (\n", on_parse_error="ignore")
+
+    assert not result.changed
+    assert result.moved == 0
+
+
+def test_ssort_bytes_without_statements():
+    original = b"# comment\r\n"
+
+    assert ssort(original) == original
+    assert ssort(b"") == b""
+
+
+def test_ssort_bytes_parse_error():
+    original = b"a = (\r\n"
+
+    assert ssort(original, on_parse_error="ignore") == original
+
+
+def test_ssort_bytes_unresolved():
+    original = b"a = b\r\n"
+
+    assert ssort(original, on_unresolved="ignore") == original
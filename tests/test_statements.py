@@ -1,4 +1,7 @@
-from ssort._parsing import parse
+import textwrap
+
+from ssort._analysis import analyze
+from ssort._parsing import parse, split_class
 
 
 def test_statement_text_padded_same_row():
@@ -9,3 +12,49 @@ def test_statement_text_padded_same_row():
 def test_statement_text_padded_separate_rows():
     statements = list(parse("a = 4\n\nb = 5"))
     assert statements[1].text_padded() == "\n\nb = 5"
+
+
+def test_statement_shares_source():
+    source = "a = 4\nb = 5  # comment\n"
+    statements = list(parse(source))
+    assert [statement.text for statement in statements] == [
+        "a = 4",
+        "b = 5  # comment",
+    ]
+    assert all(statement.source is source for statement in statements)
+
+
+def test_statement_has_no_instance_dict():
+    (statement,) = parse("a = 4")
+    assert not hasattr(statement, "__dict__")
+    assert statement.analysis() is statement.analysis()
+
+
+def test_statement_class_body_reuses_analysis():
+    source = textwrap.dedent(
+        """
+        class A(Base):
+            x = y
+            def method(self):
+                return self._helper(z)
+            class B:
+                def inner(self, a):
+                    return [self.attr for _ in a]
+            y; z = 1
+        """
+    )
+    (statement,) = parse(source)
+    _, body = split_class(statement)
+    _, inner_body = split_class(body[2])
+
+    for child in [*body, *inner_body]:
+        expected = analyze(child.node)
+        actual = child.analysis()
+        assert actual.bindings == expected.bindings
+        assert actual.requirements == expected.requirements
+        assert actual.method_requirements == expected.method_requirements
+
+    assert body[2].analysis() is statement.analysis().body[2]
+    assert inner_body[0].analysis() is statement.analysis().body[2].body[0]
+    assert inner_body[0].method_requirements() == ("attr",)
+    assert list(statement.method_requirements()) == []
@@ -0,0 +1,161 @@
+import json
+import os
+import pickle
+import pstats
+import time
+
+from ssort import ssort
+from ssort._stats import (
+    FileStats,
+    Recorder,
+    RunStats,
+    current,
+    format_json,
+    format_text,
+    phase,
+)
+
+_cyclic = """
+import sys
+
+def a():
+    return b()
+
+def b():
+    return a()
+
+class C:
+    def method(self):
+        return self._helper()
+
+    def _helper(self):
+        return sys
+"""
+
+
+def test_phase_without_recorder():
+    assert current() is None
+    with phase("parse"):
+        pass
+    assert current() is None
+
+
+def test_phases_are_exclusive():
+    with Recorder().record("a.py") as stats:
+        assert current() is stats
+        with phase("graph"):
+            with phase("cycles"):
+                time.sleep(0.05)
+            with phase("cycles"):
+                pass
+    assert current() is None
+
+    assert stats.phases.keys() == {"graph", "cycles"}
+    graph_wall, _ = stats.phases["graph"]
+    cycles_wall, _ = stats.phases["cycles"]
+    assert cycles_wall >= 0.05
+    assert graph_wall < cycles_wall
+    assert stats.wall >= graph_wall + cycles_wall
+
+
+def test_record_sort():
+    with Recorder().record("a.py") as stats:
+        ssort(_cyclic)
+
+    assert {
+        "decode",
+        "parse",
+        "split",
+        "requirements",
+        "graph",
+        "cycles",
+        "sort",
+        "classes",
+        "render",
+    } <= stats.phases.keys()
+    # Four module level statements, and two in the body of the class, which
+    # has no hard dependencies between them.
+    assert stats.statements == 6
+    assert stats.edges == 3
+    assert stats.cycles == 1
+
+
+def test_file_stats_pickle():
+    stats = FileStats("a.py")
+    stats.add("parse", 1.0, 0.5)
+
+    restored = pickle.loads(pickle.dumps(stats))
+    assert restored.to_dict() == stats.to_dict()
+
+
+def test_run_stats_keeps_slowest():
+    run_stats = RunStats(slowest=2)
+    for index, wall in enumerate([0.3, 0.1, 0.5, 0.2]):
+        stats = FileStats(f"file_{index}.py")
+        stats.wall = wall
+        stats.statements = 1
+        stats.add("parse", wall, wall)
+        run_stats.add(stats)
+
+    report = run_stats.to_dict()
+    assert report["files"] == 4
+    assert report["statements"] == 4
+    assert report["phases"]["parse"]["wall"] == 0.3 + 0.1 + 0.5 + 0.2
+    assert [stats["path"] for stats in report["slowest"]] == [
+        "file_2.py",
+        "file_0.py",
+    ]
+
+    assert json.loads(format_json(report)) == report
+    text = format_text(report)
+    assert "parse (ast.parse)" in text
+    assert "file_2.py" in text
+    assert "file_1.py" not in text
+
+
+def test_recorder_profile(tmp_path):
+    recorder = Recorder(profile_dir=str(tmp_path), profile_threshold=0.0)
+    with recorder.record("src/a.py") as stats:
+        ssort(_cyclic)
+
+    assert stats.profile == str(tmp_path / "src%2Fa.py.prof")
+    assert pstats.Stats(stats.profile).total_calls > 0
+
+
+def test_recorder_profile_threshold(tmp_path):
+    recorder = Recorder(profile_dir=str(tmp_path), profile_threshold=60.0)
+    with recorder.record("a.py") as stats:
+        ssort(_cyclic)
+
+    assert stats.profile is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_recorder_profile_long_path(tmp_path):
+    recorder = Recorder(profile_dir=str(tmp_path), profile_threshold=0.0)
+    paths = [
+        ("very_long_directory_name/" * 20) + f"{name}.py" for name in "ab"
+    ]
+    profiles = []
+    for path in paths:
+        with recorder.record(path) as stats:
+            ssort(_cyclic)
+        profiles.append(stats.profile)
+
+    names = [os.path.basename(profile) for profile in profiles]
+    assert names[0] != names[1]
+    for path, name in zip(paths, names):
+        assert len(name) <= 255
+        assert name.endswith(path[-20:].replace("/", "%2F") + ".prof")
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(names)
+
+
+def test_recorder_profile_error(tmp_path):
+    recorder = Recorder(
+        profile_dir=str(tmp_path / "missing"), profile_threshold=0.0
+    )
+    with recorder.record("a.py") as stats:
+        ssort(_cyclic)
+
+    assert stats.profile is None
+    assert stats.profile_error is not None
@@ -0,0 +1,203 @@
+import ast
+import pathlib
+import textwrap
+
+from ssort._analysis import Requirement, Scope
+from ssort._bindings import get_bindings
+from ssort._method_requirements import get_method_requirements
+from ssort._parsing import parse, split_class
+from ssort._requirements import get_requirements
+from ssort._symtable_analysis import analyze
+from ssort._utils import detect_encoding, normalize_newlines
+
+_SAMPLES_DIR = pathlib.Path("test_data/samples")
+
+
+def pytest_generate_tests(metafunc):
+    if "sample" not in metafunc.fixturenames:
+        return
+
+    samples = []
+    for input_path in _SAMPLES_DIR.glob("*_input.py"):
+        samples.append(input_path.name[: -len("_input.py")])
+    samples.sort()
+    assert samples
+
+    metafunc.parametrize("sample", samples)
+
+
+def _analyze(source):
+    (statement,) = parse(textwrap.dedent(source))
+    return analyze(
+        statement.node,
+        statement.text,
+        start_row=statement.start_row,
+        start_col=statement.start_col,
+    )
+
+
+def _iter_statements(statements):
+    for statement in statements:
+        yield statement
+        if isinstance(statement.node, ast.ClassDef):
+            _, body = split_class(statement)
+            yield from _iter_statements(body)
+
+
+def _requirement_keys(requirements):
+    return {
+        (requirement.name, requirement.deferred, requirement.scope)
+        for requirement in requirements
+    }
+
+
+def test_symtable_analysis_agrees_with_visitor(sample):
+    input_bytes = (_SAMPLES_DIR / f"{sample}_input.py").read_bytes()
+    input_text = normalize_newlines(
+        input_bytes.decode(detect_encoding(input_bytes))
+    )
+
+    for statement in _iter_statements(parse(input_text)):
+        analysis = analyze(
+            statement.node,
+            statement.text,
+            start_row=statement.start_row,
+            start_col=statement.start_col,
+        )
+
+        assert _requirement_keys(analysis.requirements) == _requirement_keys(
+            get_requirements(statement.node)
+        )
+        assert set(analysis.bindings) == set(get_bindings(statement.node))
+        assert list(analysis.method_requirements) == list(
+            get_method_requirements(statement.node)
+        )
+
+
+def test_symtable_analysis_nested_closures():
+    analysis = _analyze(
+        """
+        def outer(a):
+            def middle(b):
+                def inner(c):
+                    def innermost():
+                        nonlocal c
+                        global g
+                        return a + b + c + d + g
+                    return innermost
+                return inner
+            return middle
+        """
+    )
+
+    assert analysis.bindings == ("outer",)
+    assert analysis.requirements == (
+        Requirement(
+            name="g",
+            lineno=7,
+            col_offset=16,
+            deferred=True,
+            scope=Scope.GLOBAL,
+        ),
+        Requirement(name="d", lineno=8, col_offset=35, deferred=True),
+    )
+
+    (outer,) = analysis.scope.children
+    (middle,) = outer.children
+    assert set(outer.bindings) == {"a", "middle"}
+    assert set(middle.bindings) == {"b", "inner"}
+    assert {requirement.name for requirement in middle.requirements} == {
+        "a",
+        "g",
+        "d",
+    }
+
+
+def test_symtable_analysis_lambda_not_deferred():
+    analysis = _analyze(
+        """
+        f = lambda a: lambda b: a + b + c
+        """
+    )
+
+    assert analysis.bindings == ("f",)
+    assert analysis.requirements == (
+        Requirement(name="c", lineno=2, col_offset=32),
+    )
+
+
+def test_symtable_analysis_super_does_not_require_class_cell():
+    analysis = _analyze(
+        """
+        def __init__(self):
+            super().__init__()
+            self.a = b
+        """
+    )
+
+    assert [requirement.name for requirement in analysis.requirements] == [
+        "super",
+        "b",
+    ]
+    assert analysis.method_requirements == ()
+
+
+def test_symtable_analysis_class_body():
+    (statement,) = parse(
+        textwrap.dedent(
+            """
+            class A:
+                x = 1
+
+                def method(self):
+                    return self.y + z
+            """
+        )
+    )
+    _, body = split_class(statement)
+
+    analyses = [
+        analyze(
+            child.node,
+            child.text,
+            start_row=child.start_row,
+            start_col=child.start_col,
+        )
+        for child in body
+    ]
+
+    assert [analysis.bindings for analysis in analyses] == [
+        ("x",),
+        ("method",),
+    ]
+    assert analyses[1].requirements == (
+        Requirement(name="z", lineno=6, col_offset=24, deferred=True),
+    )
+    assert analyses[1].method_requirements == ("y",)
+
+
+def test_symtable_analysis_after_semicolon():
+    _, statement = parse("a = 1; f = lambda: b\n")
+
+    analysis = analyze(
+        statement.node,
+        statement.text,
+        start_row=statement.start_row,
+        start_col=statement.start_col,
+    )
+
+    assert analysis.requirements == (
+        Requirement(name="b", lineno=1, col_offset=19),
+    )
+
+
+def test_symtable_analysis_compiler_error_falls_back_to_visitor():
+    analysis = _analyze(
+        """
+        nonlocal a
+        """
+    )
+
+    assert analysis.requirements == (
+        Requirement(name="a", lineno=2, col_offset=0, scope=Scope.NONLOCAL),
+    )
@@ -0,0 +1,54 @@
+import concurrent.futures
+import pathlib
+import warnings
+
+from ssort import ssort
+
+_SAMPLES_DIR = pathlib.Path("test_data/samples")
+
+_THREADS = 8
+_REPEATS = 4
+
+
+def _ignore(**kwargs):
+    pass
+
+
+def _sort_sample(input_path):
+    return ssort(
+        input_path.read_bytes(),
+        filename=str(input_path),
+        on_wildcard_import=_ignore,
+    )
+
+
+def test_samples_in_parallel():
+    input_paths = sorted(_SAMPLES_DIR.glob("*_input.py"))
+    assert input_paths
+
+    expected = {
+        input_path: _sort_sample(input_path) for input_path in input_paths
+    }
+
+    with concurrent.futures.ThreadPoolExecutor(_THREADS) as executor:
+        futures = [
+            (input_path, executor.submit(_sort_sample, input_path))
+            for _ in range(_REPEATS)
+            for input_path in input_paths
+        ]
+
+        for input_path, future in futures:
+            assert future.result() == expected[input_path], input_path
+
+
+def test_samples_in_parallel_leave_warning_filters_alone():
+    input_paths = sorted(_SAMPLES_DIR.glob("*_input.py"))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        filters = list(warnings.filters)
+
+        with concurrent.futures.ThreadPoolExecutor(_THREADS) as executor:
+            list(executor.map(_sort_sample, input_paths))
+
+        assert warnings.filters == filters